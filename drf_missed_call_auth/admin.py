@@ -1,9 +1,176 @@
+import heapq
+import math
+from functools import cmp_to_key
+from itertools import islice
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, OrderBy, QuerySet, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import CallSourceNumber, MissedCallVerification
+from .models import (
+    AppSignature, AuditEvent, CallSourceDailyStats, CallSourceNumber, DynamicSetting, MissedCallVerification,
+)
+from .sharding import db_for_session, fan_out, is_enabled as sharding_enabled
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the database's table statistics instead of COUNT(*)
+    for unfiltered changelists on large tables (PostgreSQL and MySQL).
+    Filtered querysets and small tables still get an exact count.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = self.get_estimated_count(queryset)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
+
+    def get_estimated_count(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+        elif connection.vendor == 'mysql':
+            sql = (
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s"
+            )
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+
+class _ShardedResults:
+    """
+    The rows of `queryset` on every session shard, read in parallel and merged
+    in the queryset's ordering (which the changelist makes total with 'pk').
+    A slice reads its first `stop` rows from each shard, so deep pages cost
+    more than with a single database.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.ordered = queryset.ordered
+        self.ordering = []
+        for field in queryset.query.order_by:
+            if isinstance(field, OrderBy) and isinstance(field.expression, F):
+                self.ordering.append((field.expression.name, field.descending))
+            elif isinstance(field, str):
+                self.ordering.append((field.lstrip('-'), field.startswith('-')))
+
+    def count(self):
+        return sum(fan_out(lambda db: self.queryset.using(db).count()).values())
+
+    def _value(self, obj, path):
+        for name in path.split('__'):
+            if obj is None:
+                return None
+            field = obj._meta.pk if name == 'pk' else obj._meta.get_field(name)
+            # Ordering by a relation orders by its key
+            obj = getattr(obj, field.attname if field.is_relation and name == path else field.name)
+        return obj
+
+    def _compare(self, a, b):
+        for path, descending in self.ordering:
+            x, y = self._value(a, path), self._value(b, path)
+            if x == y:
+                continue
+            # NULLs first, as far as a merge needs
+            less = x is None or (y is not None and x < y)
+            return (1 if less else -1) if descending else (-1 if less else 1)
+        return 0
+
+    def __getitem__(self, index):
+        stop = index.stop if isinstance(index, slice) else index + 1
+        rows = fan_out(lambda db: list(self.queryset.using(db)[:stop] if stop is not None else self.queryset.using(db)))
+        merged = list(islice(heapq.merge(*rows.values(), key=cmp_to_key(self._compare)), stop))
+        return merged[index]
+
+
+class ShardedPaginator(EstimatedCountPaginator):
+    """
+    Paginator over the session shards (SESSION_SHARDS): counts and pages are
+    read from every shard in parallel. Unfiltered counts are estimated per
+    shard as in `EstimatedCountPaginator`.
+    """
+
+    def __init__(self, object_list, *args, **kwargs):
+        super().__init__(_ShardedResults(object_list), *args, **kwargs)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.queryset
+        return sum(fan_out(
+            lambda db: EstimatedCountPaginator(queryset.using(db), self.per_page).count
+        ).values())
+
+
+class ShardedChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        if isinstance(self.result_list, QuerySet):
+            # Everything fits on one page: read it from every shard too
+            self.result_list = _ShardedResults(self.result_list)[:self.result_count]
+
+
+class ExpectedCallerFilter(admin.ListFilter):
+    """
+    Filters by source number through an autocomplete widget, instead of
+    rendering one link per number in the pool.
+    """
+    title = _('expected caller')
+    parameter_name = 'expected_caller__id__exact'
+    template = 'drf_missed_call_auth/admin/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        value = params.pop(self.parameter_name, None)
+        # Django >= 5.0 passes lists of values
+        if isinstance(value, list):
+            value = value[-1] if value else None
+        self.value = value or None
+        self.field = forms.ModelChoiceField(
+            queryset=CallSourceNumber.objects.all(),
+            widget=AutocompleteSelect(model._meta.get_field('expected_caller'), model_admin.admin_site),
+            required=False,
+        )
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value:
+            return queryset.filter(expected_caller_id=self.value)
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'widget': self.field.widget.render(self.parameter_name, self.value, attrs={
+                'id': 'id_filter_expected_caller',
+            }),
+            'base_url': changelist.get_query_string(remove=[self.parameter_name]),
+            'parameter_name': self.parameter_name,
+        }
 
 
 @admin.register(CallSourceNumber)
@@ -11,17 +178,24 @@ class CallSourceNumberAdmin(admin.ModelAdmin):
     list_display = [
         'phone_number', 
         'label', 
+        'tenant',
         'is_active', 
         'verification_count',
         'created_at'
     ]
-    list_filter = ['is_active', 'created_at']
+    list_filter = ['is_active', 'tenant', 'created_at']
     search_fields = ['phone_number', 'label']
     readonly_fields = ['created_at', 'updated_at', 'verification_count']
+
+    def get_queryset(self, request):
+        # Read totals from the daily rollups instead of counting raw sessions
+        return super().get_queryset(request).annotate(
+            _verification_count=Coalesce(Sum('daily_stats__sent'), 0)
+        )
     
     fieldsets = (
         (_('Number Information'), {
-            'fields': ('phone_number', 'label', 'is_active')
+            'fields': ('phone_number', 'label', 'tenant', 'is_active')
         }),
         (_('Statistics'), {
             'fields': ('verification_count', 'created_at', 'updated_at'),
@@ -30,8 +204,10 @@ class CallSourceNumberAdmin(admin.ModelAdmin):
     )
     
     def verification_count(self, obj):
-        """Display count of verifications using this number"""
-        count = obj.verifications.count()
+        """Display count of verifications sent from this number (from rollups)"""
+        count = getattr(obj, '_verification_count', None)
+        if count is None:
+            count = obj.daily_stats.aggregate(total=Coalesce(Sum('sent'), 0))['total']
         if count > 0:
             url = reverse('admin:drf_missed_call_auth_missedcallverification_changelist')
             return format_html(
@@ -40,6 +216,7 @@ class CallSourceNumberAdmin(admin.ModelAdmin):
             )
         return '0 verifications'
     verification_count.short_description = _('Usage Count')
+    verification_count.admin_order_field = '_verification_count'
 
 
 @admin.register(MissedCallVerification)
@@ -49,16 +226,23 @@ class MissedCallVerificationAdmin(admin.ModelAdmin):
         'user_phone_display',
         'expected_caller',
         'status_badge',
+        'delivery_status',
         'attempt_count',
         'created_at',
         'expires_at'
     ]
     list_filter = [
         'is_verified',
+        'direction',
+        'delivery_status',
         'created_at',
         'expires_at',
-        'expected_caller'
+        ExpectedCallerFilter,
     ]
+    list_select_related = ['expected_caller']
+    # Large tables: avoid COUNT(*) on the full table for every page view
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = [
         'id',
         'user_phone',
@@ -71,17 +255,19 @@ class MissedCallVerificationAdmin(admin.ModelAdmin):
         'app_signature',
         'expected_caller',
         'is_verified',
+        'direction',
         'created_at',
         'expires_at',
         'verified_at',
         'ip_address',
         'attempt_count',
+        'provider_call_id',
+        'delivery_status',
+        'delivery_updated_at',
         'status_display',
         'time_remaining_display'
     ]
-    
-    date_hierarchy = 'created_at'
-    
+
     fieldsets = (
         (_('Session Information'), {
             'fields': (
@@ -94,12 +280,20 @@ class MissedCallVerificationAdmin(admin.ModelAdmin):
         (_('Verification Details'), {
             'fields': (
                 'expected_caller',
+                'direction',
                 'is_verified',
                 'verified_at',
                 'attempt_count',
                 'status_display',
             )
         }),
+        (_('Delivery'), {
+            'fields': (
+                'provider_call_id',
+                'delivery_status',
+                'delivery_updated_at',
+            )
+        }),
         (_('Timing'), {
             'fields': (
                 'created_at',
@@ -109,6 +303,35 @@ class MissedCallVerificationAdmin(admin.ModelAdmin):
         }),
     )
     
+    @property
+    def media(self):
+        # Assets for the autocomplete widget in ExpectedCallerFilter
+        field = MissedCallVerification._meta.get_field('expected_caller')
+        return super().media + AutocompleteSelect(field, self.admin_site).media
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if sharding_enabled():
+            return ShardedPaginator(queryset, per_page, orphans, allow_empty_first_page)
+        return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+
+    def get_changelist(self, request, **kwargs):
+        return ShardedChangeList if sharding_enabled() else super().get_changelist(request, **kwargs)
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding_enabled():
+            return super().get_object(request, object_id, from_field)
+        try:
+            return self.get_queryset(request).using(db_for_session(object_id)).get(pk=object_id)
+        except (MissedCallVerification.DoesNotExist, ValueError):
+            return None
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if sharding_enabled():
+            # Its confirmation page only sees one database; expire instead
+            actions.pop('delete_selected', None)
+        return actions
+
     def has_add_permission(self, request):
         """Prevent manual creation of verifications through admin"""
         return False
@@ -182,10 +405,103 @@ class MissedCallVerificationAdmin(admin.ModelAdmin):
     
     def mark_as_expired(self, request, queryset):
         """Admin action to manually expire sessions"""
-        from django.utils import timezone
-        count = queryset.update(expires_at=timezone.now())
+        from .revocation import expire_sessions
+        count = expire_sessions(queryset)
         self.message_user(
             request,
             _('{} session(s) marked as expired.').format(count)
         )
-    mark_as_expired.short_description = _('Mark selected as expired')
\ No newline at end of file
+    mark_as_expired.short_description = _('Mark selected as expired')
+
+
+@admin.register(CallSourceDailyStats)
+class CallSourceDailyStatsAdmin(admin.ModelAdmin):
+    list_display = [
+        'date',
+        'source',
+        'sent',
+        'verified',
+        'failed',
+        'expired',
+        'conversion_display',
+        'median_display',
+    ]
+    list_filter = ['date']
+    list_select_related = ['source']
+    search_fields = ['source__phone_number', 'source__label']
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Rollups are maintained by the package"""
+        return False
+
+    def conversion_display(self, obj):
+        rate = obj.conversion_rate
+        return '-' if rate is None else f"{rate:.0%}"
+    conversion_display.short_description = _('Conversion')
+
+    def median_display(self, obj):
+        median = obj.median_time_to_verify
+        if median is None:
+            return '-'
+        if median == math.inf:
+            return _('> 60s')
+        return f"< {median}s"
+    median_display.short_description = _('Median time to verify')
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_at',
+        'event',
+        'session_id',
+        'phone',
+        'ip_address',
+        'status_code',
+        'duration_ms',
+    ]
+    list_filter = ['event', 'status_code']
+    search_fields = ['=session_id', '=ip_address']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """The audit trail is append-only"""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DynamicSetting)
+class DynamicSettingAdmin(admin.ModelAdmin):
+    """
+    Runtime overrides of MISSEDCALL_AUTH. Workers pick up changes within
+    DYNAMIC_CONFIG_POLL_INTERVAL seconds when DYNAMIC_CONFIG_ENABLED is set.
+    """
+    list_display = ['key', 'value', 'updated_at']
+    search_fields = ['key']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(AppSignature)
+class AppSignatureAdmin(admin.ModelAdmin):
+    list_display = ['value', 'created_at']
+    search_fields = ['value']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Sessions reference these rows by id (COMPACT_STORAGE)"""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
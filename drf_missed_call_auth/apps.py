@@ -8,7 +8,11 @@ def validate_settings(app_configs, **kwargs):
     Django System Check to ensure critical settings are configured.
     Run via: python manage.py check
     """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
     from .settings import api_settings
+    from .sharding import MAX_SHARDS
+    from .tenants import get_tenants
     errors = []
 
     # 1. Check for Telephony Credentials
@@ -22,7 +26,9 @@ def validate_settings(app_configs, **kwargs):
         )
 
     # 2. Check for App Signature Security
-    if api_settings.REQUIRE_SIGNATURE and not getattr(api_settings, 'ALLOWED_APP_SIGNATURES', None):
+    # (with tenant profiles the default tenant may legitimately accept nothing)
+    if (api_settings.REQUIRE_SIGNATURE and not getattr(api_settings, 'ALLOWED_APP_SIGNATURES', None)
+            and not api_settings.TENANTS):
         errors.append(
             checks.Error(
                 _("REQUIRE_SIGNATURE is enabled but no ALLOWED_APP_SIGNATURES are defined."),
@@ -31,6 +37,114 @@ def validate_settings(app_configs, **kwargs):
             )
         )
 
+    # 3. Tenant profiles must be complete and unambiguous
+    try:
+        get_tenants()
+    except ImproperlyConfigured as e:
+        errors.append(
+            checks.Error(
+                str(e),
+                hint=_("Fix the profile in MISSEDCALL_AUTH['TENANTS']; every tenant needs its own APP_SIGNATURES."),
+                id='rfm.E004',
+            )
+        )
+
+    # 4. Session shards must be distinct, configured databases
+    shards = list(api_settings.SESSION_SHARDS)
+    unknown = [alias for alias in shards if alias not in settings.DATABASES]
+    if unknown or len(set(shards)) != len(shards) or len(shards) > MAX_SHARDS:
+        errors.append(
+            checks.Error(
+                _("SESSION_SHARDS must list at most %(max)d distinct database aliases.") % {'max': MAX_SHARDS},
+                hint=_("Unknown aliases: %(unknown)s. Add them to DATABASES, and only ever append to the list.") % {
+                    'unknown': ', '.join(unknown) or '-',
+                },
+                id='rfm.E005',
+            )
+        )
+
+    return errors
+
+
+def check_pool_capacity(app_configs, databases=None, **kwargs):
+    """
+    Warns before the caller-ID pool runs dry. Deployment check that needs the
+    database: python manage.py check --deploy --database default
+    """
+    from django.db import DatabaseError
+    from .capacity import get_pool_capacity
+    from .tenants import get_tenants
+
+    if not databases:
+        return []
+    errors = []
+    for tenant in get_tenants():
+        try:
+            report = get_pool_capacity(tenant=tenant.name)
+        except DatabaseError:
+            # Tables not migrated yet
+            return []
+        # Each tenant draws from its own pool
+        errors.extend(_pool_capacity_messages(report, obj=f"tenant '{tenant.name}'" if tenant.name else None))
+    return errors
+
+
+def _pool_capacity_messages(report, obj=None):
+    from .settings import api_settings
+
+    errors = []
+    if report.active_numbers == 0:
+        errors.append(
+            checks.Error(
+                _("No active call source numbers."),
+                hint=_("Every verification request will fail. Add or re-activate CallSourceNumber entries."),
+                id='rfm.E002',
+                obj=obj,
+            )
+        )
+    elif report.active_numbers == 1:
+        errors.append(
+            checks.Warning(
+                _("Only one active call source number."),
+                hint=_("Repeat requests exclude the last used number, so they fail with a single-number pool."),
+                id='rfm.W002',
+                obj=obj,
+            )
+        )
+
+    if report.exhausted:
+        errors.append(
+            checks.Error(
+                _("%(count)d request(s) found no available caller in the last %(window)d seconds.") % {
+                    'count': report.exhausted, 'window': api_settings.CAPACITY_WINDOW,
+                },
+                hint=_("Add numbers to the pool."),
+                id='rfm.E003',
+                obj=obj,
+            )
+        )
+    elif report.active_numbers and report.utilization >= api_settings.CAPACITY_WARNING_UTILIZATION:
+        errors.append(
+            checks.Warning(
+                _("Caller pool is at %(utilization).0f%% of its capacity.") % {'utilization': report.utilization * 100},
+                hint=_("Run manage.py missedcall_capacity for per-number usage and add numbers."),
+                id='rfm.W003',
+                obj=obj,
+            )
+        )
+    elif report.active_numbers:
+        minutes = report.minutes_to_saturation
+        if minutes is not None and minutes * 60 <= api_settings.CAPACITY_SATURATION_HORIZON:
+            errors.append(
+                checks.Warning(
+                    _("At the current growth rate the caller pool saturates in about %(minutes)d minute(s).") % {
+                        'minutes': minutes,
+                    },
+                    hint=_("Add numbers before the pool is exhausted."),
+                    id='rfm.W004',
+                    obj=obj,
+                )
+            )
     return errors
 
 
@@ -41,6 +155,14 @@ class MissedCallConfig(AppConfig):
 
     def ready(self):
         """
-        Register system checks when the app is ready.
+        Register system checks and signal receivers when the app is ready.
         """
-        checks.register(validate_settings, checks.Tags.security)
\ No newline at end of file
+        checks.register(validate_settings, checks.Tags.security)
+        checks.register(check_pool_capacity, checks.Tags.database, deploy=True)
+        # routers first: its receivers pin written sessions to the primary
+        # before the cache invalidation receivers run
+        from . import routers, events, state, stats, capacity, risk, leases, attempts, audit, config, issuance, sharding  # noqa: F401
+        from .settings import api_settings
+        if api_settings.PROFILING_ENABLED:
+            from .profiling import install_signal_handler
+            install_signal_handler()
\ No newline at end of file
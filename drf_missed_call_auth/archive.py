@@ -0,0 +1,335 @@
+"""
+Archival of expired verification sessions.
+
+`archive_sessions` streams sessions that expired before a cutoff, oldest
+first, from a server-side cursor (`QuerySet.iterator`) into gzip-compressed
+JSON-lines or CSV files in ARCHIVE_DIR, starting a new file every
+ARCHIVE_FILE_ROWS rows. Memory use doesn't depend on the table size: one
+chunk of rows and one open file at a time. With SESSION_SHARDS, the cursors of
+all shards are merged in the same order.
+
+A file is written as '<name>.part' and renamed once complete. Each completed
+file is then recorded in the directory's manifest.json along with the
+watermark: the (expires_at, id) of the last row archived. The next run
+resumes after it, so runs are incremental and an interrupted run loses at
+most the file it was writing.
+
+`delete_archived` deletes, in batches, only sessions at or before the
+watermark. `iter_archive` reads the files back and `import_archive`
+re-inserts them, e.g. to investigate a user's history. Restored ids are
+recorded in the manifest of the directory they came from, and
+`delete_archived` leaves them alone: they stay until deleted by hand.
+"""
+import csv
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import Case, Q, When
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from .models import CallSourceNumber, MissedCallVerification
+from .revocation import DEFAULT_BATCH_SIZE, delete_sessions
+from .settings import api_settings
+from .sharding import db_for_phone, get_shards
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+FORMATS = ('jsonl', 'csv')
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _columns() -> List[str]:
+    fields = [field.attname for field in MissedCallVerification._meta.concrete_fields]
+    # Source numbers may be deleted or renumbered long before the archive is read
+    return [*fields, 'expected_caller__phone_number']
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return str(value)
+
+
+def _get_directory(directory: Optional[str]) -> str:
+    directory = directory or api_settings.ARCHIVE_DIR
+    if not directory:
+        raise ValueError("No archive directory: set MISSEDCALL_AUTH['ARCHIVE_DIR'].")
+    return directory
+
+
+def read_manifest(directory: Optional[str] = None) -> dict:
+    path = os.path.join(_get_directory(directory), MANIFEST)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'watermark': None, 'files': [], 'restored': []}
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    path = os.path.join(directory, MANIFEST)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f'{path}.tmp', path)
+
+
+def _after_watermark(watermark: Optional[dict]) -> Q:
+    if not watermark:
+        return Q()
+    expires_at = parse_datetime(watermark['expires_at'])
+    return Q(expires_at__gt=expires_at) | Q(expires_at=expires_at, id__gt=watermark['id'])
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _RotatingWriter:
+    """Writes rows to compressed files of at most `rows_per_file` rows."""
+
+    def __init__(self, directory: str, fmt: str, rows_per_file: int, columns: List[str], on_rotate):
+        self.directory = directory
+        self.fmt = fmt
+        self.rows_per_file = rows_per_file
+        self.columns = columns
+        self.on_rotate = on_rotate
+        self.prefix = f"sessions-{now().strftime('%Y%m%dT%H%M%S%f')}"
+        self.sequence = 0
+        self.file = None
+
+    def _open(self) -> None:
+        self.sequence += 1
+        self.name = f'{self.prefix}-{self.sequence:04d}.{self.fmt}.gz'
+        self.file = gzip.open(
+            os.path.join(self.directory, f'{self.name}.part'), 'wt',
+            compresslevel=6, encoding='utf-8', newline='',
+        )
+        if self.fmt == 'csv':
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(self.columns)
+        self.rows = 0
+
+    def write(self, row: tuple) -> None:
+        if self.file is None:
+            self._open()
+        values = [_encode(value) for value in row]
+        if self.fmt == 'csv':
+            self.csv.writerow(['' if value is None else value for value in values])
+        else:
+            self.file.write(json.dumps(dict(zip(self.columns, values)), separators=(',', ':')))
+            self.file.write('\n')
+        self.rows += 1
+        self.last = values
+        if self.rows >= self.rows_per_file:
+            self.close()
+
+    def close(self) -> None:
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        path = os.path.join(self.directory, self.name)
+        os.replace(f'{path}.part', path)
+        last = dict(zip(self.columns, self.last))
+        self.on_rotate({'name': self.name, 'rows': self.rows, 'sha256': _sha256(path)}, last)
+
+
+def archive_sessions(
+    directory: Optional[str] = None,
+    before: Optional[datetime] = None,
+    fmt: str = 'jsonl',
+    rows_per_file: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Appends the sessions that expired before `before` (default: ARCHIVE_AFTER_DAYS
+    ago) and after the directory's watermark to new archive files.
+
+    Returns:
+        dict: 'rows' archived, the new 'files' and the 'watermark'.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown archive format '{fmt}', expected one of {', '.join(FORMATS)}.")
+    directory = _get_directory(directory)
+    os.makedirs(directory, exist_ok=True)
+    if before is None:
+        before = now() - timedelta(days=api_settings.ARCHIVE_AFTER_DAYS)
+    manifest = read_manifest(directory)
+    new_files = []
+
+    def on_rotate(entry, last):
+        manifest['files'].append(entry)
+        manifest['watermark'] = {'expires_at': last['expires_at'], 'id': last['id']}
+        _write_manifest(directory, manifest)
+        new_files.append(entry)
+        logger.info(f"Archived {entry['rows']} session(s) to {entry['name']}")
+
+    columns = _columns()
+    shard_rows = [
+        MissedCallVerification.objects.using(db)
+        .filter(_after_watermark(manifest['watermark']), expires_at__lt=before)
+        .order_by('expires_at', 'id')
+        .values_list(*columns)
+        .iterator(chunk_size=chunk_size)
+        for db in get_shards()
+    ]
+    # Merged in (expires_at, id) order, so a single watermark covers every shard
+    expires_at, pk = columns.index('expires_at'), columns.index('id')
+    rows = heapq.merge(*shard_rows, key=lambda row: (row[expires_at], row[pk]))
+    writer = _RotatingWriter(directory, fmt, rows_per_file or api_settings.ARCHIVE_FILE_ROWS, columns, on_rotate)
+    try:
+        for row in rows:
+            writer.write(row)
+        writer.close()
+    finally:
+        if writer.file is not None:
+            # Interrupted: the partial file isn't in the manifest, the next run redoes it
+            writer.file.close()
+
+    return {
+        'rows': sum(entry['rows'] for entry in new_files),
+        'files': new_files,
+        'watermark': manifest['watermark'],
+    }
+
+
+def delete_archived(directory: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Deletes the sessions at or before the directory's watermark, in batches,
+    except those restored from it.
+    """
+    manifest = read_manifest(directory)
+    if not manifest['watermark']:
+        return 0
+    archived = MissedCallVerification.objects.exclude(_after_watermark(manifest['watermark']))
+    if manifest.get('restored'):
+        archived = archived.exclude(pk__in=manifest['restored'])
+    return delete_sessions(archived, batch_size=batch_size)
+
+
+def _record_restored(directory: str, session_ids: set) -> None:
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        logger.warning(
+            f"Restored {len(session_ids)} session(s) from outside an archive directory ({directory}); "
+            "the next archive run deletes them again"
+        )
+        return
+    manifest = read_manifest(directory)
+    manifest['restored'] = sorted(set(manifest.get('restored', [])) | session_ids)
+    _write_manifest(directory, manifest)
+
+
+def _archive_paths(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in read_manifest(path)['files']:
+                yield os.path.join(path, entry['name'])
+        else:
+            yield path
+
+
+def iter_archive(paths: Iterable[str], phone: Optional[str] = None) -> Iterator[dict]:
+    """
+    Yields archived rows as dicts of strings/JSON values, from archive files or
+    whole archive directories (in the order they were written).
+    """
+    for path in _archive_paths(paths):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            if '.csv' in os.path.basename(path):
+                records = csv.DictReader(f)
+            else:
+                records = (json.loads(line) for line in f)
+            for record in records:
+                if phone is None or record['user_phone'] == phone:
+                    yield record
+
+
+def _to_instance(record: dict, callers: dict) -> Optional[MissedCallVerification]:
+    caller_id = callers.get(record.pop('expected_caller__phone_number'))
+    if caller_id is None:
+        return None
+    values = {}
+    for field in MissedCallVerification._meta.concrete_fields:
+        value = record.get(field.attname)
+        # CSV has no NULL
+        if value == '' and field.null:
+            value = None
+        values[field.attname] = field.to_python(value)
+    values['expected_caller_id'] = caller_id
+    return MissedCallVerification(**values)
+
+
+def import_archive(
+    paths: Iterable[str],
+    phone: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Tuple[int, int]:
+    """
+    Re-inserts archived sessions, optionally only those of one phone number.
+    With SESSION_SHARDS they go to their phone's shard (ids archived before
+    sharding don't carry one). Sessions still in the table are left alone.
+    Sessions whose source number no longer exists can't be restored and are
+    skipped. The ids of the sessions restored are added to their archive
+    directory's manifest, so later archive runs don't delete them again.
+
+    Returns:
+        tuple: (rows imported, rows skipped).
+    """
+    callers = dict(CallSourceNumber.objects.values_list('phone_number', 'id'))
+    imported = skipped = 0
+    batch, created, sources = [], {}, {}
+    restored = {}
+
+    def flush():
+        shards = {}
+        for obj in batch:
+            shards.setdefault(db_for_phone(obj.user_phone), []).append(obj)
+        for db, objs in shards.items():
+            existing = set(MissedCallVerification.objects.using(db).filter(
+                pk__in=[obj.pk for obj in objs]
+            ).values_list('pk', flat=True))
+            MissedCallVerification.objects.using(db).bulk_create(objs, ignore_conflicts=True)
+            for obj in objs:
+                if obj.pk not in existing:
+                    restored.setdefault(sources[obj.pk], set()).add(str(obj.pk))
+            # bulk_create() sets auto_now_add fields to the current time
+            MissedCallVerification.objects.using(db).filter(pk__in=[obj.pk for obj in objs]).update(created_at=Case(
+                *[When(pk=obj.pk, then=created[obj.pk]) for obj in objs],
+            ))
+        batch.clear()
+        created.clear()
+        sources.clear()
+
+    for path in _archive_paths(paths):
+        for record in iter_archive([path], phone=phone):
+            obj = _to_instance(record, callers)
+            if obj is None:
+                skipped += 1
+                continue
+            batch.append(obj)
+            created[obj.pk] = obj.created_at
+            sources[obj.pk] = os.path.dirname(path) or '.'
+            imported += 1
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    for directory, session_ids in restored.items():
+        _record_restored(directory, session_ids)
+    return imported, skipped
@@ -0,0 +1,183 @@
+"""
+Failed-verification accounting and lockout.
+
+Every `verification_failed` increments two counters in the shared cache:
+
+- per session, read by the verify path so a session stops accepting guesses
+  after MAX_VERIFICATION_ATTEMPTS, across all workers. It lives until the
+  session expires;
+- per phone over PHONE_FAILURE_WINDOW. Reaching PHONE_MAX_FAILURES locks the
+  phone out of request and verify for LOCKOUT_BASE seconds, doubling with each
+  lockout (up to LOCKOUT_MAX), so guessing through a small pool gets
+  exponentially slower.
+
+`MissedCallVerification.attempt_count` is kept for reporting: per-session
+deltas are buffered in process and written in batches (one
+`UPDATE ... SET attempt_count = attempt_count + n` per distinct n and shard) once
+ATTEMPT_FLUSH_SIZE failures are pending or ATTEMPT_FLUSH_INTERVAL seconds have
+passed, so a failed verify costs no database write. A flush waits for the
+current transaction to commit: with ATOMIC_REQUESTS, the failing verify's
+transaction is rolled back, and the deltas stay pending until the next flush.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .exceptions import VerificationLocked
+from .models import MissedCallVerification
+from .settings import api_settings
+from .sharding import db_for_session, group_sessions
+from .signals import verification_failed, verification_success
+from .tenants import get_tenants
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'drf_missed_call_auth:attempts:session:{}'
+PHONE_KEY = 'drf_missed_call_auth:attempts:phone:{}'
+LOCK_KEY = 'drf_missed_call_auth:attempts:lock:{}'
+LOCKOUTS_KEY = 'drf_missed_call_auth:attempts:lockouts:{}'
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def _incr(key: str, timeout: int) -> int:
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def get_session_failures(session_ids: Iterable) -> Dict:
+    """Returns {session_id: failures} for the sessions that have any."""
+    keys = {SESSION_KEY.format(session_id): session_id for session_id in session_ids}
+    return {keys[key]: count for key, count in cache.get_many(keys).items()}
+
+
+def get_lockout_remaining(phone: str) -> Optional[float]:
+    """Seconds until `phone` is unlocked, or None if it isn't locked."""
+    until = cache.get(LOCK_KEY.format(phone))
+    if until is None:
+        return None
+    remaining = until - time.time()
+    return remaining if remaining > 0 else None
+
+
+def check_lockout(phone: str) -> None:
+    """
+    Raises:
+        VerificationLocked: if `phone` is locked out.
+    """
+    remaining = get_lockout_remaining(phone)
+    if remaining is not None:
+        raise VerificationLocked(wait=remaining)
+
+
+def _session_timeout(expires_at: Optional[datetime]) -> int:
+    """Seconds until the session expires; the longest tenant VALIDITY_PERIOD if unknown."""
+    if expires_at is None:
+        return max(tenant.VALIDITY_PERIOD for tenant in get_tenants())
+    # A timeout of 0 would not store the key at all
+    return max(math.ceil((expires_at - now()).total_seconds()), 1)
+
+
+def record_failure(session_id, phone: str, expires_at: Optional[datetime] = None) -> None:
+    """Counts a failed verification of `session_id` (expiring at `expires_at`) for `phone`."""
+    if session_id is not None:
+        _incr(SESSION_KEY.format(session_id), _session_timeout(expires_at))
+        with _lock:
+            _pending[session_id] += 1
+            due = (
+                sum(_pending.values()) >= api_settings.ATTEMPT_FLUSH_SIZE
+                or time.monotonic() - _last_flush >= api_settings.ATTEMPT_FLUSH_INTERVAL
+            )
+        if due:
+            try:
+                db = db_for_session(session_id)
+            except ValueError:
+                db = None
+            # Runs right away in autocommit mode
+            transaction.on_commit(flush, using=db or router.db_for_write(MissedCallVerification))
+
+    if phone and _incr(PHONE_KEY.format(phone), api_settings.PHONE_FAILURE_WINDOW) >= api_settings.PHONE_MAX_FAILURES:
+        lock_out(phone)
+
+
+def lock_out(phone: str) -> float:
+    """Locks `phone` out for the next exponential window and returns its length."""
+    level = _incr(LOCKOUTS_KEY.format(phone), api_settings.LOCKOUT_MAX)
+    duration = min(api_settings.LOCKOUT_BASE * 2 ** (level - 1), api_settings.LOCKOUT_MAX)
+    cache.set(LOCK_KEY.format(phone), time.time() + duration, duration)
+    # The next lockout needs PHONE_MAX_FAILURES fresh failures
+    cache.delete(PHONE_KEY.format(phone))
+    logger.warning(f"Locked out a phone for {duration:.0f}s after repeated failed verifications")
+    return duration
+
+
+def reset(phone: str) -> None:
+    """Clears failures and lockouts of `phone` (e.g. after a successful verify)."""
+    cache.delete_many([PHONE_KEY.format(phone), LOCK_KEY.format(phone), LOCKOUTS_KEY.format(phone)])
+
+
+def flush() -> int:
+    """
+    Writes pending attempt deltas to the database.
+
+    Returns:
+        int: Number of sessions touched.
+    """
+    global _pending, _last_flush
+    with _lock:
+        batch, _pending = _pending, Counter()
+        _last_flush = time.monotonic()
+
+    by_delta = defaultdict(list)
+    for db, shard_ids in group_sessions(batch).items():
+        for session_id in shard_ids:
+            by_delta[(db, batch[session_id])].append(session_id)
+    for (db, delta), session_ids in by_delta.items():
+        try:
+            # A savepoint, so a failure doesn't break an enclosing transaction
+            with transaction.atomic(using=db or router.db_for_write(MissedCallVerification)):
+                MissedCallVerification.objects.using(db).filter(id__in=session_ids).update(
+                    attempt_count=F('attempt_count') + delta
+                )
+        except Exception as e:
+            logger.error(f"Failed to flush attempt counts for {len(session_ids)} session(s): {e}", exc_info=True)
+    return len(batch)
+
+
+def discard() -> None:
+    """Drops pending deltas without writing them (e.g. in a freshly forked worker)."""
+    global _pending
+    with _lock:
+        _pending = Counter()
+
+
+atexit.register(flush)
+
+
+@receiver(verification_failed)
+def _record_failure(sender, session_id=None, phone_number=None, verification_instance=None, **kwargs):
+    record_failure(session_id, phone_number, getattr(verification_instance, 'expires_at', None))
+
+
+@receiver(verification_success)
+def _reset_on_success(sender, verification_instance, **kwargs):
+    reset(verification_instance.user_phone)
@@ -0,0 +1,214 @@
+"""
+Structured audit trail.
+
+Views and signal receivers append small event dicts (request, dispatch,
+verify success/failure, expiry) to an in-memory ring buffer of
+AUDIT_BUFFER_SIZE entries. The buffer is handed to the backend in one batch
+once AUDIT_FLUSH_SIZE events are pending or AUDIT_FLUSH_INTERVAL seconds have
+passed, and at interpreter exit. If the backend falls behind, the oldest
+events are dropped (and counted) rather than slowing the request path.
+A due batch is written once the current transaction commits: a request
+rolled back under ATOMIC_REQUESTS (a failed verify) leaves its events, and
+everyone else's, buffered for the next flush.
+
+Backends (AUDIT_BACKEND):
+
+- `DatabaseAuditBackend` (default): one `bulk_create` into `AuditEvent`.
+- `JSONLinesAuditBackend`: appends one JSON object per line to AUDIT_LOG_FILE.
+
+Phone numbers are masked with `sanitize_phone_for_logging` before buffering.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from django.core.signals import setting_changed
+from django.db import router, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from .models import AuditEvent, AuditEventType
+from .settings import api_settings
+from .signals import missed_call_sent, sessions_revoked
+from .utils import get_client_ip, sanitize_phone_for_logging
+
+logger = logging.getLogger(__name__)
+
+
+class BaseAuditBackend:
+    """Interface for audit backends."""
+
+    def write(self, events: List[dict]) -> None:
+        raise NotImplementedError
+
+
+class DatabaseAuditBackend(BaseAuditBackend):
+    def write(self, events: List[dict]) -> None:
+        db = router.db_for_write(AuditEvent)
+        # A savepoint, so a failure doesn't break an enclosing transaction
+        with transaction.atomic(using=db):
+            AuditEvent.objects.using(db).bulk_create([AuditEvent(**event) for event in events], batch_size=500)
+
+
+class JSONLinesAuditBackend(BaseAuditBackend):
+    """Appends events to AUDIT_LOG_FILE, one JSON object per line."""
+
+    def __init__(self):
+        self.path = api_settings.AUDIT_LOG_FILE
+        self._lock = threading.Lock()
+
+    def write(self, events: List[dict]) -> None:
+        lines = ''.join(json.dumps(event, default=str, separators=(',', ':')) + '\n' for event in events)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            # One write per batch keeps lines from concurrent writers whole
+            f.write(lines)
+
+
+_lock = threading.Lock()
+_buffer: Optional[deque] = None
+_dropped = 0
+_last_flush = time.monotonic()
+_backend = None
+
+
+def get_audit_backend() -> BaseAuditBackend:
+    global _backend
+    if _backend is None:
+        _backend = import_string(api_settings.AUDIT_BACKEND)()
+    return _backend
+
+
+def record(event: str, session_id=None, phone: str = '', request=None, **fields) -> None:
+    """
+    Buffers an audit event.
+
+    Args:
+        event: An `AuditEventType` value.
+        phone: Raw phone number; stored masked.
+        request: Optional request to take the IP address and user agent from.
+        fields: Other `AuditEvent` fields (app_signature, status_code,
+            duration_ms); anything else goes into `data`.
+    """
+    global _buffer, _dropped
+    if not api_settings.AUDIT_ENABLED:
+        return
+
+    entry = {
+        'event': event,
+        'session_id': session_id,
+        'phone': sanitize_phone_for_logging(phone or ''),
+        'created_at': now(),
+        'ip_address': fields.pop('ip_address', None),
+        'user_agent': '',
+        'app_signature': fields.pop('app_signature', '') or '',
+        'status_code': fields.pop('status_code', None),
+        'duration_ms': fields.pop('duration_ms', None),
+    }
+    if request is not None:
+        entry['ip_address'] = get_client_ip(request)
+        entry['user_agent'] = request.META.get('HTTP_USER_AGENT', '')[:255]
+    entry['data'] = fields
+
+    with _lock:
+        if _buffer is None:
+            _buffer = deque(maxlen=api_settings.AUDIT_BUFFER_SIZE)
+        if len(_buffer) == _buffer.maxlen:
+            _dropped += 1
+        _buffer.append(entry)
+        due = (
+            len(_buffer) >= api_settings.AUDIT_FLUSH_SIZE
+            or time.monotonic() - _last_flush >= api_settings.AUDIT_FLUSH_INTERVAL
+        )
+    if due:
+        # Runs right away in autocommit mode
+        transaction.on_commit(flush, using=router.db_for_write(AuditEvent))
+
+
+def record_request(event: str, request, started: float, status_code: int, session=None, **fields) -> None:
+    """Records an API call of the request/verify endpoints, timed from `started` (monotonic)."""
+    # After a parse error DRF leaves request.data empty
+    data = request.data if hasattr(request.data, 'get') else {}
+    record(
+        event,
+        session_id=session.pk if session is not None else None,
+        phone=session.user_phone if session is not None else str(data.get('phone_number', '')),
+        request=request,
+        app_signature=session.app_signature if session is not None else str(data.get('app_signature', ''))[:255],
+        status_code=status_code,
+        duration_ms=int((time.monotonic() - started) * 1000),
+        **fields
+    )
+
+
+def flush() -> int:
+    """
+    Hands all buffered events to the backend.
+
+    Returns:
+        int: Number of events written.
+    """
+    global _dropped, _last_flush
+    with _lock:
+        events = list(_buffer or ())
+        if _buffer is not None:
+            _buffer.clear()
+        dropped, _dropped = _dropped, 0
+        _last_flush = time.monotonic()
+
+    if dropped:
+        logger.warning(f"Audit buffer overflowed; {dropped} event(s) dropped")
+    if not events:
+        return 0
+    try:
+        get_audit_backend().write(events)
+    except Exception as e:
+        logger.error(f"Failed to write {len(events)} audit event(s): {e}", exc_info=True)
+        return 0
+    return len(events)
+
+
+def discard() -> None:
+    """Drops buffered events without writing them (e.g. in a freshly forked worker)."""
+    global _dropped
+    with _lock:
+        if _buffer is not None:
+            _buffer.clear()
+        _dropped = 0
+
+
+atexit.register(flush)
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend, _buffer
+    if setting == 'MISSEDCALL_AUTH':
+        _backend = None
+        with _lock:
+            # Pending events go to the new backend on the next flush
+            if _buffer is not None:
+                _buffer = deque(_buffer, maxlen=api_settings.AUDIT_BUFFER_SIZE)
+
+
+@receiver(missed_call_sent)
+def _audit_dispatch(sender, verification_instance, **kwargs):
+    record(
+        AuditEventType.DISPATCH,
+        session_id=verification_instance.pk,
+        phone=verification_instance.user_phone,
+        ip_address=verification_instance.ip_address,
+        app_signature=verification_instance.app_signature,
+        caller=sanitize_phone_for_logging(verification_instance.expected_caller.phone_number),
+        provider_call_id=verification_instance.provider_call_id,
+    )
+
+
+@receiver(sessions_revoked)
+def _audit_expired(sender, session_ids, **kwargs):
+    for session_id in session_ids:
+        record(AuditEventType.EXPIRED, session_id=session_id)
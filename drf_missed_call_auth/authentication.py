@@ -1,6 +1,9 @@
 from django.utils.translation import gettext_lazy as _
 from rest_framework import authentication, exceptions
+from . import sharding
 from .models import MissedCallVerification
+from .profiling import profiled
+from .settings import api_settings
 
 
 class MissedCallSessionAuthentication(authentication.BaseAuthentication):
@@ -10,6 +13,7 @@ class MissedCallSessionAuthentication(authentication.BaseAuthentication):
     temporary bearer token for subsequent API requests.
     """
 
+    @profiled('authenticate')
     def authenticate(self, request):
         # We look for 'X-MissedCall-Session' in the headers
         session_id = request.META.get('HTTP_X_MISSEDCALL_SESSION')
@@ -18,10 +22,7 @@ class MissedCallSessionAuthentication(authentication.BaseAuthentication):
 
         try:
             # Fetch the session and ensure it is actually verified
-            session = MissedCallVerification.objects.get(
-                id=session_id,
-                is_verified=True
-            )
+            session = self.get_session(session_id)
         except (MissedCallVerification.DoesNotExist, ValueError):
             raise exceptions.AuthenticationFailed(_('Invalid or missing verification session.'))
 
@@ -34,5 +35,25 @@ class MissedCallSessionAuthentication(authentication.BaseAuthentication):
         # but request.auth will be the session object.
         return (None, session)
 
+    def get_session(self, session_id):
+        """
+        Reads the session from the replica when one is configured (see
+        `routers.py`), falling back to the primary if replication lag hides it.
+        With SESSION_SHARDS, it is read from the shard its id points to.
+        """
+        if sharding.is_enabled():
+            return MissedCallVerification.objects.using(sharding.db_for_session(session_id)).get(
+                id=session_id, is_verified=True
+            )
+        manager = MissedCallVerification.objects.db_manager(hints={'session_id': session_id})
+        try:
+            return manager.get(id=session_id, is_verified=True)
+        except MissedCallVerification.DoesNotExist:
+            if not api_settings.READ_REPLICA_ALIAS:
+                raise
+        return MissedCallVerification.objects.db_manager(hints={'primary': True}).get(
+            id=session_id, is_verified=True
+        )
+
     def authenticate_header(self, request):
         return 'X-MissedCall-Session'
\ No newline at end of file
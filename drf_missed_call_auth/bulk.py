@@ -0,0 +1,302 @@
+"""
+Bulk verification requests for server-to-server onboarding.
+
+`request_verifications` starts verification for a list of phones of one app
+and yields one result per phone as soon as it is known:
+
+1. All phones are normalized, validated, de-duplicated and screened (risk
+   stage, lockouts) in one pass; rejected phones are reported right away.
+2. The last caller of every phone is read in a few `IN` queries, and each
+   phone leases the source number of the tenant's pool that is free the
+   soonest. A source number places at most CAPACITY_CALLS_PER_NUMBER_PER_MINUTE
+   calls per minute, so each phone gets a dispatch time; phones that would
+   wait more than BULK_MAX_DELAY seconds are rejected instead.
+3. The sessions are inserted with `bulk_create`, valid from their dispatch
+   time.
+4. Calls are placed by BULK_DISPATCH_CONCURRENCY threads, which only talk to
+   the provider; provider call ids are written back in bulk, and sessions
+   whose call failed are deleted. If the consumer stops early, calls not
+   started yet are cancelled and their sessions deleted.
+
+The pacing applies within one batch: it doesn't account for calls the same
+numbers place for other requests at the same time.
+"""
+import heapq
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.utils.timezone import now
+from rest_framework.exceptions import APIException
+
+from .attempts import check_lockout
+from .capacity import record_exhaustion
+from .inbound import is_inbound
+from .leases import acquire_lease, get_active_pool, invalidate_pool, release_lease
+from .models import CallSourceNumber, MissedCallVerification
+from .risk import assess_destination
+from .routers import pin_to_primary
+from .settings import api_settings
+from .sharding import db_for_phone, group_phones, make_session_id
+from .signals import missed_call_sent
+from .tenants import Tenant, resolve_tenant
+from .utils import get_gateway, normalize_phone_number, validate_app_signature
+from .validators import phone_number_validator
+
+logger = logging.getLogger(__name__)
+
+SENT = 'sent'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+# Phones per last-caller query
+LOOKUP_BATCH = 500
+
+
+def get_authorized_tenant(app_signature: str) -> Optional[Tenant]:
+    """The tenant of `app_signature`, or None if the signature isn't allowed."""
+    tenant = resolve_tenant(app_signature)
+    if tenant.is_default and not validate_app_signature(app_signature):
+        return None
+    return tenant
+
+
+class _Item:
+    __slots__ = ('index', 'phone', 'caller', 'not_before', 'session')
+
+    def __init__(self, index: int, phone: str):
+        self.index = index
+        self.phone = phone
+        self.caller = None
+        self.not_before = None
+        self.session = None
+
+
+def _result(index: int, phone: str, status: str, error: str = '', session=None) -> dict:
+    result = {'index': index, 'phone_number': phone, 'status': status}
+    if session is not None:
+        result['session_id'] = str(session.pk)
+        result['expires_at'] = session.expires_at.isoformat()
+    if error:
+        result['error'] = error
+    return result
+
+
+def request_verifications(
+    phones: Iterable[str],
+    app_signature: str,
+    ip_address: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Starts a verification for every phone in `phones`.
+
+    The batch itself is checked eagerly; per-phone results are produced as the
+    returned iterator is consumed. Each result has the phone's 'index' in the
+    input, its normalized 'phone_number' and a 'status': 'sent' (with
+    'session_id' and 'expires_at'), 'rejected' or 'failed' (with an 'error'
+    code).
+
+    Raises:
+        ValueError: if the signature isn't allowed, belongs to an inbound
+            tenant (its users have to place the calls) or the batch is too large.
+    """
+    tenant = get_authorized_tenant(app_signature)
+    if tenant is None:
+        raise ValueError("App signature is not allowed.")
+    if is_inbound(tenant):
+        raise ValueError("Bulk requests are not available in inbound mode.")
+    phones = list(phones)
+    if len(phones) > api_settings.BULK_MAX_PHONES:
+        raise ValueError(f"At most {api_settings.BULK_MAX_PHONES} phone numbers per batch.")
+    return _run(phones, app_signature, tenant, ip_address, concurrency or api_settings.BULK_DISPATCH_CONCURRENCY)
+
+
+def _screen(phones: List[str]):
+    """Splits the batch into accepted items and rejection results."""
+    items, rejected, seen = [], [], set()
+    for index, raw in enumerate(phones):
+        phone = normalize_phone_number(str(raw))
+        try:
+            phone_number_validator(phone)
+        except ValidationError:
+            rejected.append(_result(index, phone, REJECTED, 'invalid_phone_number'))
+            continue
+        if phone in seen:
+            rejected.append(_result(index, phone, REJECTED, 'duplicate'))
+            continue
+        seen.add(phone)
+        try:
+            assess_destination(phone)
+            check_lockout(phone)
+        except APIException as e:
+            rejected.append(_result(index, phone, REJECTED, e.default_code))
+            continue
+        items.append(_Item(index, phone))
+    return items, rejected
+
+
+def _last_callers(phones: List[str]) -> dict:
+    """{phone: phone number of the caller of its latest session}"""
+    last = {}
+    for db, shard_phones in group_phones(phones).items():
+        for start in range(0, len(shard_phones), LOOKUP_BATCH):
+            rows = MissedCallVerification.objects.using(db).filter(
+                user_phone__in=shard_phones[start:start + LOOKUP_BATCH]
+            ).order_by('-created_at').values_list('user_phone', 'expected_caller__phone_number')
+            for phone, number in rows:
+                last.setdefault(phone, number)
+    return last
+
+
+def _schedule(items: List[_Item], tenant: Tenant, started: float):
+    """
+    Leases a caller and a dispatch time to every item, spreading the batch
+    over the pool at the per-number rate cap.
+    """
+    interval = 60 / max(1, api_settings.CAPACITY_CALLS_PER_NUMBER_PER_MINUTE)
+    horizon = started + api_settings.BULK_MAX_DELAY
+    last_callers = _last_callers([item.phone for item in items])
+    # (next free slot, source id, number) for every number of the pool
+    slots = [(started, pk, number) for pk, number in get_active_pool(tenant.name)]
+    heapq.heapify(slots)
+
+    scheduled, rejected = [], []
+    for item in items:
+        skipped, slot = [], None
+        while slots and slots[0][0] <= horizon:
+            candidate = heapq.heappop(slots)
+            _at, source_id, number = candidate
+            if number != last_callers.get(item.phone) and acquire_lease(
+                item.phone, source_id, tenant.VALIDITY_PERIOD + api_settings.BULK_MAX_DELAY
+            ):
+                slot = candidate
+                break
+            skipped.append(candidate)
+        for candidate in skipped:
+            heapq.heappush(slots, candidate)
+
+        if slot is None:
+            record_exhaustion(tenant.name)
+            # Busy for longer than BULK_MAX_DELAY, or no number left for this phone
+            error = 'capacity_exceeded' if slots and slots[0][0] > horizon else 'pool_exhausted'
+            rejected.append(_result(item.index, item.phone, REJECTED, error))
+            continue
+        at, source_id, number = slot
+        heapq.heappush(slots, (at + interval, source_id, number))
+        item.caller, item.not_before = source_id, at
+        scheduled.append(item)
+
+    # One query for all leased numbers; drop the ones gone since the pool was cached
+    callers = CallSourceNumber.objects.filter(is_active=True, tenant=tenant.name).in_bulk(
+        {item.caller for item in scheduled}
+    )
+    if len(callers) < len({item.caller for item in scheduled}):
+        invalidate_pool(tenant.name)
+    ready = []
+    for item in scheduled:
+        caller = callers.get(item.caller)
+        if caller is None:
+            release_lease(item.phone, item.caller)
+            rejected.append(_result(item.index, item.phone, REJECTED, 'pool_exhausted'))
+            continue
+        item.caller = caller
+        ready.append(item)
+    return ready, rejected
+
+
+def _by_shard(sessions: List[MissedCallVerification]) -> dict:
+    """{shard: [sessions]}"""
+    groups = {}
+    for session in sessions:
+        groups.setdefault(db_for_phone(session.user_phone), []).append(session)
+    return groups
+
+
+def _create_sessions(items: List[_Item], app_signature: str, tenant: Tenant, ip_address: Optional[str], started: float):
+    timestamp = now()
+    for item in items:
+        # Valid from the dispatch time, not from the batch start
+        expires_at = timestamp + timedelta(seconds=item.not_before - started + tenant.VALIDITY_PERIOD)
+        item.session = MissedCallVerification(
+            # bulk_create doesn't go through save(), which picks the shard
+            id=make_session_id(item.phone),
+            user_phone=item.phone,
+            app_signature=app_signature,
+            expected_caller=item.caller,
+            ip_address=ip_address,
+            expires_at=expires_at,
+        )
+    try:
+        for db, sessions in _by_shard([item.session for item in items]).items():
+            MissedCallVerification.objects.using(db).bulk_create(sessions, batch_size=500)
+    except Exception:
+        for item in items:
+            release_lease(item.phone, item.caller.pk)
+        raise
+    pin_to_primary(*[item.session.pk for item in items])
+
+
+def _dispatch(item: _Item, tenant: Tenant) -> bool:
+    """Runs in a worker thread: waits for the item's slot and places the call."""
+    delay = item.not_before - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    try:
+        return get_gateway(tenant).dispatch(item.session, save=False)
+    except Exception:
+        logger.exception(f"Bulk dispatch of session {item.session.pk} raised")
+        return False
+
+
+def _run(phones: List[str], app_signature: str, tenant: Tenant, ip_address: Optional[str], concurrency: int):
+    started = time.monotonic()
+    items, rejected = _screen(phones)
+    yield from rejected
+    items, rejected = _schedule(items, tenant, started)
+    yield from rejected
+    if not items:
+        return
+    _create_sessions(items, app_signature, tenant, ip_address, started)
+
+    sent, failed, cancelled = [], [], []
+
+    def settle(item: _Item, call_sent: bool) -> dict:
+        if call_sent:
+            sent.append(item.session)
+            missed_call_sent.send(sender=request_verifications, verification_instance=item.session)
+            return _result(item.index, item.phone, SENT, session=item.session)
+        failed.append(item)
+        release_lease(item.phone, item.caller.pk)
+        return _result(item.index, item.phone, FAILED, 'telephony_unavailable')
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {pool.submit(_dispatch, item, tenant): item for item in items}
+    settled = set()
+    try:
+        for future in as_completed(futures):
+            settled.add(future)
+            yield settle(futures[future], future.result())
+    finally:
+        # The consumer may have gone away mid-stream: calls that haven't
+        # started are dropped, the ones placed meanwhile are still accounted for
+        pool.shutdown(cancel_futures=True)
+        for future, item in futures.items():
+            if future in settled:
+                continue
+            if future.cancelled():
+                cancelled.append(item)
+                release_lease(item.phone, item.caller.pk)
+            else:
+                settle(item, future.result())
+        for db, sessions in _by_shard([session for session in sent if session.provider_call_id]).items():
+            MissedCallVerification.objects.using(db).bulk_update(sessions, ['provider_call_id'], batch_size=500)
+        for db, sessions in _by_shard([item.session for item in failed + cancelled]).items():
+            MissedCallVerification.objects.using(db).filter(pk__in=[session.pk for session in sessions]).delete()
+        logger.info(
+            f"Bulk request: {len(sent)} sent, {len(failed)} failed, {len(cancelled)} cancelled, "
+            f"{len(phones) - len(items)} rejected"
+        )
@@ -0,0 +1,162 @@
+"""
+Capacity planning for the caller-ID pool.
+
+Every dispatched call increments two per-minute counters in the shared cache:
+one for the tenant's pool and one for the source number. Requests that found
+no available sender increment the tenant's exhaustion counter. Recording is
+O(1); reads sum the last CAPACITY_WINDOW seconds of complete minutes.
+
+Capacity is the number of active numbers times CAPACITY_CALLS_PER_NUMBER_PER_MINUTE
+(the rate a number can place calls before carriers start filtering it). From
+the observed rate and its trend (least-squares slope over the window) the
+report projects how long until the pool saturates.
+
+Surfaced through `manage.py check --deploy --database default` and
+`manage.py missedcall_capacity`.
+"""
+import time
+from typing import List, Optional
+
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from .models import CallSourceNumber
+from .settings import api_settings
+from .signals import missed_call_sent
+from .tenants import DEFAULT_TENANT
+
+CALLS_KEY = 'drf_missed_call_auth:capacity:calls:{}:{}'
+EXHAUSTED_KEY = 'drf_missed_call_auth:capacity:exhausted:{}:{}'
+POOL = 'pool:{}'
+
+
+def _minute(timestamp: Optional[float] = None) -> int:
+    return int((timestamp if timestamp is not None else time.time()) // 60)
+
+
+def _window_minutes() -> List[int]:
+    """Complete minutes inside the window, oldest first."""
+    current = _minute()
+    size = max(1, api_settings.CAPACITY_WINDOW // 60)
+    return list(range(current - size, current))
+
+
+def _incr(key: str) -> None:
+    # Buckets outlive the window by two minutes, then expire on their own
+    timeout = api_settings.CAPACITY_WINDOW + 120
+    if not cache.add(key, 1, timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, timeout)
+
+
+def record_call(source_id: int, tenant: str = DEFAULT_TENANT) -> None:
+    minute = _minute()
+    _incr(CALLS_KEY.format(POOL.format(tenant), minute))
+    _incr(CALLS_KEY.format(source_id, minute))
+
+
+def record_exhaustion(tenant: str = DEFAULT_TENANT) -> None:
+    """Counts a request that failed because no sender was available."""
+    _incr(EXHAUSTED_KEY.format(tenant, _minute()))
+
+
+def _series(key_template: str, minutes: List[int]) -> List[int]:
+    keys = [key_template.format(minute) for minute in minutes]
+    values = cache.get_many(keys)
+    return [values.get(key, 0) for key in keys]
+
+
+def _slope(series: List[int]) -> float:
+    """Least-squares slope of a per-minute series, in calls/minute per minute."""
+    n = len(series)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(series) / n
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(series))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
+
+
+class PoolCapacity:
+    """Snapshot of pool usage over the sliding window."""
+
+    def __init__(self, active_numbers: int, series: List[int], exhausted: int, numbers: Optional[list] = None):
+        self.active_numbers = active_numbers
+        self.per_number_cap = api_settings.CAPACITY_CALLS_PER_NUMBER_PER_MINUTE
+        self.capacity = active_numbers * self.per_number_cap
+        self.rate = sum(series) / len(series) if series else 0.0
+        self.peak_rate = max(series, default=0)
+        self.trend = _slope(series)
+        self.exhausted = exhausted
+        # [(CallSourceNumber, calls per minute)], only when requested
+        self.numbers = numbers or []
+
+    @property
+    def headroom(self) -> float:
+        """Calls per minute the pool can still absorb."""
+        return self.capacity - self.rate
+
+    @property
+    def utilization(self) -> float:
+        if not self.capacity:
+            return 1.0 if self.rate else 0.0
+        return self.rate / self.capacity
+
+    @property
+    def minutes_to_saturation(self) -> Optional[float]:
+        """Linear projection of the trend; None if usage is not growing."""
+        if self.headroom <= 0:
+            return 0.0
+        if self.trend <= 0:
+            return None
+        return self.headroom / self.trend
+
+    @property
+    def saturated_numbers(self) -> list:
+        return [number for number, rate in self.numbers if rate >= self.per_number_cap]
+
+    def as_dict(self, top: Optional[int] = None) -> dict:
+        """The report as JSON-compatible values, listing at most `top` numbers."""
+        return {
+            'active_numbers': self.active_numbers,
+            'capacity_per_minute': self.capacity,
+            'rate_per_minute': round(self.rate, 2),
+            'peak_rate_per_minute': self.peak_rate,
+            'headroom_per_minute': round(self.headroom, 2),
+            'utilization': round(self.utilization, 4),
+            'trend_per_minute': round(self.trend, 4),
+            'minutes_to_saturation': self.minutes_to_saturation,
+            'exhausted_requests': self.exhausted,
+            'saturated_numbers': len(self.saturated_numbers),
+            'numbers': [
+                {'phone_number': number.phone_number, 'label': number.label, 'rate_per_minute': round(rate, 2)}
+                for number, rate in self.numbers[:top]
+            ],
+        }
+
+
+def get_pool_capacity(include_numbers: bool = False, tenant: str = DEFAULT_TENANT) -> PoolCapacity:
+    """Builds a capacity snapshot for the tenant's active pool (one query)."""
+    minutes = _window_minutes()
+    pool = CallSourceNumber.objects.get_active_pool(tenant)
+    series = _series(CALLS_KEY.format(POOL.format(tenant), '{}'), minutes)
+    exhausted = sum(_series(EXHAUSTED_KEY.format(tenant, '{}'), minutes))
+
+    if not include_numbers:
+        return PoolCapacity(pool.count(), series, exhausted)
+
+    numbers = []
+    for number in pool.only('id', 'phone_number', 'label'):
+        calls = _series(CALLS_KEY.format(number.pk, '{}'), minutes)
+        numbers.append((number, sum(calls) / len(minutes)))
+    numbers.sort(key=lambda item: item[1], reverse=True)
+    return PoolCapacity(len(numbers), series, exhausted, numbers)
+
+
+@receiver(missed_call_sent)
+def _record_sent(sender, verification_instance, **kwargs):
+    record_call(verification_instance.expected_caller_id, verification_instance.tenant.name)
@@ -0,0 +1,207 @@
+"""
+Runtime configuration.
+
+With DYNAMIC_CONFIG_ENABLED, rows of `DynamicSetting` override MISSEDCALL_AUTH
+without restarting workers. Saving or deleting a row publishes a snapshot of
+all rows to the cache, versioned by a hash of its content. At the start of a
+request each worker reads that one key, at most every
+DYNAMIC_CONFIG_POLL_INTERVAL seconds; when the version differs it swaps the
+values into `api_settings` in one assignment and rebuilds what is derived from
+them (tenant signature map, risk prefix table) before going on. The request
+path never takes a lock: only the worker applying a new version does.
+
+Settings describing the deployment itself (credentials, database aliases,
+this feature's own switches) can't be overridden, nor can those only read at
+startup (endpoint switches, the profiler's signal hook).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started, setting_changed
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DynamicSetting
+from .settings import DEFAULTS, api_settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'drf_missed_call_auth:config:snapshot'
+
+STATIC_SETTINGS = frozenset({
+    'DYNAMIC_CONFIG_ENABLED',
+    'DYNAMIC_CONFIG_POLL_INTERVAL',
+    'COMPACT_STORAGE',
+    'PROFILING_DUMP_SIGNAL',
+    'SESSION_SHARDS',
+    'TWILIO_ACCOUNT_SID',
+    'TWILIO_AUTH_TOKEN',
+    'PRIMARY_DB_ALIAS',
+    'READ_REPLICA_ALIAS',
+    # Read once, when the URLconf is imported or the app loads
+    'ENABLE_BULK_ENDPOINT',
+    'ENABLE_STATUS_ENDPOINT',
+    'ENABLE_EVENT_STREAM',
+    'PROFILING_ENABLED',
+})
+
+_lock = threading.Lock()
+_version: Optional[str] = None
+_next_poll = 0.0
+
+
+def is_dynamic(key: str) -> bool:
+    """Whether `key` may be overridden through `DynamicSetting`."""
+    return key in DEFAULTS and key not in STATIC_SETTINGS
+
+
+def check_value(key: str, value) -> Optional[str]:
+    """
+    Returns why `value` can't be used for `key` (it must have the JSON type of
+    the default), or None if it can. Settings defaulting to None take any value.
+    """
+    default = DEFAULTS[key]
+    if default is None:
+        return None
+    if isinstance(default, bool):
+        valid = isinstance(value, bool)
+    elif isinstance(default, int):
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif isinstance(default, float):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif isinstance(default, (list, tuple)):
+        valid = isinstance(value, list)
+    else:
+        valid = isinstance(value, type(default))
+    if valid:
+        return None
+    expected = 'list' if isinstance(default, tuple) else type(default).__name__
+    return f"{key} must be a {expected}, not {type(value).__name__}."
+
+
+def get_version() -> Optional[str]:
+    """Version of the snapshot applied in this process, if any."""
+    return _version
+
+
+def publish() -> dict:
+    """Stores a snapshot of the `DynamicSetting` table for workers to pick up."""
+    values = {
+        key: value
+        for key, value in DynamicSetting.objects.values_list('key', 'value')
+        if is_dynamic(key)
+    }
+    encoded = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    snapshot = {'version': hashlib.sha1(encoded.encode()).hexdigest(), 'values': values}
+    cache.set(SNAPSHOT_KEY, snapshot, None)
+    return snapshot
+
+
+def poll(force: bool = False) -> bool:
+    """
+    Applies the published snapshot if its version is new to this process.
+    Reads the cache at most every DYNAMIC_CONFIG_POLL_INTERVAL seconds unless
+    `force` is set.
+
+    Returns:
+        bool: True if new values were applied.
+    """
+    global _next_poll
+    if not api_settings.DYNAMIC_CONFIG_ENABLED:
+        return False
+    current = time.monotonic()
+    if not force and current < _next_poll:
+        return False
+    _next_poll = current + api_settings.DYNAMIC_CONFIG_POLL_INTERVAL
+
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        # Never published, or the cache was flushed: rebuild it from the table
+        try:
+            snapshot = publish()
+        except DatabaseError as e:
+            logger.error(f"Failed to load dynamic settings: {e}")
+            return False
+    if snapshot['version'] == _version:
+        return False
+    return apply(snapshot)
+
+
+def apply(snapshot: dict) -> bool:
+    """
+    Swaps `snapshot['values']` into `api_settings` and rebuilds derived
+    structures. Values of the wrong type are skipped, and values that fail
+    validation are rolled back; both are logged.
+    """
+    global _version
+    with _lock:
+        if snapshot['version'] == _version:
+            return False
+        values = {}
+        for key, value in snapshot['values'].items():
+            error = check_value(key, value)
+            if error:
+                logger.error(f"Skipped dynamic setting in version {snapshot['version'][:12]}: {error}")
+            else:
+                values[key] = value
+        previous = dict(api_settings._overrides)
+        _swap(values)
+        try:
+            _warm()
+        except ImproperlyConfigured as e:
+            logger.error(f"Rejected dynamic settings version {snapshot['version'][:12]}: {e}")
+            _swap(previous)
+            # Don't retry the same version on every poll
+            _version = snapshot['version']
+            return False
+        _version = snapshot['version']
+    logger.info(f"Applied dynamic settings version {_version[:12]} ({len(values)} override(s))")
+    return True
+
+
+def reset() -> None:
+    """Drops runtime overrides in this process (e.g. between tests)."""
+    global _version, _next_poll
+    with _lock:
+        _swap({})
+        _version, _next_poll = None, 0.0
+
+
+def _swap(values: dict) -> None:
+    api_settings.apply_overrides(values)
+    # The same notification `override_settings` sends: every module caching
+    # something derived from MISSEDCALL_AUTH drops it
+    setting_changed.send(
+        sender=DynamicSetting,
+        setting='MISSEDCALL_AUTH',
+        value=getattr(settings, 'MISSEDCALL_AUTH', {}),
+        enter=True,
+    )
+
+
+def _warm() -> None:
+    """Rebuilds derived structures now rather than on the next request."""
+    from .risk import get_prefix_table
+    from .tenants import get_tenants
+
+    get_tenants()
+    get_prefix_table()
+
+
+@receiver(request_started)
+def _poll_on_request(sender, **kwargs):
+    poll()
+
+
+@receiver(post_save, sender=DynamicSetting)
+@receiver(post_delete, sender=DynamicSetting)
+def _publish_on_change(sender, **kwargs):
+    transaction.on_commit(publish)
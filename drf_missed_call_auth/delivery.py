@@ -0,0 +1,78 @@
+"""
+Ingestion of provider call-status callbacks.
+
+Status events arrive out of order and are frequently redelivered, so updates
+are idempotent: a session's `delivery_status` only ever moves forward (see
+`DeliveryStatus.rank`). A batch of events costs one SELECT plus a locking
+SELECT and an UPDATE per distinct target status, regardless of how many calls
+it covers (per shard holding any of them, with SESSION_SHARDS). Signals are
+sent only for the sessions whose status moved.
+"""
+import logging
+from collections import defaultdict
+from typing import Iterable, Tuple
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import DELIVERY_STATUS_RANKS, DeliveryStatus, MissedCallVerification
+from .sharding import fan_out
+from .signals import delivery_status_changed
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_status_events(events: Iterable[Tuple[str, str]]) -> int:
+    """
+    Applies `(provider_call_id, status)` events to their sessions.
+
+    Unknown statuses and call ids are ignored. When several events target the
+    same call, the most advanced status wins.
+
+    Returns:
+        int: Number of sessions whose delivery status changed.
+    """
+    latest = {}
+    for call_id, status in events:
+        if not call_id or status not in DELIVERY_STATUS_RANKS:
+            continue
+        if DeliveryStatus.rank(status) > DeliveryStatus.rank(latest.get(call_id, '')):
+            latest[call_id] = status
+
+    if not latest:
+        return 0
+
+    # Call ids don't tell the shard; every shard is asked at once
+    current = fan_out(lambda db: list(MissedCallVerification.objects.using(db).filter(
+        provider_call_id__in=list(latest)
+    ).values_list('id', 'provider_call_id', 'delivery_status')))
+
+    by_status = defaultdict(list)
+    for db, rows in current.items():
+        for session_id, call_id, status in rows:
+            if DeliveryStatus.rank(latest[call_id]) > DeliveryStatus.rank(status):
+                by_status[(db, latest[call_id])].append(session_id)
+
+    changed = []
+    total = 0
+    timestamp = now()
+    for db in {db for db, _status in by_status}:
+        with transaction.atomic(using=db):
+            for (shard, status), session_ids in by_status.items():
+                if shard != db:
+                    continue
+                # Re-check the rank in SQL so concurrent deliveries can't regress
+                # it, and lock the rows that move so only they are reported
+                lower = [s for s, r in DELIVERY_STATUS_RANKS.items() if r < DeliveryStatus.rank(status)]
+                behind = MissedCallVerification.objects.using(db).filter(id__in=session_ids, delivery_status__in=lower)
+                moved = list(behind.select_for_update().values_list('id', flat=True))
+                if not moved:
+                    continue
+                total += behind.filter(id__in=moved).update(delivery_status=status, delivery_updated_at=timestamp)
+                changed.extend((session_id, status) for session_id in moved)
+
+    for session_id, status in changed:
+        delivery_status_changed.send(sender=MissedCallVerification, session_id=session_id, status=status)
+
+    logger.debug(f"Ingested {len(latest)} status event(s), {total} session(s) updated")
+    return total
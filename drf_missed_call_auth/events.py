@@ -0,0 +1,156 @@
+"""
+Publish/subscribe of per-session verification events.
+
+Package signals are translated into small JSON-serialisable events and
+published under the session id. Streaming endpoints (see `streaming.py`)
+subscribe to one session and forward its events to the client.
+
+The backend is pluggable through EVENT_BACKEND:
+
+- `InProcessEventBackend` (default) delivers within one process. Publishing is
+  thread-safe, so sync views may publish while subscribers live on the ASGI
+  event loop.
+- `RedisEventBackend` fans out across processes via Redis pub/sub and needs
+  the `redis` extra.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import AsyncIterator
+
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .settings import api_settings
+from .signals import (
+    delivery_status_changed,
+    missed_call_sent,
+    sessions_revoked,
+    verification_failed,
+    verification_success,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BaseEventBackend:
+    """Interface for event backends."""
+
+    def publish(self, session_id: str, event: dict) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        """Async iterator yielding events for `session_id` until closed."""
+        raise NotImplementedError
+
+
+class InProcessEventBackend(BaseEventBackend):
+    """Delivers events to subscribers living in the same process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, session_id: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Subscriber's loop has been closed; it will unregister itself
+                pass
+
+    async def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[session_id].add(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[session_id].discard(entry)
+                if not self._subscribers[session_id]:
+                    del self._subscribers[session_id]
+
+
+class RedisEventBackend(BaseEventBackend):
+    """Delivers events across processes through Redis pub/sub (EVENT_REDIS_URL)."""
+
+    channel_prefix = 'drf_missed_call_auth:events:'
+
+    def __init__(self):
+        import redis
+        self.url = api_settings.EVENT_REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+
+    def publish(self, session_id: str, event: dict) -> None:
+        self._client.publish(self.channel_prefix + session_id, json.dumps(event))
+
+    async def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        import redis.asyncio
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel_prefix + session_id)
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    yield json.loads(message['data'])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await client.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_event_backend() -> BaseEventBackend:
+    """Returns the process-wide backend configured by EVENT_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(api_settings.EVENT_BACKEND)()
+    return _backend
+
+
+def publish_event(session_id, event_type: str, **data) -> None:
+    if not api_settings.ENABLE_EVENT_STREAM:
+        return
+    try:
+        get_event_backend().publish(str(session_id), {'event': event_type, **data})
+    except Exception as e:
+        # Push is best effort; never fail the request path because of it
+        logger.error(f"Failed to publish {event_type} event: {e}", exc_info=True)
+
+
+@receiver(missed_call_sent)
+def _publish_sent(sender, verification_instance, **kwargs):
+    publish_event(verification_instance.pk, 'sent')
+
+
+@receiver(verification_success)
+def _publish_verified(sender, verification_instance, **kwargs):
+    publish_event(verification_instance.pk, 'verified')
+
+
+@receiver(verification_failed)
+def _publish_failed(sender, session_id=None, **kwargs):
+    if session_id is not None:
+        publish_event(session_id, 'failed')
+
+
+@receiver(delivery_status_changed)
+def _publish_delivery_status(sender, session_id, status, **kwargs):
+    publish_event(session_id, 'delivery', status=status)
+
+
+@receiver(sessions_revoked)
+def _publish_revoked(sender, session_ids, **kwargs):
+    for session_id in session_ids:
+        publish_event(session_id, 'expired')
@@ -1,4 +1,4 @@
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, Throttled
 from rest_framework import status
 from django.utils.translation import gettext_lazy as _
 
@@ -30,4 +30,23 @@ class InvalidSignatureError(APIException):
     """
     status_code = status.HTTP_403_FORBIDDEN
     default_detail = _('App signature verification failed.')
-    default_code = 'invalid_signature'
\ No newline at end of file
+    default_code = 'invalid_signature'
+
+
+class DestinationBlocked(APIException):
+    """
+    Raised when the destination number falls in a prefix blocked by the risk stage.
+    Results in a 403 Forbidden response.
+    """
+    status_code = status.HTTP_403_FORBIDDEN
+    default_detail = _('Verification is not available for this number.')
+    default_code = 'destination_blocked'
+
+
+class VerificationLocked(Throttled):
+    """
+    Raised when a phone is locked out after repeated failed verifications.
+    Results in a 429 Too Many Requests response with a Retry-After header.
+    """
+    default_detail = _('Too many failed verification attempts.')
+    default_code = 'verification_locked'
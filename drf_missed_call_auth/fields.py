@@ -0,0 +1,131 @@
+"""
+Model fields for the compact storage layout (COMPACT_STORAGE, see storage.py).
+
+Both fields keep the Python-side value a string, so code reading, filtering
+or creating sessions doesn't change with the layout:
+
+- `E164Field` stores '+14155550123' as the integer 14155550123.
+- `InternedSignatureField` stores an app signature as the id of its
+  `AppSignature` row. Signatures are interned on save; lookups of unknown
+  signatures match nothing instead of creating rows.
+"""
+import threading
+from typing import Dict, Optional
+
+from django import forms
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
+
+
+class E164Field(models.BigIntegerField):
+    """An E.164 number stored as a BIGINT (8 bytes, no leading '+')."""
+    description = _("Phone number in E.164 format, stored as an integer")
+
+    @property
+    def validators(self):
+        # BigIntegerField's range validators compare against ints; values
+        # are strings here and validated by `validators` passed in
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else f'+{value}'
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return f'+{value}'
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        digits = str(value)
+        if digits.startswith('+'):
+            digits = digits[1:]
+        # Anything but digits can't be stored, so it matches no row
+        return int(digits) if digits.isdigit() else None
+
+    def formfield(self, **kwargs):
+        return forms.CharField(max_length=16, **{'required': not self.blank, **kwargs})
+
+
+class SignatureInterner:
+    """Process-wide two-way cache of the (small) `AppSignature` table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._values: Dict[int, str] = {}
+
+    def _remember(self, pk: int, value: str) -> None:
+        self._ids[value] = pk
+        self._values[pk] = value
+
+    def _load(self) -> None:
+        from .models import AppSignature
+        for pk, value in AppSignature.objects.values_list('pk', 'value'):
+            self._remember(pk, value)
+
+    def get_id(self, value: str, create: bool = False) -> Optional[int]:
+        pk = self._ids.get(value)
+        if pk is None:
+            with self._lock:
+                self._load()
+                pk = self._ids.get(value)
+                if pk is None and create:
+                    pk = self._create(value)
+        return pk
+
+    def _create(self, value: str) -> int:
+        from .models import AppSignature
+        signature, _created = AppSignature.objects.get_or_create(value=value)
+        # A rolled-back row must not stay cached; its id may be reused
+        transaction.on_commit(lambda: self._remember(signature.pk, value), using=AppSignature.objects.db)
+        return signature.pk
+
+    def get_value(self, pk: int) -> Optional[str]:
+        value = self._values.get(pk)
+        if value is None:
+            with self._lock:
+                self._load()
+                value = self._values.get(pk)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._values = {}, {}
+
+
+interner = SignatureInterner()
+
+
+class InternedSignatureField(models.PositiveIntegerField):
+    """An app signature stored as a reference into the `AppSignature` table."""
+    description = _("Application signature, interned")
+
+    @property
+    def validators(self):
+        return [*self.default_validators, *self._validators]
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if isinstance(value, str):
+            return interner.get_id(value, create=True)
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else interner.get_value(value)
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return interner.get_value(value)
+        return value
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        pk = interner.get_id(str(value))
+        # Unknown signatures match nothing (0 is never a row id)
+        return pk if pk is not None else 0
+
+    def formfield(self, **kwargs):
+        return forms.CharField(max_length=255, **{'required': not self.blank, **kwargs})
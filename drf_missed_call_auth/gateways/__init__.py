@@ -1,5 +1,34 @@
 # Telephony gateways package
-from .base import BaseMissedCallGateway
-from .twilio import TwilioGateway
+#
+# Provider gateways are imported on first attribute access so that importing
+# the base classes doesn't pull in provider SDKs.
+from importlib import import_module
 
-__all__ = ['BaseMissedCallGateway', 'TwilioGateway']
\ No newline at end of file
+from .base import (
+    BaseMissedCallGateway,
+    GatewayError,
+    RetryableGatewayError,
+    RetryPolicy,
+    TerminalGatewayError,
+)
+
+_LAZY_GATEWAYS = {
+    'TwilioGateway': '.twilio',
+    'FakeCarrierGateway': '.fake',
+}
+
+__all__ = [
+    'BaseMissedCallGateway',
+    'FakeCarrierGateway',
+    'GatewayError',
+    'RetryableGatewayError',
+    'RetryPolicy',
+    'TerminalGatewayError',
+    'TwilioGateway',
+]
+
+
+def __getattr__(name):
+    if name in _LAZY_GATEWAYS:
+        return getattr(import_module(_LAZY_GATEWAYS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,45 +1,235 @@
+import logging
+import random
+import time
 from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.timezone import now
+
+from ..settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """
+    Raised by `place_call` when the provider rejects a dispatch.
+
+    `retryable` tells the retry layer whether the same call may be attempted
+    again. Only errors that guarantee no call was placed should be retryable,
+    otherwise a retry could ring the user twice.
+    """
+    retryable = False
+
+    def __init__(self, message: str = '', code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class RetryableGatewayError(GatewayError):
+    """Transient provider failure (rate limiting, 5xx, connection refused)."""
+    retryable = True
+
+
+class TerminalGatewayError(GatewayError):
+    """Permanent failure (invalid number, bad credentials, geo permissions)."""
+    retryable = False
+
+
+class RetryPolicy:
+    """
+    Bounded exponential backoff with full jitter.
+
+    The delay before retry `n` (1-based) is a random value in
+    `[0, min(max_delay, base_delay * 2 ** (n - 1))]`.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 4.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_settings(cls) -> 'RetryPolicy':
+        return cls(
+            max_attempts=api_settings.DISPATCH_MAX_ATTEMPTS,
+            base_delay=api_settings.DISPATCH_BACKOFF_BASE,
+            max_delay=api_settings.DISPATCH_BACKOFF_MAX,
+        )
+
+    def get_delay(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
 
 
 class BaseMissedCallGateway(ABC):
     """
     Abstract base class for missed-call telephony gateways.
-    
-    All concrete implementations (e.g., Twilio, Plivo, Vonage) must implement 
+
+    All concrete implementations (e.g., Twilio, Plivo, Vonage) must implement
     the `trigger_missed_call` method and ensure numbers are in E.164 format.
-    
+
     Example implementation:
-    
+
     ```python
     class MyGateway(BaseMissedCallGateway):
         def trigger_missed_call(self, to_number: str, from_number: str) -> bool:
             # Your implementation
             return True
     ```
+
+    Gateways that can tell transient failures from permanent ones should also
+    override `place_call` and raise `RetryableGatewayError` or
+    `TerminalGatewayError`; `dispatch` then retries the transient ones.
     """
 
+    retry_policy: Optional[RetryPolicy] = None
+
     @abstractmethod
     def trigger_missed_call(self, to_number: str, from_number: str) -> bool:
         """
         Initiates a missed/flash call from `from_number` to `to_number`.
-        
+
         The implementation should:
         1. Validate both numbers are in E.164 format
         2. Initiate a brief call (1-2 rings) that automatically disconnects
         3. Handle all provider-specific errors gracefully
         4. Return True on success, False on failure
         5. Log all errors appropriately
-        
+
         Args:
             to_number (str): Destination phone number in E.164 format (e.g., +1234567890)
             from_number (str): Source phone number in E.164 format (e.g., +0987654321)
-            
+
         Returns:
             bool: True if the call was successfully initiated, False otherwise.
-            
+
         Raises:
             Should not raise exceptions - return False instead and log errors.
         """
         raise NotImplementedError(
             f"{self.__class__.__name__} must implement trigger_missed_call method"
-        )
\ No newline at end of file
+        )
+
+    def place_call(self, to_number: str, from_number: str, idempotency_key: str = '') -> Optional[str]:
+        """
+        Places a single call attempt and returns the provider call id, if any.
+
+        The default implementation delegates to `trigger_missed_call` and treats
+        a False result as terminal, because a bare boolean cannot tell whether
+        the provider already placed the call.
+
+        Raises:
+            GatewayError: on failure, with `retryable` set accordingly.
+        """
+        if not self.trigger_missed_call(to_number=to_number, from_number=from_number):
+            raise TerminalGatewayError("Gateway reported failure.")
+        return None
+
+    def validate_callback(self, request) -> bool:
+        """
+        Authenticates a status callback sent by the provider.
+        Gateways without callback support reject everything.
+        """
+        return False
+
+    def parse_status_events(self, request) -> List[Tuple[str, str]]:
+        """
+        Extracts `(provider_call_id, status)` pairs from a status callback.
+        Statuses must use the `DeliveryStatus` vocabulary.
+        """
+        return []
+
+    def validate_inbound_callback(self, request) -> bool:
+        """
+        Authenticates an inbound-call webhook sent by the provider.
+        Gateways without inbound support reject everything.
+        """
+        return False
+
+    def parse_inbound_calls(self, request) -> List[Tuple[str, str]]:
+        """
+        Extracts `(from_number, to_number)` pairs from an inbound-call webhook:
+        the caller's phone and the pool number it dialed. Calls whose caller
+        ID isn't trusted (see `is_attested`) must be left out.
+        """
+        return []
+
+    def is_attested(self, attestation: Optional[str]) -> bool:
+        """
+        Whether a caller ID the provider attested at `attestation` may verify
+        a session: 'A', 'B' or 'C' under STIR/SHAKEN, 'failed' when the
+        signature didn't verify, or None when the call carried none.
+        """
+        if attestation is None:
+            return not api_settings.INBOUND_REQUIRE_ATTESTATION
+        return attestation in api_settings.INBOUND_ATTESTATION_LEVELS
+
+    def get_inbound_response(self, request) -> HttpResponse:
+        """
+        Answers an inbound-call webhook. Providers that expect call
+        instructions should be told to reject the call unanswered, so the
+        user isn't charged for it.
+        """
+        return HttpResponse(status=204)
+
+    def get_retry_policy(self) -> RetryPolicy:
+        return self.retry_policy or RetryPolicy.from_settings()
+
+    def get_idempotency_key(self, verification) -> str:
+        """Stable key for all attempts made on behalf of one session."""
+        return f"missedcall-{verification.pk.hex}"
+
+    def dispatch(self, verification, save: bool = True) -> bool:
+        """
+        Places the flash call for `verification`, retrying transient failures.
+
+        Retries stop when the policy is exhausted, on a terminal error, or when
+        the next attempt would start with less than `DISPATCH_MIN_REMAINING`
+        seconds of the session's validity left. The idempotency key is claimed
+        in the cache for the lifetime of the session, so dispatching the same
+        session twice never dials the user twice.
+
+        With `save=False` the provider call id is only set on the instance,
+        for the caller to write in bulk (dispatch then makes no queries).
+        """
+        key = self.get_idempotency_key(verification)
+        cache_key = f"drf_missed_call_auth:dispatch:{key}"
+        ttl = max(1, int((verification.expires_at - now()).total_seconds()))
+        if not cache.add(cache_key, True, timeout=ttl):
+            logger.warning(f"Dispatch for {key} already in progress or completed, skipping.")
+            return True
+
+        policy = self.get_retry_policy()
+        min_remaining = api_settings.DISPATCH_MIN_REMAINING
+        to_number = verification.user_phone
+        from_number = verification.expected_caller.phone_number
+
+        for attempt in range(1, policy.max_attempts + 1):
+            try:
+                call_id = self.place_call(to_number, from_number, idempotency_key=key)
+                if call_id:
+                    verification.provider_call_id = call_id
+                    if save:
+                        verification.save(update_fields=['provider_call_id'])
+                return True
+            except GatewayError as e:
+                if not e.retryable or attempt == policy.max_attempts:
+                    logger.error(f"Dispatch {key} failed on attempt {attempt} (code {e.code}): {e}")
+                    break
+
+                delay = policy.get_delay(attempt)
+                remaining = (verification.expires_at - now()).total_seconds()
+                if remaining - delay < min_remaining:
+                    logger.error(f"Dispatch {key} abandoned: validity window too short to retry.")
+                    break
+
+                logger.warning(
+                    f"Dispatch {key} attempt {attempt} failed (code {e.code}), retrying in {delay:.2f}s"
+                )
+                time.sleep(delay)
+
+        cache.delete(cache_key)
+        return False
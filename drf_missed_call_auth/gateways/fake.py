@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from .base import BaseMissedCallGateway, RetryableGatewayError, TerminalGatewayError
+
+
+class FakeCarrierGateway(BaseMissedCallGateway):
+    """
+    In-process gateway that places no real calls.
+
+    Every successful call is recorded in a process-wide registry so tests and
+    the load-test simulator can look up which caller ID "rang" a number.
+    Latency and failures can be injected through the class attributes, e.g.:
+
+    ```python
+    FakeCarrierGateway.configure(latency=0.2, jitter=0.1, failure_rate=0.05)
+    ```
+    """
+
+    latency = 0.0
+    jitter = 0.0
+    failure_rate = 0.0
+    # Share of injected failures that are retryable (the rest are terminal)
+    retryable_share = 0.5
+
+    _lock = threading.Lock()
+    _calls: List[dict] = []
+    _last_call_to: Dict[str, dict] = {}
+
+    @classmethod
+    def configure(cls, latency=0.0, jitter=0.0, failure_rate=0.0, retryable_share=0.5):
+        cls.latency = latency
+        cls.jitter = jitter
+        cls.failure_rate = failure_rate
+        cls.retryable_share = retryable_share
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._calls = []
+            cls._last_call_to = {}
+
+    @classmethod
+    def calls(cls) -> List[dict]:
+        with cls._lock:
+            return list(cls._calls)
+
+    @classmethod
+    def last_call_to(cls, to_number: str) -> Optional[dict]:
+        with cls._lock:
+            return cls._last_call_to.get(to_number)
+
+    def place_call(self, to_number: str, from_number: str, idempotency_key: str = '') -> str:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            if random.random() < self.retryable_share:
+                raise RetryableGatewayError("Injected transient failure.", code=20503)
+            raise TerminalGatewayError("Injected terminal failure.", code=21211)
+
+        call = {
+            'sid': f"FAKE{uuid.uuid4().hex}",
+            'to': to_number,
+            'from': from_number,
+            'idempotency_key': idempotency_key,
+            'at': time.time(),
+        }
+        with self._lock:
+            self._calls.append(call)
+            self._last_call_to[to_number] = call
+        return call['sid']
+
+    def trigger_missed_call(self, to_number: str, from_number: str) -> bool:
+        try:
+            self.place_call(to_number, from_number)
+            return True
+        except (RetryableGatewayError, TerminalGatewayError):
+            return False
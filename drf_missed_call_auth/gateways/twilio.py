@@ -1,14 +1,67 @@
 import os
 import logging
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 from django.core.exceptions import ValidationError
-from ..utils import normalize_phone_number
-from .base import BaseMissedCallGateway
+from django.http import HttpResponse
+from .base import BaseMissedCallGateway, RetryableGatewayError, TerminalGatewayError
 from ..settings import api_settings
+from ..utils import normalize_phone_number, sanitize_phone_for_logging
 
 logger = logging.getLogger(__name__)
 
+# Twilio error codes that are safe to retry: the request was rejected before
+# any call was created. See https://www.twilio.com/docs/api/errors
+RETRYABLE_ERROR_CODES = frozenset({
+    20429,  # Too Many Requests
+    20500,  # Internal Server Error
+    20503,  # Service Unavailable
+})
+
+# Codes that will fail identically on every attempt.
+TERMINAL_ERROR_CODES = frozenset({
+    20003,  # Authentication failure
+    20404,  # Resource not found (e.g., unknown account)
+    21210,  # 'From' number not verified
+    21212,  # Invalid 'From' number
+    21211,  # Invalid 'To' number
+    21214,  # 'To' number cannot be reached
+    21215,  # Geo permissions do not allow this destination
+    21216,  # Call blocked by Twilio blocklist
+    21217,  # 'To' number is not a valid phone number
+    13224,  # Invalid dial number
+    13227,  # Geo permissions (international)
+})
+
+RETRYABLE_HTTP_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Ends a call with a busy signal before it is answered
+REJECT_TWIML = '<Response><Reject reason="busy"/></Response>'
+
+
+# The Twilio SDK (and requests/urllib3 under it) is imported inside the
+# methods that talk to Twilio, so importing this module stays cheap.
+
+
+def is_retryable_twilio_error(exc) -> bool:
+    """
+    Classifies a Twilio REST error. Known codes win; otherwise 429/5xx
+    statuses are treated as transient and everything else as terminal.
+    """
+    if exc.code in RETRYABLE_ERROR_CODES:
+        return True
+    if exc.code in TERMINAL_ERROR_CODES:
+        return False
+    return exc.status in RETRYABLE_HTTP_STATUSES
+
+
+def _connection_never_opened(exc) -> bool:
+    from requests.exceptions import ConnectTimeout
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(exc, ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
 
 class TwilioGateway(BaseMissedCallGateway):
     """
@@ -37,6 +90,7 @@ class TwilioGateway(BaseMissedCallGateway):
                         "Set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in settings or environment."
                     )
                     return None
+                from twilio.rest import Client
                 self._client = Client(self.account_sid, self.auth_token)
             except Exception as e:
                 logger.error(f"Failed to initialize Twilio client: {e}", exc_info=True)
@@ -53,35 +107,107 @@ class TwilioGateway(BaseMissedCallGateway):
             raise ValidationError(f"Invalid phone number format: {number}")
         return cleaned
 
-    def trigger_missed_call(self, to_number: str, from_number: str) -> bool:
+    def place_call(self, to_number: str, from_number: str, idempotency_key: str = '') -> str:
         """
-        Triggers a flash call using <Reject reason="busy"/>.
-        This is often free and results in a faster missed-call notification.
+        Places one <Reject reason="busy"/> call and returns its SID.
+        Raises a classified gateway error so `dispatch` can decide on retries.
         """
         if not self.client:
-            return False
+            raise TerminalGatewayError("Twilio client is not configured.")
+
+        from requests.exceptions import ConnectionError as RequestsConnectionError
+        from twilio.base.exceptions import TwilioRestException
 
         try:
             to_clean = self.clean_number(to_number)
             from_clean = self.clean_number(from_number)
+        except ValidationError as e:
+            logger.error(f"Phone number validation failed: {e.message}")
+            raise TerminalGatewayError(e.message)
+
+        options = {}
+        if api_settings.STATUS_CALLBACK_URL:
+            options['status_callback'] = api_settings.STATUS_CALLBACK_URL
+            options['status_callback_event'] = ['initiated', 'ringing', 'answered', 'completed']
 
+        try:
             call = self.client.calls.create(
                 to=to_clean,
                 from_=from_clean,
-                twiml='<Response><Reject reason="busy"/></Response>',
-                timeout=10
+                twiml=REJECT_TWIML,
+                timeout=10,
+                **options
             )
-            logger.debug(f"Missed call initiated: {call.sid} from {from_clean} to {to_clean}")
-            return True
-
         except TwilioRestException as e:
             logger.error(
-                f"Twilio API error (code {e.code}): {e.msg} | To: {to_number}, From: {from_number}"
+                f"Twilio API error (code {e.code}): {e.msg} | "
+                f"To: {sanitize_phone_for_logging(to_number)}, From: {from_number}"
             )
+            error_class = RetryableGatewayError if is_retryable_twilio_error(e) else TerminalGatewayError
+            raise error_class(e.msg, code=e.code)
+        except RequestsConnectionError as e:
+            # A dropped response may mean the call was created; only failures to
+            # open the connection guarantee it was not, so only those are retried.
+            if _connection_never_opened(e):
+                raise RetryableGatewayError(str(e))
+            raise TerminalGatewayError(str(e))
+
+        logger.debug(
+            f"Missed call initiated: {call.sid} from {from_clean} "
+            f"to {sanitize_phone_for_logging(to_clean)} [{idempotency_key}]"
+        )
+        return call.sid
+
+    def validate_signature(self, request, url: str) -> bool:
+        """Checks the X-Twilio-Signature header against `url` and the posted parameters."""
+        signature = request.META.get('HTTP_X_TWILIO_SIGNATURE', '')
+        if not signature or not self.auth_token:
             return False
-        except ValidationError as e:
-            logger.error(f"Phone number validation failed: {e.message}")
+        from twilio.request_validator import RequestValidator
+
+        return RequestValidator(self.auth_token).validate(url, request.POST, signature)
+
+    def validate_callback(self, request) -> bool:
+        return self.validate_signature(request, api_settings.STATUS_CALLBACK_URL or request.build_absolute_uri())
+
+    def parse_status_events(self, request) -> list:
+        """Twilio posts one form-encoded event per callback."""
+        return [(request.POST.get('CallSid', ''), request.POST.get('CallStatus', ''))]
+
+    def validate_inbound_callback(self, request) -> bool:
+        return self.validate_signature(request, api_settings.INBOUND_CALLBACK_URL or request.build_absolute_uri())
+
+    def parse_inbound_calls(self, request) -> list:
+        """
+        Twilio's voice webhook posts one incoming call per request, with the
+        STIR/SHAKEN result in StirVerstat on calls that carried one.
+        """
+        verstat = request.POST.get('StirVerstat', '')
+        if verstat.startswith('TN-Validation-Passed-'):
+            attestation = verstat.rsplit('-', 1)[1]
+        elif verstat.startswith('TN-Validation-Failed'):
+            attestation = 'failed'
+        else:
+            attestation = None
+        if not self.is_attested(attestation):
+            logger.warning(f"Ignored inbound call with caller ID attestation {verstat or 'none'}")
+            return []
+        return [(request.POST.get('From', ''), request.POST.get('To', ''))]
+
+    def get_inbound_response(self, request) -> HttpResponse:
+        """Rejects the call with a busy signal; rejected calls aren't billed."""
+        return HttpResponse(REJECT_TWIML, content_type='text/xml')
+
+    def trigger_missed_call(self, to_number: str, from_number: str) -> bool:
+        """
+        Triggers a flash call using <Reject reason="busy"/>.
+        This is often free and results in a faster missed-call notification.
+        """
+        try:
+            self.place_call(to_number, from_number)
+            return True
+        except (RetryableGatewayError, TerminalGatewayError):
             return False
         except Exception as e:
             logger.error(f"Unexpected error in Twilio gateway: {e}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,144 @@
+"""
+Inbound (reverse) missed-call verification.
+
+Where carriers block outbound flash calls, tenants with VERIFICATION_MODE
+'inbound' hand the user a pool number to call instead. The provider reports
+each incoming call to the inbound webhook, which rejects it unanswered and
+verifies the session that expects it: having placed the call from the phone
+is the proof, so the client never calls verify/.
+
+Pending inbound sessions are indexed in the cache under a hash of
+(user phone, pool number). Leases give a phone's concurrent sessions distinct
+numbers, so a pair matches at most one session, and a webhook batch of any
+size is matched with one `get_many` and one primary-key query per session
+shard. Matches are re-checked in that query (pending, unexpired, inbound), so
+entries left behind by revocation or expiry are harmless and simply time out.
+Pairs missing from the index (evicted entries) are looked up by phone in the
+same query.
+
+The proof is only as good as the caller ID. Where the provider reports a
+STIR/SHAKEN attestation, calls below INBOUND_ATTESTATION_LEVELS are ignored
+by the gateway; calls without one (most international routes) are trusted
+unless INBOUND_REQUIRE_ATTESTATION is set, so a spoofed caller ID can verify
+another phone's pending session there.
+"""
+import hashlib
+import logging
+from typing import Iterable, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from . import audit
+from .models import AuditEventType, MissedCallVerification, VerificationDirection
+from .sharding import group_phones, group_sessions
+from .signals import sessions_revoked, verification_success
+from .utils import normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'drf_missed_call_auth:inbound:{}'
+
+
+def _index_key(phone: str, number: str) -> str:
+    # Fixed-length keys that don't carry phone numbers in clear
+    return INDEX_KEY.format(hashlib.sha256(f"{phone}|{number}".encode()).hexdigest()[:32])
+
+
+def is_inbound(tenant) -> bool:
+    """Whether `tenant` verifies by calls from the user rather than to it."""
+    return tenant.VERIFICATION_MODE == VerificationDirection.INBOUND
+
+
+def register_session(session: MissedCallVerification) -> None:
+    """Indexes a new inbound session for the rest of its validity."""
+    ttl = max(1, int((session.expires_at - now()).total_seconds()))
+    cache.set(_index_key(session.user_phone, session.expected_caller.phone_number), session.pk, ttl)
+
+
+def ingest_inbound_calls(calls: Iterable[Tuple[str, str]]) -> int:
+    """
+    Verifies the pending inbound sessions expecting `(from_number, to_number)`
+    calls, and expires the other pending sessions of the verified phones.
+
+    Calls from phones without a session, to a number the phone wasn't
+    assigned, or for a session that is no longer pending are ignored.
+
+    Returns:
+        int: Number of sessions verified.
+    """
+    pairs = {}
+    for from_number, to_number in calls:
+        phone, number = normalize_phone_number(from_number or ''), normalize_phone_number(to_number or '')
+        if phone and number:
+            pairs[(phone, number)] = _index_key(phone, number)
+    if not pairs:
+        return 0
+
+    indexed = cache.get_many(list(pairs.values()))
+    unindexed = {phone for (phone, _number), key in pairs.items() if key not in indexed}
+    timestamp = now()
+    session_ids, phones = group_sessions(indexed.values()), group_phones(unindexed)
+
+    matched = {}
+    for db in set(session_ids) | set(phones):
+        # On the primary: the sessions were created moments ago
+        candidates = MissedCallVerification.objects.db_manager(db, hints={'primary': True}).filter(
+            Q(pk__in=session_ids.get(db, [])) | Q(user_phone__in=phones.get(db, [])),
+            direction=VerificationDirection.INBOUND,
+            is_verified=False,
+            expires_at__gt=timestamp,
+        ).select_related('expected_caller').order_by('-created_at')
+        for session in candidates:
+            pair = (session.user_phone, session.expected_caller.phone_number)
+            if pair in pairs:
+                matched.setdefault(pair, session)
+    if not matched:
+        return 0
+
+    verified, revoked = [], []
+    for db, shard_phones in group_phones({phone for phone, _number in matched}).items():
+        shard_verified = []
+        with transaction.atomic(using=db):
+            for (phone, _number), session in matched.items():
+                if phone not in shard_phones:
+                    continue
+                # Conditional update: a duplicate webhook or a revocation wins the race
+                if MissedCallVerification.objects.using(db).filter(
+                    pk=session.pk, is_verified=False, expires_at__gt=timestamp
+                ).update(is_verified=True, verified_at=timestamp):
+                    session.is_verified = True
+                    session.verified_at = timestamp
+                    shard_verified.append(session)
+            if shard_verified:
+                siblings = MissedCallVerification.objects.using(db).filter(
+                    user_phone__in={session.user_phone for session in shard_verified},
+                    is_verified=False,
+                    expires_at__gt=timestamp,
+                )
+                shard_revoked = list(siblings.values_list('pk', flat=True))
+                if shard_revoked:
+                    MissedCallVerification.objects.using(db).filter(
+                        pk__in=shard_revoked, is_verified=False
+                    ).update(expires_at=timestamp)
+                    revoked.extend(shard_revoked)
+        verified.extend(shard_verified)
+
+    cache.delete_many([pairs[pair] for pair in matched])
+    for session in verified:
+        verification_success.send(sender=MissedCallVerification, verification_instance=session)
+        audit.record(
+            AuditEventType.VERIFY_SUCCESS,
+            session_id=session.pk,
+            phone=session.user_phone,
+            app_signature=session.app_signature,
+            time_to_verify=(timestamp - session.created_at).total_seconds(),
+            direction=VerificationDirection.INBOUND,
+        )
+    if revoked:
+        sessions_revoked.send(sender=MissedCallVerification, session_ids=revoked)
+
+    logger.debug(f"Ingested {len(pairs)} inbound call(s), {len(verified)} session(s) verified")
+    return len(verified)
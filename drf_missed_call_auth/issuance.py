@@ -0,0 +1,231 @@
+"""
+User provisioning and credential issuance for verified phones.
+
+With USER_PHONE_FIELD set, `MissedCallVerifyView` maps the verified phone to
+the user whose (unique) USER_PHONE_FIELD equals it, creating the user with an
+unusable password if there is none, and returns credentials from
+TOKEN_ISSUER. It runs in the verify transaction: if issuance fails, the
+session is not consumed.
+
+Query budget on success:
+
+- returning user, phone -> user id cached: none for 'jwt', one for 'token'
+  (reads the key);
+- returning user, cold cache: one (user and token key in a single join);
+- new user: the join, then one race-free upsert
+  (INSERT ... ON CONFLICT DO UPDATE ... RETURNING, Django >= 5.0 on
+  PostgreSQL, SQLite and MariaDB; get_or_create elsewhere), plus the token
+  insert.
+
+The phone -> user id mapping is cached once the verify transaction commits,
+and dropped whenever the user is saved or deleted through the ORM; bypassing
+model signals (`QuerySet.update()` on the phone field or `is_active`) leaves
+it in place until USER_CACHE_TIMEOUT.
+"""
+from typing import Callable, Optional, Tuple
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import PermissionDenied
+
+from .settings import api_settings
+
+PHONE_KEY = 'drf_missed_call_auth:users:phone:{}'
+USER_KEY = 'drf_missed_call_auth:users:id:{}'
+
+DEFAULT_TOKEN_MODEL = 'rest_framework.authtoken.Token'
+
+_issuer = None
+
+
+def is_enabled() -> bool:
+    return bool(api_settings.USER_PHONE_FIELD)
+
+
+def _phone_field():
+    User = get_user_model()
+    name = api_settings.USER_PHONE_FIELD
+    try:
+        field = User._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise ImproperlyConfigured(f"MISSEDCALL_AUTH['USER_PHONE_FIELD']: {User.__name__} has no field '{name}'.")
+    if not field.unique:
+        raise ImproperlyConfigured(
+            f"MISSEDCALL_AUTH['USER_PHONE_FIELD']: {User.__name__}.{name} must be unique."
+        )
+    return field
+
+
+def get_token_model():
+    """TOKEN_MODEL as '<app name or label>.<Model>' or as an importable path."""
+    path = api_settings.TOKEN_MODEL or DEFAULT_TOKEN_MODEL
+    app_name, model_name = path.rsplit('.', 1)
+    for app_config in apps.get_app_configs():
+        if app_name in (app_config.name, app_config.label):
+            return app_config.get_model(model_name)
+    return import_string(path)
+
+
+def _token_user_field(Token):
+    """The (one-to-one) field linking the token model to the user."""
+    return Token._meta.get_field('user')
+
+
+def _remember(phone: str, user_id) -> None:
+    timeout = api_settings.USER_CACHE_TIMEOUT
+    cache.set_many({PHONE_KEY.format(phone): user_id, USER_KEY.format(user_id): phone}, timeout)
+
+
+def forget_user(user_id) -> None:
+    """Drops the cached phone -> user mapping of `user_id`."""
+    phone = cache.get(USER_KEY.format(user_id))
+    if phone is not None:
+        cache.delete_many([PHONE_KEY.format(phone), USER_KEY.format(user_id)])
+
+
+def _lookup(phone: str, with_token: bool) -> Tuple[Optional[int], bool, Optional[str]]:
+    """(user id, is_active, token key) of the phone's user, in one query."""
+    User = get_user_model()
+    columns = ['pk', 'is_active'] if hasattr(User, 'is_active') else ['pk']
+    if with_token:
+        Token = get_token_model()
+        columns.append(f'{_token_user_field(Token).related_query_name()}__pk')
+    row = User._default_manager.filter(**{_phone_field().name: phone}).values_list(*columns).first()
+    if row is None:
+        return None, True, None
+    row = dict(zip(columns, row))
+    return row['pk'], row.get('is_active', True), row.get(columns[-1]) if with_token else None
+
+
+def _upsert(phone: str):
+    """Creates the phone's user, or returns the one a concurrent request just created."""
+    User = get_user_model()
+    field = _phone_field().name
+    user = User(**{field: phone})
+    if hasattr(user, 'set_unusable_password'):
+        user.set_unusable_password()
+
+    db = router.db_for_write(User)
+    features = connections[db].features
+    if (
+        django.VERSION >= (5, 0)
+        and features.supports_update_conflicts_with_target
+        and features.can_return_rows_from_bulk_insert
+    ):
+        # A no-op update on conflict makes the statement return the existing row's id
+        User._default_manager.db_manager(db).bulk_create(
+            [user], update_conflicts=True, unique_fields=[field], update_fields=[field],
+        )
+        return user.pk
+    user, _created = User._default_manager.db_manager(db).get_or_create(
+        **{field: phone}, defaults={'password': user.password},
+    )
+    return user.pk
+
+
+def get_user_id(phone: str, with_token: bool = False) -> Tuple[int, Optional[str]]:
+    """
+    Maps a verified phone to a user id, creating the user if needed.
+
+    Returns:
+        tuple: (user id, token key if `with_token` and the user has one).
+
+    Raises:
+        PermissionDenied: if the user is inactive.
+    """
+    user_id = cache.get(PHONE_KEY.format(phone))
+    if user_id is not None:
+        if not with_token:
+            return user_id, None
+        Token = get_token_model()
+        field = _token_user_field(Token)
+        key = Token._default_manager.filter(**{field.attname: user_id}).values_list('pk', flat=True).first()
+        return user_id, key
+
+    user_id, is_active, key = _lookup(phone, with_token)
+    if user_id is None:
+        user_id = _upsert(phone)
+    elif not is_active:
+        raise PermissionDenied(_("This account is disabled."))
+    # A rolled back verify must not leave the cache pointing at a user that was never created
+    transaction.on_commit(lambda: _remember(phone, user_id), using=router.db_for_write(get_user_model()))
+    return user_id, key
+
+
+# Issuers: (user id, session) -> response fields
+
+def issue_drf_token(user_id, session, key: Optional[str] = None) -> dict:
+    """A DRF `Token` (TOKEN_MODEL), created on first sign-in. `key` skips the lookup."""
+    if key is None:
+        Token = get_token_model()
+        key = Token._default_manager.get_or_create(**{_token_user_field(Token).attname: user_id})[0].pk
+    return {'token': key}
+
+
+def issue_jwt(user_id, session) -> dict:
+    """An access/refresh pair from djangorestframework-simplejwt."""
+    try:
+        from rest_framework_simplejwt.tokens import RefreshToken
+    except ImportError:
+        raise ImproperlyConfigured(
+            "MISSEDCALL_AUTH['TOKEN_ISSUER'] = 'jwt' requires djangorestframework-simplejwt."
+        )
+    # Only the id is read to build the claims: no need to load the user
+    refresh = RefreshToken.for_user(get_user_model()(pk=user_id))
+    refresh['phone_number'] = session.user_phone
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+ISSUERS = {
+    'token': issue_drf_token,
+    'jwt': issue_jwt,
+}
+
+
+def get_issuer() -> Optional[Callable]:
+    """The TOKEN_ISSUER callable; 'token' when only TOKEN_MODEL is set."""
+    global _issuer
+    if _issuer is None:
+        name = api_settings.TOKEN_ISSUER or ('token' if api_settings.TOKEN_MODEL else None)
+        if name is None:
+            return None
+        _issuer = ISSUERS[name] if name in ISSUERS else import_string(name)
+    return _issuer
+
+
+def issue_credentials(session) -> dict:
+    """
+    Provisions the user of a verified session and returns the credentials to
+    add to the response: {'user_id': ..., **issuer fields}.
+    """
+    issuer = get_issuer()
+    if issuer is issue_drf_token:
+        # The key comes with the user lookup
+        user_id, key = get_user_id(session.user_phone, with_token=True)
+        return {'user_id': user_id, **issue_drf_token(user_id, session, key)}
+    user_id, _key = get_user_id(session.user_phone)
+    return {'user_id': user_id, **(issuer(user_id, session) if issuer else {})}
+
+
+@receiver(setting_changed)
+def _reset_issuer(*, setting, **kwargs):
+    global _issuer
+    if setting == 'MISSEDCALL_AUTH':
+        _issuer = None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _forget_on_change(sender, instance, **kwargs):
+    # The phone or is_active may have changed
+    forget_user(instance.pk)
@@ -0,0 +1,120 @@
+"""
+Caller-ID leases.
+
+A source number is leased to a destination phone for the validity window, so
+the sessions a phone has open at the same time (concurrent requests, retries)
+always expect distinct callers and a reported caller ID is never ambiguous.
+
+Leases are cache keys per (phone, source) claimed with an atomic `add`, so two
+racing requests can't take the same number. Candidates are drawn at random
+from a cached list of the tenant's active pool, so picking a caller probes a handful of
+keys and does one primary-key lookup instead of `ORDER BY RANDOM()` over the
+table. Leases are released on verification, revocation or failed dispatch,
+and expire on their own with the session.
+"""
+import random
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CallSourceNumber, MissedCallVerification
+from .settings import api_settings
+from .sharding import group_sessions
+from .signals import sessions_revoked, verification_success
+from .tenants import DEFAULT_TENANT, Tenant, get_tenant, get_tenants
+
+LEASE_KEY = 'drf_missed_call_auth:lease:{}:{}'
+POOL_KEY = 'drf_missed_call_auth:leases:pool:{}'
+# Bounds staleness of the cached pool when numbers change through `update()`
+POOL_TIMEOUT = 300
+# Random candidates tried before giving up on a large pool
+MAX_PROBES = 8
+
+
+def get_active_pool(tenant: str = DEFAULT_TENANT) -> List[Tuple[int, str]]:
+    """Cached [(id, phone_number)] of the tenant's active pool."""
+    key = POOL_KEY.format(tenant)
+    pool = cache.get(key)
+    if pool is None:
+        pool = list(CallSourceNumber.objects.get_active_pool(tenant).values_list('id', 'phone_number'))
+        cache.set(key, pool, POOL_TIMEOUT)
+    return pool
+
+
+def invalidate_pool(tenant: Optional[str] = None) -> None:
+    """Drops the cached pool of `tenant`, or of every tenant."""
+    if tenant is not None:
+        cache.delete(POOL_KEY.format(tenant))
+    else:
+        cache.delete_many([POOL_KEY.format(t.name) for t in get_tenants()])
+
+
+def acquire_lease(phone: str, source_id: int, timeout: Optional[int] = None) -> bool:
+    """Claims `source_id` for `phone`; False if it is already leased to it."""
+    return cache.add(LEASE_KEY.format(phone, source_id), True, timeout or api_settings.VALIDITY_PERIOD)
+
+
+def release_lease(phone: str, source_id: int) -> None:
+    cache.delete(LEASE_KEY.format(phone, source_id))
+
+
+def lease_caller(phone: str, exclude_number: Optional[str] = None, tenant: Optional[Tenant] = None) -> Optional[CallSourceNumber]:
+    """
+    Leases a source number of the tenant's pool (the default pool if no
+    tenant is given) not currently leased to `phone`, for the tenant's
+    validity period.
+
+    Returns:
+        The leased CallSourceNumber, or None if every candidate is taken.
+    """
+    tenant = tenant or get_tenant(DEFAULT_TENANT)
+    caller, stale = _probe(phone, exclude_number, tenant)
+    if caller is None and stale:
+        # Numbers were deactivated or deleted without signals; retry on a fresh pool
+        invalidate_pool(tenant.name)
+        caller, _stale = _probe(phone, exclude_number, tenant)
+    return caller
+
+
+def _probe(phone: str, exclude_number: Optional[str], tenant: Tenant) -> Tuple[Optional[CallSourceNumber], bool]:
+    candidates = [(pk, number) for pk, number in get_active_pool(tenant.name) if number != exclude_number]
+    if len(candidates) > MAX_PROBES:
+        candidates = random.sample(candidates, MAX_PROBES)
+    else:
+        random.shuffle(candidates)
+
+    stale = False
+    for source_id, _number in candidates:
+        if not acquire_lease(phone, source_id, tenant.VALIDITY_PERIOD):
+            continue
+        caller = CallSourceNumber.objects.filter(pk=source_id, is_active=True, tenant=tenant.name).first()
+        if caller is not None:
+            return caller, stale
+        release_lease(phone, source_id)
+        stale = True
+    return None, stale
+
+
+@receiver(post_save, sender=CallSourceNumber)
+@receiver(post_delete, sender=CallSourceNumber)
+def _invalidate_pool(sender, **kwargs):
+    # All tenants: the number may have moved from one to another
+    invalidate_pool()
+
+
+@receiver(verification_success)
+def _release_on_verify(sender, verification_instance, **kwargs):
+    release_lease(verification_instance.user_phone, verification_instance.expected_caller_id)
+
+
+@receiver(sessions_revoked)
+def _release_on_revoke(sender, session_ids, **kwargs):
+    keys = []
+    for db, shard_ids in group_sessions(session_ids).items():
+        leases = MissedCallVerification.objects.using(db).filter(id__in=shard_ids).values_list(
+            'user_phone', 'expected_caller_id'
+        )
+        keys.extend(LEASE_KEY.format(phone, source_id) for phone, source_id in leases)
+    cache.delete_many(keys)
@@ -0,0 +1,276 @@
+"""
+Load generation for sizing a deployment.
+
+`MobileClientSimulator` replays what the mobile app does against a live server:
+POST request/, wait the 2-3 seconds a flash call takes to ring, then POST
+verify/ with the caller ID it "saw". The caller ID is read from
+`FakeCarrierGateway`, so the server must run in the same process with
+GATEWAY_CLASS pointing at it; `serve()` starts such a server on localhost.
+A share of clients mistype the caller, re-request the call or behave like
+toll-pumping bots that never verify.
+
+`LoadTestRecorder` collects per-endpoint latencies and status codes and renders
+throughput, error rates and latency histograms. See the `missedcall_loadtest`
+management command for the packaged runner.
+"""
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+from .gateways.fake import FakeCarrierGateway
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Session outcomes reported by MobileClientSimulator.run_session
+VERIFIED = 'verified'
+VERIFY_FAILED = 'verify_failed'
+REQUEST_FAILED = 'request_failed'
+NO_CALL = 'no_call'
+FRAUD = 'fraud'
+
+
+class LoadTestRecorder:
+    """Thread-safe collector of request latencies and session outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.outcomes = Counter()
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+    def record_outcome(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def summary(self) -> dict:
+        """Per-endpoint counts, error rate, throughput and latency percentiles (ms)."""
+        elapsed = self.elapsed or 1e-9
+        endpoints = {}
+        with self._lock:
+            for endpoint, samples in self.latencies.items():
+                ordered = sorted(samples)
+                statuses = self.statuses[endpoint]
+                # 0 marks transport errors (refused, timed out)
+                errors = sum(count for status, count in statuses.items() if status == 0 or status >= 500)
+                endpoints[endpoint] = {
+                    'count': len(ordered),
+                    'throughput': len(ordered) / elapsed,
+                    'error_rate': errors / len(ordered),
+                    'statuses': dict(sorted(statuses.items())),
+                    'p50': percentile(ordered, 50) * 1000,
+                    'p90': percentile(ordered, 90) * 1000,
+                    'p99': percentile(ordered, 99) * 1000,
+                    'max': ordered[-1] * 1000,
+                    'histogram': histogram(ordered),
+                }
+            outcomes = dict(self.outcomes)
+        return {'elapsed': elapsed, 'endpoints': endpoints, 'outcomes': outcomes}
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [f"Elapsed: {summary['elapsed']:.1f}s"]
+        for endpoint, stats in sorted(summary['endpoints'].items()):
+            lines.append('')
+            lines.append(
+                f"{endpoint}: {stats['count']} requests, {stats['throughput']:.1f} req/s, "
+                f"{stats['error_rate']:.1%} errors, statuses {stats['statuses']}"
+            )
+            lines.append(
+                f"  latency ms: p50={stats['p50']:.1f} p90={stats['p90']:.1f} "
+                f"p99={stats['p99']:.1f} max={stats['max']:.1f}"
+            )
+            peak = max(stats['histogram'].values()) or 1
+            for label, count in stats['histogram'].items():
+                bar = '#' * round(40 * count / peak)
+                lines.append(f"  {label:>9} | {count:6d} {bar}")
+        total = sum(summary['outcomes'].values())
+        if total:
+            lines.append('')
+            lines.append(f"Sessions: {total}")
+            for outcome, count in sorted(summary['outcomes'].items()):
+                lines.append(f"  {outcome:<15} {count:6d} ({count / total:.1%})")
+        return '\n'.join(lines)
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def histogram(ordered: List[float]) -> Dict[str, int]:
+    """Counts samples (seconds) per LATENCY_BUCKETS_MS bucket."""
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for seconds in ordered:
+        counts[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+    labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+
+class MobileClientSimulator:
+    """
+    Plays one client per call to `run_session`.
+
+    Args:
+        base_url: Where the package URLs are mounted, e.g. 'http://127.0.0.1:8000/auth/'.
+        think_time: (min, max) seconds between request and verify.
+        wrong_caller_rate: Share of clients reporting a wrong caller ID first.
+        retry_rate: Share of clients re-requesting the call before verifying.
+        fraud_rate: Share of clients requesting calls to premium-rate
+            destinations and never verifying.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        app_signature: str,
+        recorder: LoadTestRecorder,
+        think_time: Tuple[float, float] = (2.0, 3.0),
+        wrong_caller_rate: float = 0.05,
+        retry_rate: float = 0.1,
+        fraud_rate: float = 0.02,
+        timeout: float = 10.0,
+    ):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.app_signature = app_signature
+        self.recorder = recorder
+        self.think_time = think_time
+        self.wrong_caller_rate = wrong_caller_rate
+        self.retry_rate = retry_rate
+        self.fraud_rate = fraud_rate
+        self.timeout = timeout
+        self._phones_lock = threading.Lock()
+        self.phones = set()
+
+    def post(self, endpoint: str, payload: dict, client_ip: str) -> Tuple[int, dict]:
+        request = urllib.request.Request(
+            self.base_url + endpoint + '/',
+            data=json.dumps(payload).encode(),
+            # Distinct client addresses keep DRF's anon throttle per simulated device
+            headers={'Content-Type': 'application/json', 'X-Forwarded-For': client_ip},
+            method='POST',
+        )
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except OSError:
+            status, body = 0, b''
+        self.recorder.record(endpoint, status, time.monotonic() - started)
+        try:
+            return status, json.loads(body or b'{}')
+        except ValueError:
+            return status, {}
+
+    def request_call(self, phone: str, client_ip: str) -> bool:
+        with self._phones_lock:
+            self.phones.add(phone)
+        status, _ = self.post('request', {'phone_number': phone, 'app_signature': self.app_signature}, client_ip)
+        return status == 202
+
+    def verify(self, phone: str, caller_id: str, client_ip: str) -> bool:
+        status, _ = self.post('verify', {'phone_number': phone, 'received_caller_id': caller_id}, client_ip)
+        return status == 200
+
+    def run_session(self, index: int) -> str:
+        client_ip = f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+        if random.random() < self.fraud_rate:
+            # International premium-rate range, a typical toll-pumping target
+            self.request_call(f"+8823{index:08d}", client_ip)
+            return FRAUD
+
+        phone = f"+1555{index:07d}"
+        if not self.request_call(phone, client_ip):
+            # The app offers "call me again" once
+            time.sleep(random.uniform(*self.think_time))
+            if not self.request_call(phone, client_ip):
+                return REQUEST_FAILED
+
+        time.sleep(random.uniform(*self.think_time))
+        if random.random() < self.retry_rate:
+            # User did not notice the call and asked for another one
+            self.request_call(phone, client_ip)
+            time.sleep(random.uniform(*self.think_time))
+
+        call = FakeCarrierGateway.last_call_to(phone)
+        if call is None:
+            return NO_CALL
+
+        if random.random() < self.wrong_caller_rate:
+            self.verify(phone, f"+1999{random.randrange(10 ** 7):07d}", client_ip)
+        return VERIFIED if self.verify(phone, call['from'], client_ip) else VERIFY_FAILED
+
+
+def run_load(simulator: MobileClientSimulator, sessions: int, concurrency: int, burst_size: int, burst_interval: float):
+    """
+    Starts `sessions` clients in bursts of `burst_size` every `burst_interval`
+    seconds, at most `concurrency` at a time. Returns the simulator's recorder.
+    """
+    recorder = simulator.recorder
+
+    def play(index):
+        recorder.record_outcome(simulator.run_session(index))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for start in range(0, sessions, burst_size):
+            if start:
+                time.sleep(burst_interval)
+            futures.extend(pool.submit(play, index) for index in range(start, min(start + burst_size, sessions)))
+        for future in futures:
+            future.result()
+    recorder.finish()
+    return recorder
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve(host: str = '127.0.0.1', port: int = 0):
+    """
+    Runs the project's WSGI application in a background thread and yields its
+    base URL (port 0 picks a free port).
+    """
+    server = ThreadedWSGIServer((host, port), QuietWSGIRequestHandler, allow_reuse_address=False)
+    server.set_app(get_internal_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
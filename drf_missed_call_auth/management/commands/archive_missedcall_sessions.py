@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from ...archive import DEFAULT_CHUNK_SIZE, FORMATS, archive_sessions, delete_archived
+from ...revocation import DEFAULT_BATCH_SIZE
+from ...settings import api_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams sessions that expired more than ARCHIVE_AFTER_DAYS days ago into compressed "
+        "files in ARCHIVE_DIR, then deletes the archived rows in batches. Runs are incremental: "
+        "each one resumes after the watermark recorded in the directory's manifest.json."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Archive directory (default: ARCHIVE_DIR).")
+        parser.add_argument('--days', type=int, help="Archive sessions expired more than this many days ago (default: ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--format', choices=FORMATS, default='jsonl', help="File format (default: jsonl).")
+        parser.add_argument('--rows-per-file', type=int, help="Rows per file before rotating (default: ARCHIVE_FILE_ROWS).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows fetched per round trip.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per DELETE.")
+        parser.add_argument('--keep', action='store_true', help="Archive only; leave the rows in the table.")
+
+    def handle(self, *args, **options):
+        days = api_settings.ARCHIVE_AFTER_DAYS if options['days'] is None else options['days']
+        try:
+            result = archive_sessions(
+                directory=options['dir'],
+                before=now() - timedelta(days=days),
+                fmt=options['format'],
+                rows_per_file=options['rows_per_file'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Archived {result['rows']} session(s) to {len(result['files'])} file(s).")
+        if not options['keep']:
+            deleted = delete_archived(options['dir'], batch_size=options['batch_size'])
+            self.stdout.write(f"Deleted {deleted} archived session(s).")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,103 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate, make_aware, now
+
+from ...models import CallSourceDailyStats, MissedCallVerification
+from ...sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds CallSourceDailyStats from the raw verification table for closed days. "
+        "Run it daily (for yesterday) to fill in expired counts, or once over a range "
+        "to seed the rollups. Existing rows for the covered days are overwritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help="Number of days before today to rebuild (default: 1).")
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD). Overrides --days.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD, default: yesterday).")
+
+    def handle(self, *args, **options):
+        today = localdate()
+        end = self.parse_day(options['end']) if options['end'] else today - timedelta(days=1)
+        start = self.parse_day(options['start']) if options['start'] else today - timedelta(days=options['days'])
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+        if end >= today:
+            self.stderr.write(self.style.WARNING(
+                "Rebuilding today overwrites counters still being written incrementally."
+            ))
+
+        rows = self.aggregate(start, end)
+        with transaction.atomic():
+            for row in rows:
+                CallSourceDailyStats.objects.update_or_create(
+                    source_id=row.pop('expected_caller_id'),
+                    date=row.pop('day'),
+                    defaults=row,
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} rollup row(s) for {start} to {end}."))
+
+    def parse_day(self, value):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date: {value}")
+        return day
+
+    def aggregate(self, start, end):
+        verified = Q(is_verified=True, verified_at__isnull=False)
+        buckets = {}
+        lower = None
+        for field, upper in CallSourceDailyStats.TTV_BUCKETS:
+            condition = verified
+            if lower is not None:
+                condition &= Q(ttv__gte=timedelta(seconds=lower))
+            if upper is not None:
+                condition &= Q(ttv__lt=timedelta(seconds=upper))
+            buckets[field] = Count('id', filter=condition)
+            lower = upper
+
+        def aggregate_shard(db):
+            queryset = (
+                MissedCallVerification.objects.using(db)
+                .annotate(
+                    day=TruncDate('created_at'),
+                    ttv=ExpressionWrapper(F('verified_at') - F('created_at'), output_field=DurationField()),
+                )
+                # Range on the raw column so the created_at index is usable
+                .filter(
+                    created_at__gte=make_aware(datetime.combine(start, time.min)),
+                    created_at__lt=make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+                )
+                .values('expected_caller_id', 'day')
+                .annotate(
+                    sent=Count('id'),
+                    verified=Count('id', filter=Q(is_verified=True)),
+                    failed=Sum('attempt_count'),
+                    expired=Count('id', filter=Q(is_verified=False, expires_at__lte=now())),
+                    **buckets
+                )
+                .order_by()
+            )
+            return list(queryset)
+
+        # Every count is a sum, so the rows of the shards add up
+        merged = {}
+        for rows in fan_out(aggregate_shard).values():
+            for row in rows:
+                row = dict(row, failed=row['failed'] or 0)
+                key = (row['expected_caller_id'], row['day'])
+                if key in merged:
+                    for field, value in row.items():
+                        if field not in ('expected_caller_id', 'day'):
+                            merged[key][field] += value
+                else:
+                    merged[key] = row
+        return list(merged.values())
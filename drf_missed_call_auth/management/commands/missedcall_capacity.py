@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...capacity import get_pool_capacity
+from ...settings import api_settings
+from ...tenants import DEFAULT_TENANT, get_tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports caller-pool usage over the last CAPACITY_WINDOW seconds: call rate, "
+        "headroom, trend and projected time to saturation, plus per-number rates. "
+        "Exits with status 1 when the pool is saturated or exhausted (use --check in monitoring)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+        parser.add_argument('--top', type=int, default=10, help="Busiest numbers to list (default: 10, 0 for all).")
+        parser.add_argument('--check', action='store_true', help="Fail when utilization crosses CAPACITY_WARNING_UTILIZATION.")
+        parser.add_argument('--tenant', default=DEFAULT_TENANT, help="Report on this tenant's pool (default: the default pool).")
+
+    def handle(self, *args, **options):
+        try:
+            get_tenant(options['tenant'])
+        except KeyError:
+            raise CommandError(f"Unknown tenant '{options['tenant']}'.")
+        report = get_pool_capacity(include_numbers=True, tenant=options['tenant'])
+        # Only the listing is truncated; saturation counts every number
+        top = options['top'] or None
+
+        if options['json']:
+            self.stdout.write(json.dumps(report.as_dict(top=top), indent=2))
+        else:
+            self.write_report(report, top)
+
+        if report.exhausted or report.headroom <= 0:
+            raise CommandError("Caller pool is saturated.")
+        if options['check'] and report.utilization >= api_settings.CAPACITY_WARNING_UTILIZATION:
+            raise CommandError(f"Caller pool utilization is {report.utilization:.0%}.")
+
+    def write_report(self, report, top=None):
+        minutes = report.minutes_to_saturation
+        if minutes is None:
+            projection = "not growing"
+        else:
+            projection = f"~{minutes:.0f} min"
+        self.stdout.write(
+            f"Active numbers:      {report.active_numbers}\n"
+            f"Capacity:            {report.capacity} calls/min ({report.per_number_cap} per number)\n"
+            f"Current rate:        {report.rate:.2f} calls/min (peak {report.peak_rate})\n"
+            f"Headroom:            {report.headroom:.2f} calls/min ({report.utilization:.0%} used)\n"
+            f"Trend:               {report.trend:+.3f} calls/min per minute\n"
+            f"Saturation in:       {projection}\n"
+            f"Exhausted requests:  {report.exhausted}\n"
+            f"Numbers at cap:      {len(report.saturated_numbers)}"
+        )
+        if report.numbers:
+            self.stdout.write("\nBusiest numbers (calls/min):")
+            for number, rate in report.numbers[:top]:
+                style = self.style.WARNING if rate >= report.per_number_cap else str
+                self.stdout.write(style(f"  {number.phone_number:<18} {rate:6.2f}  {number.label}"))
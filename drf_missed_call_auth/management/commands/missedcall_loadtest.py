@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import NoReverseMatch, reverse
+
+from ... import stats
+from ...gateways.fake import FakeCarrierGateway
+from ...loadtest import LoadTestRecorder, MobileClientSimulator, run_load, serve
+from ...models import CallSourceNumber, MissedCallVerification
+from ...settings import api_settings
+from ...sharding import group_phones
+
+POOL_LABEL = 'loadtest'
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays simulated mobile clients against a local server running this project "
+        "with a fake carrier, then reports throughput, error rates and latency histograms. "
+        "Writes sessions to the configured database; point it at a disposable one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200, help="Number of simulated clients (default: 200).")
+        parser.add_argument('--concurrency', type=int, default=50, help="Clients in flight at once (default: 50).")
+        parser.add_argument('--burst-size', type=int, default=25, help="Clients started per burst (default: 25).")
+        parser.add_argument('--burst-interval', type=float, default=1.0, help="Seconds between bursts (default: 1).")
+        parser.add_argument('--think-min', type=float, default=2.0, help="Min seconds before verifying (default: 2).")
+        parser.add_argument('--think-max', type=float, default=3.0, help="Max seconds before verifying (default: 3).")
+        parser.add_argument('--wrong-caller-rate', type=float, default=0.05)
+        parser.add_argument('--retry-rate', type=float, default=0.1)
+        parser.add_argument('--fraud-rate', type=float, default=0.02)
+        parser.add_argument('--carrier-latency', type=float, default=0.1, help="Fake carrier latency in seconds.")
+        parser.add_argument('--carrier-jitter', type=float, default=0.1, help="Extra random carrier latency.")
+        parser.add_argument('--carrier-failure-rate', type=float, default=0.01)
+        parser.add_argument('--pool-size', type=int, default=10, help="Source numbers to create (default: 10).")
+        parser.add_argument('--app-signature', help="Signature to send (default: first allowed signature).")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=0, help="Port to serve on (default: any free port).")
+        parser.add_argument('--keep-data', action='store_true', help="Keep the sessions and pool numbers created.")
+
+    def handle(self, *args, **options):
+        if options['think_min'] > options['think_max']:
+            raise CommandError("--think-min must not exceed --think-max.")
+        try:
+            prefix = reverse('drf_missed_call_auth:request').rsplit('request/', 1)[0]
+        except NoReverseMatch:
+            raise CommandError("Include drf_missed_call_auth.urls in ROOT_URLCONF to run the load test.")
+
+        signature = options['app_signature'] or next(iter(api_settings.ALLOWED_APP_SIGNATURES), 'loadtest-app-signature')
+        pool = self.create_pool(options['pool_size'])
+        FakeCarrierGateway.reset()
+        FakeCarrierGateway.configure(
+            latency=options['carrier_latency'],
+            jitter=options['carrier_jitter'],
+            failure_rate=options['carrier_failure_rate'],
+        )
+
+        overrides = {'GATEWAY_CLASS': 'fake'}
+        simulator = None
+        try:
+            with override_settings(MISSEDCALL_AUTH={**getattr(settings, 'MISSEDCALL_AUTH', {}), **overrides}):
+                with serve(options['host'], options['port']) as base_url:
+                    self.stdout.write(f"Serving on {base_url}, {options['sessions']} client(s)...")
+                    simulator = MobileClientSimulator(
+                        base_url + prefix,
+                        signature,
+                        LoadTestRecorder(),
+                        think_time=(options['think_min'], options['think_max']),
+                        wrong_caller_rate=options['wrong_caller_rate'],
+                        retry_rate=options['retry_rate'],
+                        fraud_rate=options['fraud_rate'],
+                    )
+                    recorder = run_load(
+                        simulator,
+                        sessions=options['sessions'],
+                        concurrency=options['concurrency'],
+                        burst_size=options['burst_size'],
+                        burst_interval=options['burst_interval'],
+                    )
+        finally:
+            # Apply buffered rollup counters while the pool rows still exist
+            stats.flush()
+            if not options['keep_data']:
+                self.cleanup(pool, simulator.phones if simulator else ())
+
+        self.stdout.write(recorder.format())
+        self.stdout.write(f"\nCalls placed by the fake carrier: {len(FakeCarrierGateway.calls())}")
+
+    def create_pool(self, size):
+        pool = []
+        for index in range(size):
+            number, _ = CallSourceNumber.objects.get_or_create(
+                phone_number=f"+1999555{index:04d}",
+                defaults={'label': POOL_LABEL, 'is_active': True},
+            )
+            pool.append(number)
+        return [number.pk for number in pool if number.label == POOL_LABEL]
+
+    def cleanup(self, pool, phones):
+        for db, shard_phones in group_phones(phones).items():
+            for start in range(0, len(shard_phones), 500):
+                MissedCallVerification.objects.using(db).filter(user_phone__in=shard_phones[start:start + 500]).delete()
+        # Cascades to the sessions and rollups of the load-test numbers
+        CallSourceNumber.objects.filter(pk__in=pool, label=POOL_LABEL).delete()
@@ -0,0 +1,78 @@
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...profiling import has_signal_handler, load_profiles
+from ...settings import api_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the sampled profiles of the request/verify endpoints and session "
+        "authentication, merged over every process that wrote to PROFILING_DIR. "
+        "With --pid, the processes are first asked to write their latest samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Profile directory (default: PROFILING_DIR).")
+        parser.add_argument(
+            '--pid', type=int, action='append', default=[],
+            help="Send PROFILING_DUMP_SIGNAL to this worker process first (repeatable).",
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Signal processes that didn't record the dump handler in the profile directory.",
+        )
+        parser.add_argument('--wait', type=float, default=2.0, help="Seconds to wait after signalling (default: 2).")
+        parser.add_argument(
+            '--endpoint', action='append', default=[],
+            help="Only this profile: request, verify or authenticate (repeatable).",
+        )
+        parser.add_argument('--sort', default='cumulative', help="pstats sort key (default: cumulative).")
+        parser.add_argument('--limit', type=int, default=30, help="Functions listed per profile (default: 30).")
+        parser.add_argument('--output', help="Also write each merged profile to <output>/<endpoint>.prof.")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or api_settings.PROFILING_DIR
+        if not directory:
+            raise CommandError("Set MISSEDCALL_AUTH['PROFILING_DIR'] or pass --dir.")
+
+        if options['pid']:
+            if not api_settings.PROFILING_DUMP_SIGNAL:
+                raise CommandError("PROFILING_DUMP_SIGNAL is disabled.")
+            signum = getattr(signal, api_settings.PROFILING_DUMP_SIGNAL)
+            missing = [pid for pid in options['pid'] if not has_signal_handler(pid, directory)]
+            if missing and not options['force']:
+                # The default action of the signal terminates the process
+                raise CommandError(
+                    f"No {api_settings.PROFILING_DUMP_SIGNAL} handler recorded for process(es) "
+                    f"{', '.join(map(str, missing))}; signalling would kill them. Gunicorn workers "
+                    "forked after --preload must install it from post_worker_init. "
+                    "Pass --force to signal anyway."
+                )
+            for pid in options['pid']:
+                try:
+                    os.kill(pid, signum)
+                except OSError as e:
+                    raise CommandError(f"Could not signal process {pid}: {e}")
+            time.sleep(options['wait'])
+
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} does not exist; no profiles were written yet.")
+        profiles = load_profiles(directory, names=options['endpoint'])
+        if not profiles:
+            self.stdout.write(self.style.WARNING(f"No profiles in {directory}."))
+            return
+        if options['output']:
+            os.makedirs(options['output'], exist_ok=True)
+
+        for name, (files, stats) in sorted(profiles.items()):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({files} process file(s), {stats.total_calls:,} calls)"))
+            stats.stream = self.stdout
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+            if options['output']:
+                path = os.path.join(options['output'], f"{name}.prof")
+                stats.dump_stats(path)
+                self.stdout.write(f"Wrote {path}")
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ...storage import benchmark_layouts
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the legacy and compact (COMPACT_STORAGE) session layouts on this database: "
+        "inserts the same synthetic rows into a scratch table per layout and reports insert "
+        "throughput and table/index size. The scratch tables are dropped afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Rows per layout (default: 100000).")
+        parser.add_argument('--signatures', type=int, default=30, help="Distinct app signatures (default: 30).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT (default: 1000).")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database to benchmark on (default: 'default').")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['signatures'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--rows, --signatures and --batch-size must be positive.")
+        results = benchmark_layouts(
+            rows=options['rows'],
+            signatures=options['signatures'],
+            batch_size=options['batch_size'],
+            using=options['database'],
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        legacy, compact = results['legacy'], results['compact']
+        self.stdout.write(f"{'':<16}{'legacy':>14}{'compact':>14}{'ratio':>9}")
+        for label, key in (
+            ("Rows/s", 'rows_per_second'),
+            ("Table bytes", 'table_bytes'),
+            ("Index bytes", 'index_bytes'),
+        ):
+            self.stdout.write(
+                f"{label:<16}{self.format(legacy[key]):>14}{self.format(compact[key]):>14}"
+                f"{self.ratio(compact[key], legacy[key]):>9}"
+            )
+        if legacy['table_bytes'] is None:
+            self.stdout.write(self.style.WARNING("This database backend doesn't report table sizes."))
+
+    @staticmethod
+    def format(value):
+        return '-' if value is None else f"{value:,}"
+
+    @staticmethod
+    def ratio(value, baseline):
+        if not value or not baseline:
+            return '-'
+        return f"{value / baseline:.2f}x"
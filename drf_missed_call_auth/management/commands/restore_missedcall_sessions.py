@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...archive import import_archive, iter_archive
+from ...revocation import DEFAULT_BATCH_SIZE
+from ...utils import normalize_phone_number
+
+
+class Command(BaseCommand):
+    help = (
+        "Reads sessions back from archive files or archive directories written by "
+        "archive_missedcall_sessions, and re-inserts them (or prints them with --print). "
+        "Restored sessions are recorded in their directory's manifest.json, so later archive "
+        "runs keep them; delete them by hand once done."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Archive files or directories.")
+        parser.add_argument('--phone', help="Only sessions of this user phone number.")
+        parser.add_argument('--print', action='store_true', help="Print the rows as JSON lines instead of importing them.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        phone = normalize_phone_number(options['phone']) if options['phone'] else None
+
+        try:
+            if options['print']:
+                for record in iter_archive(options['paths'], phone=phone):
+                    self.stdout.write(json.dumps(record))
+                return
+            imported, skipped = import_archive(options['paths'], phone=phone, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if skipped:
+            self.stderr.write(self.style.WARNING(
+                f"Skipped {skipped} session(s) whose source number no longer exists."
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Restored {imported} session(s)."))
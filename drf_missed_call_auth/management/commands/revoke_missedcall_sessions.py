@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...revocation import DEFAULT_BATCH_SIZE, revoke_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Immediately expires every active verification session for a phone number, "
+        "an app signature and/or a source number. Criteria are combined with AND."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--phone', help="User phone number.")
+        parser.add_argument('--app-signature', help="Application signature.")
+        parser.add_argument('--caller', help="Source number the sessions were dialed from.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per UPDATE.")
+
+    def handle(self, *args, **options):
+        try:
+            count = revoke_sessions(
+                phone=options['phone'],
+                app_signature=options['app_signature'],
+                caller_number=options['caller'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Revoked {count} session(s)."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...settings import api_settings
+from ...sharding import sync_call_sources
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the call source numbers of PRIMARY_DB_ALIAS to every session shard. "
+        "Run it after adding a shard (once its tables are migrated) or after changing "
+        "numbers with QuerySet.update(), which bypasses the mirroring signals."
+    )
+
+    def handle(self, *args, **options):
+        if not api_settings.SESSION_SHARDS:
+            raise CommandError("SESSION_SHARDS is not configured.")
+        count = sync_call_sources()
+        self.stdout.write(self.style.SUCCESS(f"Synced call source numbers to {count} shard(s)."))
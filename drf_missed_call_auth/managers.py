@@ -8,13 +8,17 @@ class CallSourceManager(models.Manager):
     selection logic for the number pool.
     """
 
-    def get_active_pool(self) -> models.QuerySet:
+    def get_active_pool(self, tenant: Optional[str] = None) -> models.QuerySet:
         """
-        Returns a QuerySet of numbers marked as active.
+        Returns a QuerySet of numbers marked as active, optionally only those
+        of one tenant.
         """
-        return self.filter(is_active=True)
+        queryset = self.filter(is_active=True)
+        if tenant is not None:
+            queryset = queryset.filter(tenant=tenant)
+        return queryset
 
-    def get_random_sender(self, exclude_number: Optional[str] = None):
+    def get_random_sender(self, exclude_number: Optional[str] = None, tenant: Optional[str] = None):
         """
         Picks a random active sender from the pool.
         
@@ -25,7 +29,43 @@ class CallSourceManager(models.Manager):
         Returns:
             A random CallSourceNumber instance, or None if no active numbers are available.
         """
-        queryset = self.get_active_pool()
+        queryset = self.get_active_pool(tenant)
         if exclude_number:
             queryset = queryset.exclude(phone_number=exclude_number)
-        return queryset.order_by('?').first()
\ No newline at end of file
+        return queryset.order_by('?').first()
+
+
+class CallSourceStatsManager(models.Manager):
+    """
+    Read helpers over the daily rollups, used instead of aggregating the raw
+    verification table.
+    """
+
+    def totals_by_source(self, since=None, tenant: Optional[str] = None) -> dict:
+        """
+        Returns `{source_id: {'sent': .., 'verified': .., 'failed': .., 'expired': ..}}`
+        summed over all days, or days on/after `since`, optionally only for
+        the numbers of one tenant.
+        """
+        from django.db.models import Sum
+
+        queryset = self.all()
+        if since is not None:
+            queryset = queryset.filter(date__gte=since)
+        if tenant is not None:
+            queryset = queryset.filter(source__tenant=tenant)
+        rows = queryset.values('source_id').annotate(
+            sent_total=Sum('sent'),
+            verified_total=Sum('verified'),
+            failed_total=Sum('failed'),
+            expired_total=Sum('expired'),
+        )
+        return {
+            row['source_id']: {
+                'sent': row['sent_total'],
+                'verified': row['verified_total'],
+                'failed': row['failed_total'],
+                'expired': row['expired_total'],
+            }
+            for row in rows
+        }
@@ -1,14 +1,21 @@
+import math
 import uuid
 from datetime import timedelta
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
-from .validators import phone_number_validator
-from .managers import CallSourceManager
+from . import sharding
+from .fields import E164Field, InternedSignatureField
 from .settings import api_settings
+from .validators import phone_number_validator
+from .managers import CallSourceManager, CallSourceStatsManager
+from .tenants import resolve_tenant
 
+# Decides the schema, so it is read once; switching needs a migration (see storage.py)
+COMPACT_STORAGE = api_settings.COMPACT_STORAGE
 
 
 class CallSourceNumber(models.Model):
@@ -34,6 +41,14 @@ class CallSourceNumber(models.Model):
         verbose_name=_("label"),
         help_text=_("Internal name to identify this specific line (e.g., 'Twilio US 01').")
     )
+    tenant = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        verbose_name=_("tenant"),
+        help_text=_("Name of the tenant profile whose requests this line serves (empty for the default pool).")
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -47,6 +62,67 @@ class CallSourceNumber(models.Model):
         return f"{self.label or _('Source')} ({self.phone_number})"
 
 
+class AppSignature(models.Model):
+    """
+    Lookup table of app signatures, referenced by id from sessions when
+    COMPACT_STORAGE is enabled.
+    """
+    value = models.CharField(max_length=255, unique=True, verbose_name=_("signature"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("app signature")
+        verbose_name_plural = _("app signatures")
+
+    def __str__(self):
+        return self.value
+
+
+class DeliveryStatus(models.TextChoices):
+    """
+    Provider-reported lifecycle of the flash call placed for a session.
+    Values follow Twilio's CallStatus vocabulary.
+    """
+    UNKNOWN = '', _('Unknown')
+    QUEUED = 'queued', _('Queued')
+    INITIATED = 'initiated', _('Initiated')
+    RINGING = 'ringing', _('Ringing')
+    IN_PROGRESS = 'in-progress', _('In progress')
+    COMPLETED = 'completed', _('Completed')
+    BUSY = 'busy', _('Busy')
+    FAILED = 'failed', _('Failed')
+    NO_ANSWER = 'no-answer', _('No answer')
+    CANCELED = 'canceled', _('Canceled')
+
+    @classmethod
+    def rank(cls, value: str) -> int:
+        """Statuses only move forward; final states share the highest rank."""
+        return DELIVERY_STATUS_RANKS.get(value, -1)
+
+
+DELIVERY_STATUS_RANKS = {
+    DeliveryStatus.UNKNOWN: 0,
+    DeliveryStatus.QUEUED: 1,
+    DeliveryStatus.INITIATED: 2,
+    DeliveryStatus.RINGING: 3,
+    DeliveryStatus.IN_PROGRESS: 4,
+    DeliveryStatus.COMPLETED: 5,
+    DeliveryStatus.BUSY: 5,
+    DeliveryStatus.FAILED: 5,
+    DeliveryStatus.NO_ANSWER: 5,
+    DeliveryStatus.CANCELED: 5,
+}
+
+
+class VerificationDirection(models.TextChoices):
+    """
+    Who places the call: we ring the user (outbound flash call), or the user
+    rings the assigned pool number and is matched by the inbound webhook.
+    """
+    OUTBOUND = 'outbound', _('Outbound')
+    INBOUND = 'inbound', _('Inbound')
+
+
 class MissedCallVerification(models.Model):
     """
     Tracks an active authentication session.
@@ -57,18 +133,31 @@ class MissedCallVerification(models.Model):
         default=uuid.uuid4,
         editable=False
     )
-    user_phone = models.CharField(
-        max_length=32,
-        db_index=True,
-        verbose_name=_("user phone number"),
-        validators=[phone_number_validator]
-    )
-    app_signature = models.CharField(
-        max_length=255,
-        db_index=True,
-        verbose_name=_("application signature"),
-        help_text=_("Unique hash identifying the mobile application binary.")
-    )
+    if COMPACT_STORAGE:
+        # 8-byte integers instead of strings; values are still '+...' / str
+        user_phone = E164Field(
+            db_index=True,
+            verbose_name=_("user phone number"),
+            validators=[phone_number_validator]
+        )
+        app_signature = InternedSignatureField(
+            db_index=True,
+            verbose_name=_("application signature"),
+            help_text=_("Unique hash identifying the mobile application binary.")
+        )
+    else:
+        user_phone = models.CharField(
+            max_length=32,
+            db_index=True,
+            verbose_name=_("user phone number"),
+            validators=[phone_number_validator]
+        )
+        app_signature = models.CharField(
+            max_length=255,
+            db_index=True,
+            verbose_name=_("application signature"),
+            help_text=_("Unique hash identifying the mobile application binary.")
+        )
     expected_caller = models.ForeignKey(
         CallSourceNumber,
         on_delete=models.CASCADE,
@@ -79,13 +168,37 @@ class MissedCallVerification(models.Model):
     # Status Fields
     is_verified = models.BooleanField(default=False, verbose_name=_("is verified"))
     verified_at = models.DateTimeField(null=True, blank=True, verbose_name=_("verified at"))
+    direction = models.CharField(
+        max_length=8,
+        choices=VerificationDirection.choices,
+        default=VerificationDirection.OUTBOUND,
+        verbose_name=_("direction"),
+        help_text=_("Inbound sessions are verified by the user calling the expected caller, not by /verify/.")
+    )
     
+    # Delivery tracking (populated by the provider's status callbacks)
+    provider_call_id = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name=_("provider call id"),
+        help_text=_("Identifier of the placed call at the telephony provider (e.g., Twilio Call SID).")
+    )
+    delivery_status = models.CharField(
+        max_length=16,
+        blank=True,
+        choices=DeliveryStatus.choices,
+        default=DeliveryStatus.UNKNOWN,
+        verbose_name=_("delivery status")
+    )
+    delivery_updated_at = models.DateTimeField(null=True, blank=True, verbose_name=_("delivery updated at"))
+
     # Security & Metadata
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name=_("IP address"))
     attempt_count = models.PositiveSmallIntegerField(default=0, verbose_name=_("attempt count"))
     
     # Timing
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("created at"))
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("created at"))
     expires_at = models.DateTimeField(db_index=True, verbose_name=_("expires at"))
 
     class Meta:
@@ -99,9 +212,19 @@ class MissedCallVerification(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = now() + timedelta(seconds=api_settings.VALIDITY_PERIOD)
+            self.expires_at = now() + timedelta(seconds=self.tenant.VALIDITY_PERIOD)
+        if sharding.is_enabled():
+            # Sessions only ever live on the shard their id points to
+            if self._state.adding:
+                sharding.assign_session_id(self)
+            kwargs['using'] = sharding.db_for_session(self.pk)
         super().save(*args, **kwargs)
 
+    @property
+    def tenant(self):
+        """The tenant profile of the app that requested this session."""
+        return resolve_tenant(self.app_signature)
+
     @property
     def is_expired(self) -> bool:
         return now() >= self.expires_at
@@ -112,12 +235,35 @@ class MissedCallVerification(models.Model):
         Checks if the session is still within the validity window, 
         not yet verified, and hasn't exceeded attempt limits.
         """
-        max_attempts = getattr(api_settings, 'MAX_VERIFICATION_ATTEMPTS', 3)
         return (
             not self.is_verified and 
             not self.is_expired and 
-            self.attempt_count < max_attempts
+            self.attempt_count < self.tenant.MAX_VERIFICATION_ATTEMPTS
+        )
+
+    def increment_attempt(self, by: int = 1) -> None:
+        """
+        Atomically records failed attempts in the database.
+        The verify path buffers these instead (see `attempts.py`).
+        """
+        type(self).objects.using(sharding.db_for_session(self.pk)).filter(pk=self.pk).update(
+            attempt_count=models.F('attempt_count') + by
         )
+        self.attempt_count += by
+
+    @classmethod
+    def cleanup_expired(cls, days_old: int = 7, batch_size: int = 1000):
+        """
+        Deletes sessions that expired more than `days_old` days ago, in
+        batches. Use `manage.py archive_missedcall_sessions` to keep a copy.
+
+        Returns:
+            tuple: (deleted count, {model label: count}), like `QuerySet.delete()`.
+        """
+        from .revocation import delete_sessions
+        cutoff = now() - timedelta(days=days_old)
+        deleted = delete_sessions(cls.objects.filter(expires_at__lt=cutoff), batch_size=batch_size)
+        return deleted, {cls._meta.label: deleted}
 
     @property
     def time_remaining(self):
@@ -132,4 +278,143 @@ class MissedCallVerification(models.Model):
         return _("Verification for %(phone)s (Expected: %(caller)s)") % {
             'phone': self.user_phone,
             'caller': self.expected_caller.phone_number
-        }
\ No newline at end of file
+        }
+
+
+class CallSourceDailyStats(models.Model):
+    """
+    Per-number, per-day rollup of verification outcomes.
+
+    Maintained incrementally from the request/verify paths (see `stats.py`)
+    and rebuilt for closed days by `manage.py backfill_missedcall_stats`,
+    so analytics never scan `MissedCallVerification` and survive cleanup.
+    Time-to-verify is kept as a fixed histogram; the median is derived from it.
+    """
+    TTV_BUCKETS = (
+        ('ttv_under_5s', 5),
+        ('ttv_under_10s', 10),
+        ('ttv_under_20s', 20),
+        ('ttv_under_30s', 30),
+        ('ttv_under_60s', 60),
+        ('ttv_over_60s', None),
+    )
+
+    source = models.ForeignKey(
+        CallSourceNumber,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name=_("source number")
+    )
+    date = models.DateField(verbose_name=_("date"))
+    sent = models.PositiveIntegerField(default=0, verbose_name=_("sent"))
+    verified = models.PositiveIntegerField(default=0, verbose_name=_("verified"))
+    failed = models.PositiveIntegerField(default=0, verbose_name=_("failed attempts"))
+    expired = models.PositiveIntegerField(default=0, verbose_name=_("expired"))
+
+    ttv_under_5s = models.PositiveIntegerField(default=0)
+    ttv_under_10s = models.PositiveIntegerField(default=0)
+    ttv_under_20s = models.PositiveIntegerField(default=0)
+    ttv_under_30s = models.PositiveIntegerField(default=0)
+    ttv_under_60s = models.PositiveIntegerField(default=0)
+    ttv_over_60s = models.PositiveIntegerField(default=0)
+
+    objects = CallSourceStatsManager()
+
+    class Meta:
+        verbose_name = _("call source daily stats")
+        verbose_name_plural = _("call source daily stats")
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'date'], name='unique_source_daily_stats'),
+        ]
+
+    @classmethod
+    def ttv_bucket(cls, seconds: float) -> str:
+        """Name of the histogram field counting a time-to-verify of `seconds`."""
+        for field, upper in cls.TTV_BUCKETS:
+            if upper is None or seconds < upper:
+                return field
+
+    @property
+    def median_time_to_verify(self):
+        """
+        Upper bound (in seconds) of the histogram bucket holding the median,
+        or None when nothing was verified. The open-ended last bucket yields
+        `math.inf`.
+        """
+        total = sum(getattr(self, field) for field, _upper in self.TTV_BUCKETS)
+        if not total:
+            return None
+        running = 0
+        for field, upper in self.TTV_BUCKETS:
+            running += getattr(self, field)
+            if running * 2 >= total:
+                return math.inf if upper is None else upper
+
+    @property
+    def conversion_rate(self):
+        return self.verified / self.sent if self.sent else None
+
+    def __str__(self):
+        return f"{self.source.phone_number} @ {self.date}"
+
+
+class AuditEventType(models.TextChoices):
+    REQUEST = 'request', _('Request')
+    DISPATCH = 'dispatch', _('Dispatch')
+    VERIFY_SUCCESS = 'verify_success', _('Verification succeeded')
+    VERIFY_FAILURE = 'verify_failure', _('Verification failed')
+    EXPIRED = 'expired', _('Expired')
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only audit trail, written in batches by `audit.py`.
+
+    Not linked by foreign key so the trail outlives session cleanup; phone
+    numbers are stored masked.
+    """
+    event = models.CharField(max_length=20, choices=AuditEventType.choices, db_index=True, verbose_name=_("event"))
+    session_id = models.UUIDField(null=True, blank=True, db_index=True, verbose_name=_("session"))
+    phone = models.CharField(max_length=32, blank=True, verbose_name=_("phone (masked)"))
+    ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name=_("IP address"))
+    user_agent = models.CharField(max_length=255, blank=True, verbose_name=_("user agent"))
+    app_signature = models.CharField(max_length=255, blank=True, verbose_name=_("app signature"))
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_("status code"))
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("duration (ms)"))
+    data = models.JSONField(default=dict, blank=True, verbose_name=_("data"))
+    created_at = models.DateTimeField(db_index=True, verbose_name=_("created at"))
+
+    class Meta:
+        verbose_name = _("audit event")
+        verbose_name_plural = _("audit events")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_event_display()} @ {self.created_at:%Y-%m-%d %H:%M:%S}"
+
+
+class DynamicSetting(models.Model):
+    """
+    A MISSEDCALL_AUTH value changed at runtime, without a restart.
+    Applied by `config.py` when DYNAMIC_CONFIG_ENABLED is set.
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name=_("setting"))
+    value = models.JSONField(verbose_name=_("value"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+
+    class Meta:
+        verbose_name = _("dynamic setting")
+        verbose_name_plural = _("dynamic settings")
+        ordering = ['key']
+
+    def clean(self):
+        from .config import check_value, is_dynamic
+        if not is_dynamic(self.key):
+            raise ValidationError({'key': _("%(key)s cannot be changed at runtime.") % {'key': self.key}})
+        error = check_value(self.key, self.value)
+        if error:
+            raise ValidationError({'value': error})
+
+    def __str__(self):
+        return self.key
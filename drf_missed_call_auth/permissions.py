@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from rest_framework import permissions
 
 class IsMissedCallVerified(permissions.BasePermission):
@@ -10,8 +11,25 @@ class IsMissedCallVerified(permissions.BasePermission):
         if not session_id:
             return False
             
+        from django.utils.timezone import now
         from .models import MissedCallVerification
-        return MissedCallVerification.objects.filter(
-            id=session_id, 
-            is_verified=True
-        ).exists()
\ No newline at end of file
+        from .settings import api_settings
+        from .sharding import db_for_session
+
+        def verified_on(hints):
+            return MissedCallVerification.objects.db_manager(db_for_session(session_id), hints=hints).filter(
+                id=session_id,
+                is_verified=True,
+                expires_at__gt=now()
+            ).exists()
+
+        try:
+            if verified_on({'session_id': session_id}):
+                return True
+            # Replication lag may hide a freshly verified session (shards have no replicas)
+            return (
+                bool(api_settings.READ_REPLICA_ALIAS) and not api_settings.SESSION_SHARDS
+                and verified_on({'primary': True})
+            )
+        except (ValueError, ValidationError):
+            return False
\ No newline at end of file
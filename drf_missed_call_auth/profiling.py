@@ -0,0 +1,206 @@
+"""
+Opt-in sampling profiler for the request/verify endpoints and session
+authentication.
+
+With PROFILING_ENABLED, a PROFILING_SAMPLE_RATE share of the calls wrapped by
+`profiled` runs under cProfile. The results are merged per hook name
+('request', 'verify', 'authenticate') into one `pstats.Stats` per process, so
+memory stays bounded by the number of distinct functions, not by traffic.
+When disabled, a hook costs one settings lookup.
+
+Each process writes its aggregates to PROFILING_DIR as
+`<name>-<host>-<pid>.prof`: every PROFILING_DUMP_INTERVAL seconds, at exit,
+and on demand when it receives PROFILING_DUMP_SIGNAL (SIGUSR2 by default;
+send it to the workers, not to a gunicorn master). The handler is installed
+when the app loads and leaves a marker for its pid in PROFILING_DIR;
+`manage.py missedcall_profile --pid` refuses to signal processes without
+one, since the signal's default action terminates them. That includes
+gunicorn workers forked after `--preload`: workers reset their signal
+handlers at startup, so install it again from the `post_worker_init` hook
+(`install_signal_handler()`). `manage.py missedcall_profile` merges the files
+of all processes and prints them; they also open in any pstats viewer
+(snakeviz, `python -m pstats`).
+
+One call is profiled at a time per process, and calls nested in a profiled
+one (authentication inside a view) are part of the outer profile.
+"""
+import atexit
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import random
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Held while a call is profiled; sampled calls that find it taken run as usual
+_profiling = threading.Lock()
+_stats: Dict[str, pstats.Stats] = {}
+_samples: Dict[str, int] = {}
+_last_dump = time.monotonic()
+
+
+def profiled(name: str):
+    """
+    Decorator sampling calls of the wrapped function into the `name` profile.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not api_settings.PROFILING_ENABLED or random.random() >= api_settings.PROFILING_SAMPLE_RATE:
+                return func(*args, **kwargs)
+            if not _profiling.acquire(blocking=False):
+                return func(*args, **kwargs)
+            try:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler owns the interpreter (Python 3.12+)
+                    return func(*args, **kwargs)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    _add(name, profile)
+            finally:
+                _profiling.release()
+        return wrapper
+    return decorator
+
+
+def _add(name: str, profile: cProfile.Profile) -> None:
+    global _last_dump
+    with _lock:
+        if name in _stats:
+            _stats[name].add(profile)
+        else:
+            _stats[name] = pstats.Stats(profile)
+        _samples[name] = _samples.get(name, 0) + 1
+        due = time.monotonic() - _last_dump >= api_settings.PROFILING_DUMP_INTERVAL
+        if due:
+            _last_dump = time.monotonic()
+    if due and api_settings.PROFILING_DIR:
+        dump()
+
+
+def get_profiles() -> Dict[str, Tuple[int, pstats.Stats]]:
+    """{name: (samples, stats)} aggregated by this process so far."""
+    with _lock:
+        return {name: (_samples[name], stats) for name, stats in _stats.items()}
+
+
+def dump(directory: Optional[str] = None) -> List[str]:
+    """
+    Writes this process' aggregates to `directory` (PROFILING_DIR by
+    default), replacing its previous files.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    directory = directory or api_settings.PROFILING_DIR
+    if not directory:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    suffix = f"{socket.gethostname()}-{os.getpid()}"
+    paths = []
+    with _lock:
+        for name, stats in _stats.items():
+            path = os.path.join(directory, f"{name}-{suffix}.prof")
+            # Readers never see a half-written file
+            stats.dump_stats(f"{path}.part")
+            os.replace(f"{path}.part", path)
+            paths.append(path)
+    if paths:
+        logger.info(f"Wrote {len(paths)} profile(s) to {directory}")
+    return paths
+
+
+def discard() -> None:
+    """Drops the aggregates (e.g. in a freshly forked worker)."""
+    with _lock:
+        _stats.clear()
+        _samples.clear()
+
+
+def load_profiles(directory: str, names: Optional[List[str]] = None) -> Dict[str, Tuple[int, pstats.Stats]]:
+    """
+    Merges the files written by `dump` in `directory`, per hook name.
+
+    Returns:
+        dict: {name: (number of files, stats)}
+    """
+    files: Dict[str, List[str]] = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.prof'):
+            continue
+        name = filename.split('-', 1)[0]
+        if names and name not in names:
+            continue
+        files.setdefault(name, []).append(os.path.join(directory, filename))
+    return {name: (len(paths), pstats.Stats(*paths)) for name, paths in files.items()}
+
+
+def _dump_on_signal(signum, frame):
+    # Signal handlers run between bytecodes of the main thread, possibly while
+    # it holds _lock; dumping from a thread avoids deadlocking on it
+    threading.Thread(target=dump, name='missedcall-profile-dump', daemon=True).start()
+
+
+def _marker_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f".handler-{socket.gethostname()}-{pid}")
+
+
+def _remove_marker(path: str, pid: int) -> None:
+    # Forked children inherit the atexit hook, not the marker
+    if os.getpid() == pid:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def has_signal_handler(pid: int, directory: Optional[str] = None) -> bool:
+    """Whether process `pid` of this host installed the dump handler."""
+    directory = directory or api_settings.PROFILING_DIR
+    return bool(directory) and os.path.exists(_marker_path(directory, pid))
+
+
+def install_signal_handler() -> bool:
+    """
+    Dumps the aggregates on PROFILING_DUMP_SIGNAL. Only possible from the
+    main thread; returns whether the handler was installed.
+    """
+    name = api_settings.PROFILING_DUMP_SIGNAL
+    if not name or threading.current_thread() is not threading.main_thread():
+        return False
+    try:
+        signal.signal(getattr(signal, name), _dump_on_signal)
+    except (AttributeError, ValueError, OSError) as e:
+        logger.warning(f"Could not install the profile dump handler for {name}: {e}")
+        return False
+
+    directory = api_settings.PROFILING_DIR
+    if directory:
+        pid = os.getpid()
+        path = _marker_path(directory, pid)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            open(path, 'w').close()
+        except OSError as e:
+            logger.warning(f"Could not record the profile dump handler in {directory}: {e}")
+        else:
+            atexit.register(_remove_marker, path, pid)
+    return True
+
+
+atexit.register(dump)
@@ -0,0 +1,117 @@
+"""
+Bulk expiry of verification sessions.
+
+Used when a phone is reported stolen, an app signature is rotated or a source
+number is compromised. Sessions are expired in batches of primary keys, one
+indexed `UPDATE` per batch, so revoking millions of rows never holds a long
+lock. Every batch emits `sessions_revoked`, which purges the cached state
+snapshots and notifies open event streams. Deletion of old sessions
+(`delete_sessions`) is batched the same way.
+
+With SESSION_SHARDS, a queryset without an explicit database (`using()`) is
+processed on every shard in parallel.
+"""
+import logging
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.timezone import now
+
+from .models import MissedCallVerification
+from .sharding import db_for_phone, fan_out
+from .signals import sessions_revoked
+from .utils import normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _on_shards(func, queryset: QuerySet) -> int:
+    # An explicit database wins; otherwise every shard (or the routers' choice)
+    shards = [queryset._db] if queryset._db else None
+    return sum(fan_out(lambda db: func(queryset.using(db), db), shards).values())
+
+
+def expire_sessions(queryset: QuerySet, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Expires every still-active session in `queryset`.
+
+    Returns:
+        int: Number of sessions expired.
+    """
+    def expire(queryset, db):
+        total = 0
+        queryset = queryset.order_by()
+        while True:
+            with transaction.atomic(using=db):
+                timestamp = now()
+                session_ids = list(queryset.filter(expires_at__gt=timestamp).values_list('id', flat=True)[:batch_size])
+                if not session_ids:
+                    break
+                total += MissedCallVerification.objects.using(db).filter(id__in=session_ids).update(expires_at=timestamp)
+            sessions_revoked.send(sender=MissedCallVerification, session_ids=session_ids)
+        return total
+
+    total = _on_shards(expire, queryset)
+    logger.info(f"Expired {total} verification session(s)")
+    return total
+
+
+def delete_sessions(queryset: QuerySet, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Deletes every session in `queryset`, one short transaction per batch.
+
+    Returns:
+        int: Number of sessions deleted.
+    """
+    def delete(queryset, db):
+        total = 0
+        queryset = queryset.order_by()
+        while True:
+            with transaction.atomic(using=db):
+                session_ids = list(queryset.values_list('id', flat=True)[:batch_size])
+                if not session_ids:
+                    break
+                deleted, _ = MissedCallVerification.objects.using(db).filter(id__in=session_ids).delete()
+                total += deleted
+        return total
+
+    total = _on_shards(delete, queryset)
+    logger.info(f"Deleted {total} verification session(s)")
+    return total
+
+
+def revoke_sessions(
+    phone: Optional[str] = None,
+    app_signature: Optional[str] = None,
+    caller_number: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Expires all active sessions matching every given criterion.
+
+    Args:
+        phone: User phone number (normalized before matching).
+        app_signature: Exact application signature.
+        caller_number: Source number the sessions were dialed from.
+
+    Raises:
+        ValueError: if no criterion is given.
+    """
+    filters = {}
+    if phone:
+        filters['user_phone'] = normalize_phone_number(phone)
+    if app_signature:
+        filters['app_signature'] = app_signature
+    if caller_number:
+        filters['expected_caller__phone_number'] = normalize_phone_number(caller_number)
+    if not filters:
+        raise ValueError("At least one of phone, app_signature or caller_number is required.")
+
+    queryset = MissedCallVerification.objects.filter(**filters)
+    if phone:
+        # All sessions of a phone live on one shard
+        queryset = queryset.using(db_for_phone(filters['user_phone']))
+    return expire_sessions(queryset, batch_size=batch_size)
@@ -0,0 +1,185 @@
+"""
+Toll-pumping (international revenue share fraud) screening.
+
+Runs in `MissedCallRequestSerializer.validate` before a caller is picked, so a
+rejected request never costs a call. Destinations are grouped by their first
+RISK_PREFIX_LENGTH characters (e.g. '+88231').
+
+1. RISK_BLOCKED_PREFIXES and RISK_HIGH_RISK_PREFIXES are compiled once into a
+   set per prefix length; lookup is longest-prefix-first.
+2. Per-prefix sent and verified counts live in the shared cache as sliding
+   window counters (current and previous RISK_WINDOW bucket, the previous one
+   weighted by how much of it still overlaps the window), so a request costs
+   one `get_many` and a call one `incr`.
+3. Calls sent within the longest tenant VALIDITY_PERIOD may still be
+   verified, so they are not samples yet: a third counter, over buckets of
+   that length, is subtracted from the sent count. A burst of sign-ups is
+   judged once its sessions have had the chance to verify.
+4. When a prefix has at least RISK_MIN_SAMPLES settled calls in the window
+   (fewer for high-risk prefixes) and its conversion is below
+   RISK_MIN_CONVERSION, it is blocked for RISK_BLOCK_SECONDS and
+   `prefix_blocked` is sent.
+"""
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .exceptions import DestinationBlocked
+from .settings import api_settings
+from .signals import missed_call_sent, prefix_blocked, verification_success
+from .tenants import get_tenants
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY = 'drf_missed_call_auth:risk:{}:{}:{}'
+BLOCK_KEY = 'drf_missed_call_auth:risk:blocked:{}'
+
+BLOCKED = 'blocked'
+HIGH_RISK = 'high_risk'
+
+
+class PrefixTable:
+    """Static prefix classification with longest-prefix-first lookup."""
+
+    def __init__(self, blocked=(), high_risk=()):
+        self.levels = {}
+        # Blocked wins over high-risk for the same prefix
+        for level, prefixes in ((HIGH_RISK, high_risk), (BLOCKED, blocked)):
+            for prefix in prefixes:
+                self.levels.setdefault(len(prefix), {})[prefix] = level
+        self.lengths = sorted(self.levels, reverse=True)
+
+    def match(self, phone: str) -> Optional[str]:
+        for length in self.lengths:
+            level = self.levels[length].get(phone[:length])
+            if level:
+                return level
+        return None
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_prefix_table() -> PrefixTable:
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = PrefixTable(api_settings.RISK_BLOCKED_PREFIXES, api_settings.RISK_HIGH_RISK_PREFIXES)
+    return _table
+
+
+@receiver(setting_changed)
+def _reset_prefix_table(setting, **kwargs):
+    global _table
+    if setting == 'MISSEDCALL_AUTH':
+        _table = None
+
+
+def get_prefix(phone: str) -> str:
+    return phone[:api_settings.RISK_PREFIX_LENGTH]
+
+
+def _buckets(window: Optional[int] = None) -> Tuple[int, int, float]:
+    """Current bucket, previous bucket and the weight of the previous one."""
+    window = window or api_settings.RISK_WINDOW
+    now = time.time()
+    current = int(now // window)
+    return current, current - 1, 1 - (now % window) / window
+
+
+def _pending_window() -> int:
+    """Seconds during which a sent call may still be verified."""
+    return max(tenant.VALIDITY_PERIOD for tenant in get_tenants())
+
+
+def _incr(kind: str, prefix: str, window: Optional[int] = None) -> None:
+    window = window or api_settings.RISK_WINDOW
+    key = COUNTER_KEY.format(kind, prefix, _buckets(window)[0])
+    # Two windows: the bucket is still read as "previous" during the next one
+    if not cache.add(key, 1, window * 2):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, window * 2)
+
+
+def get_prefix_stats(prefix: str) -> Tuple[bool, float, float]:
+    """
+    Returns (dynamically blocked, sent, verified) for `prefix` over the
+    window. `sent` leaves out calls whose sessions may still be verified.
+    """
+    current, previous, weight = _buckets()
+    pending_current, pending_previous, pending_weight = _buckets(_pending_window())
+    keys = [
+        BLOCK_KEY.format(prefix),
+        COUNTER_KEY.format('sent', prefix, current),
+        COUNTER_KEY.format('sent', prefix, previous),
+        COUNTER_KEY.format('verified', prefix, current),
+        COUNTER_KEY.format('verified', prefix, previous),
+        COUNTER_KEY.format('pending', prefix, pending_current),
+        COUNTER_KEY.format('pending', prefix, pending_previous),
+    ]
+    values = cache.get_many(keys)
+    blocked, sent, sent_before, verified, verified_before, pending, pending_before = (
+        values.get(key, 0) for key in keys
+    )
+    sent = max(0, sent + sent_before * weight - pending - pending_before * pending_weight)
+    return bool(blocked), sent, verified + verified_before * weight
+
+
+def block_prefix(prefix: str, sent: float = 0, verified: float = 0) -> None:
+    cache.set(BLOCK_KEY.format(prefix), True, api_settings.RISK_BLOCK_SECONDS)
+    logger.warning(f"Blocked destination prefix {prefix}: {verified:.0f}/{sent:.0f} calls verified")
+    prefix_blocked.send(sender=PrefixTable, prefix=prefix, sent=sent, verified=verified)
+
+
+def unblock_prefix(prefix: str) -> None:
+    """Lifts an automatic block (static RISK_BLOCKED_PREFIXES still apply)."""
+    cache.delete(BLOCK_KEY.format(prefix))
+
+
+def assess_destination(phone: str) -> None:
+    """
+    Screens a normalized destination number before a call is placed.
+
+    Raises:
+        DestinationBlocked: if the number's prefix is blocked statically or
+            was blocked automatically.
+    """
+    if not api_settings.RISK_CHECKS_ENABLED:
+        return
+
+    level = get_prefix_table().match(phone)
+    if level == BLOCKED:
+        raise DestinationBlocked()
+
+    prefix = get_prefix(phone)
+    blocked, sent, verified = get_prefix_stats(prefix)
+    if blocked:
+        raise DestinationBlocked()
+
+    min_samples = api_settings.RISK_HIGH_RISK_MIN_SAMPLES if level == HIGH_RISK else api_settings.RISK_MIN_SAMPLES
+    if sent >= min_samples and verified < sent * api_settings.RISK_MIN_CONVERSION:
+        block_prefix(prefix, sent, verified)
+        raise DestinationBlocked()
+
+
+@receiver(missed_call_sent)
+def _count_sent(sender, verification_instance, **kwargs):
+    if api_settings.RISK_CHECKS_ENABLED:
+        prefix = get_prefix(verification_instance.user_phone)
+        _incr('sent', prefix)
+        _incr('pending', prefix, _pending_window())
+
+
+@receiver(verification_success)
+def _count_verified(sender, verification_instance, **kwargs):
+    if api_settings.RISK_CHECKS_ENABLED:
+        _incr('verified', get_prefix(verification_instance.user_phone))
@@ -0,0 +1,89 @@
+"""
+Database router sending this package's reads to a replica.
+
+Enable it with:
+
+```python
+DATABASE_ROUTERS = ['drf_missed_call_auth.routers.MissedCallReplicaRouter']
+MISSEDCALL_AUTH = {'READ_REPLICA_ALIAS': 'replica'}
+```
+
+Writes always go to PRIMARY_DB_ALIAS. Reads go to the replica unless the
+query carries one of these hints (see `MissedCallVerification.objects.db_manager`):
+
+- `primary=True`: read-before-write paths such as verify.
+- `session_id=<id>`: the session was written less than READ_REPLICA_PIN_SECONDS
+  ago (tracked in the shared cache), so it is read from the primary to avoid
+  missing a freshly verified session because of replication lag.
+
+Only models of this app are routed; everything else is left to other routers.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .settings import api_settings
+from .signals import delivery_status_changed, sessions_revoked, verification_success
+
+APP_LABEL = 'drf_missed_call_auth'
+PIN_KEY = 'drf_missed_call_auth:pin:{}'
+
+
+def pin_to_primary(*session_ids) -> None:
+    """Routes reads of `session_ids` to the primary for the pin window."""
+    if api_settings.READ_REPLICA_ALIAS and session_ids:
+        timeout = api_settings.READ_REPLICA_PIN_SECONDS
+        cache.set_many({PIN_KEY.format(session_id): True for session_id in session_ids}, timeout=timeout)
+
+
+def is_pinned(session_id) -> bool:
+    return bool(cache.get(PIN_KEY.format(session_id)))
+
+
+class MissedCallReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        replica = api_settings.READ_REPLICA_ALIAS
+        if not replica or hints.get('primary'):
+            return api_settings.PRIMARY_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Follow relations on the database the instance came from
+            return instance._state.db
+        session_id = hints.get('session_id')
+        if session_id is not None and is_pinned(session_id):
+            return api_settings.PRIMARY_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        return api_settings.PRIMARY_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.app_label == APP_LABEL and obj2._meta.app_label == APP_LABEL:
+            return True
+        return None
+
+
+@receiver(post_save, sender='drf_missed_call_auth.MissedCallVerification')
+def _pin_saved_session(sender, instance, **kwargs):
+    pin_to_primary(instance.pk)
+
+
+@receiver(verification_success)
+def _pin_verified_session(sender, verification_instance, **kwargs):
+    # Verify writes through a conditional update, which sends no post_save
+    pin_to_primary(verification_instance.pk)
+
+
+@receiver(delivery_status_changed)
+def _pin_on_delivery_status(sender, session_id, **kwargs):
+    pin_to_primary(session_id)
+
+
+@receiver(sessions_revoked)
+def _pin_revoked_sessions(sender, session_ids, **kwargs):
+    pin_to_primary(*session_ids)
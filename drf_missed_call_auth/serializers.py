@@ -1,17 +1,29 @@
 from django.db import transaction
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from .models import MissedCallVerification, CallSourceNumber
+from .models import MissedCallVerification, VerificationDirection
+from .attempts import check_lockout, get_session_failures
+from .capacity import record_exhaustion
+from .leases import lease_caller, release_lease
+from .risk import assess_destination
+from .tenants import resolve_tenant
 from .utils import normalize_phone_number, validate_app_signature, get_gateway
-from .signals import missed_call_sent, verification_success
+from .signals import missed_call_sent, sessions_revoked, verification_success
 from .exceptions import TelephonyError
+from .bulk import get_authorized_tenant
+from .inbound import is_inbound, register_session
+from .settings import api_settings
+from .sharding import db_for_phone
+from . import issuance
 
 
 class MissedCallRequestSerializer(serializers.Serializer):
     """
     Handles the initiation of a flash call.
-    Validates the app binary and selects an available line from the pool.
+    Validates the app binary, resolves its tenant and selects an available
+    line from the tenant's pool.
     """
     phone_number = serializers.CharField(max_length=32)
     app_signature = serializers.CharField(max_length=255)
@@ -20,55 +32,107 @@ class MissedCallRequestSerializer(serializers.Serializer):
         return normalize_phone_number(value)
 
     def validate(self, attrs):
-        # 1. Security Check: Validate App Signature
-        if not validate_app_signature(attrs['app_signature']):
+        # 1. Security Check: Validate App Signature. Signatures listed by a
+        # tenant profile are valid by definition; others fall to the default
+        # tenant's ALLOWED_APP_SIGNATURES
+        tenant = resolve_tenant(attrs['app_signature'])
+        if tenant.is_default and not validate_app_signature(attrs['app_signature']):
             # Use a generic error for security to prevent fingerprinting
             raise serializers.ValidationError(_("Request could not be authorized."))
 
-        # 2. Pool Selection Logic
-        pool_manager = CallSourceNumber.objects
+        # 2. Fraud Screening: refuse toll-pumping destinations before a call is spent
+        assess_destination(attrs['phone_number'])
+        # Phones locked out for guessing get no new calls either
+        check_lockout(attrs['phone_number'])
+
+        # 3. Pool Selection Logic
         # Performance: Get last used caller for this phone to avoid repeat usage
-        last_caller_id = MissedCallVerification.objects.filter(
+        last_caller_id = MissedCallVerification.objects.using(db_for_phone(attrs['phone_number'])).filter(
             user_phone=attrs['phone_number']
         ).values_list('expected_caller__phone_number', flat=True).first()
 
-        caller = pool_manager.get_random_sender(exclude_number=last_caller_id)
+        # Leased for the validity window: concurrent sessions of this phone
+        # never share a caller
+        caller = lease_caller(attrs['phone_number'], exclude_number=last_caller_id, tenant=tenant)
         if not caller:
+            record_exhaustion(tenant.name)
             raise serializers.ValidationError(_("Verification service is temporarily unavailable."))
 
         attrs['chosen_caller'] = caller
+        attrs['tenant'] = tenant
         return attrs
 
     def create(self, validated_data):
         """
-        Atomically creates a session and triggers the gateway.
+        Creates a session and triggers the gateway, or in inbound mode indexes
+        the session for the inbound webhook.
+
+        The session is committed before dialing: dispatch retries sleep
+        between provider round trips and must not hold a transaction (and,
+        on SQLite, the write lock) open meanwhile. A session whose call
+        could not be placed is deleted again.
         """
         try:
-            with transaction.atomic():
-                verification = MissedCallVerification.objects.create(
-                    user_phone=validated_data['phone_number'],
-                    app_signature=validated_data['app_signature'],
-                    expected_caller=validated_data['chosen_caller']
-                )
-                gateway = get_gateway()
-                call_sent = gateway.trigger_missed_call(
-                    to_number=verification.user_phone,
-                    from_number=verification.expected_caller.phone_number
-                )
+            inbound = is_inbound(validated_data['tenant'])
+            verification = MissedCallVerification.objects.using(db_for_phone(validated_data['phone_number'])).create(
+                user_phone=validated_data['phone_number'],
+                app_signature=validated_data['app_signature'],
+                expected_caller=validated_data['chosen_caller'],
+                ip_address=validated_data.get('ip_address'),
+                direction=VerificationDirection.INBOUND if inbound else VerificationDirection.OUTBOUND,
+            )
+            if inbound:
+                # The user places the call; the inbound webhook verifies it
+                register_session(verification)
+            else:
+                gateway = get_gateway(validated_data['tenant'])
+                try:
+                    # Retries transient provider errors within the validity window
+                    call_sent = gateway.dispatch(verification)
+                except Exception:
+                    verification.delete()
+                    raise
                 if not call_sent:
+                    verification.delete()
                     raise TelephonyError()  # Use custom exception
 
-                missed_call_sent.send(sender=self.__class__, verification_instance=verification)
-                return verification
+            missed_call_sent.send(sender=self.__class__, verification_instance=verification)
+            return verification
 
         except TelephonyError:
+            release_lease(validated_data['phone_number'], validated_data['chosen_caller'].pk)
             # Re-raise to be handled by DRF's exception handler
             raise
         except Exception as e:
+            release_lease(validated_data['phone_number'], validated_data['chosen_caller'].pk)
             # Fallback for unexpected errors (e.g., DB issues)
             raise serializers.ValidationError(_("Could not initiate verification call. Please try again."))
 
 
+class MissedCallBulkRequestSerializer(serializers.Serializer):
+    """
+    Validates a bulk request as a whole; phones are checked one by one by
+    `bulk.request_verifications`, which reports each of them.
+    """
+    phone_numbers = serializers.ListField(child=serializers.CharField(max_length=32), allow_empty=False)
+    app_signature = serializers.CharField(max_length=255)
+
+    def validate_phone_numbers(self, value):
+        if len(value) > api_settings.BULK_MAX_PHONES:
+            raise serializers.ValidationError(
+                _("At most %(count)d phone numbers per request.") % {'count': api_settings.BULK_MAX_PHONES}
+            )
+        return value
+
+    def validate_app_signature(self, value):
+        tenant = get_authorized_tenant(value)
+        if tenant is None:
+            raise serializers.ValidationError(_("Request could not be authorized."))
+        if is_inbound(tenant):
+            raise serializers.ValidationError(_("Bulk requests are not available in inbound mode."))
+        return value
+
+
 class MissedCallVerifySerializer(serializers.Serializer):
     """
     Handles the 'Zero-Code' confirmation.
@@ -81,32 +145,82 @@ class MissedCallVerifySerializer(serializers.Serializer):
         phone = normalize_phone_number(attrs['phone_number'])
         caller_id = normalize_phone_number(attrs['received_caller_id'])
 
-        # Find the specific pending session
-        session = MissedCallVerification.objects.filter(
-            user_phone=phone,
-            is_verified=False
-        ).order_by('-created_at').first()
+        check_lockout(phone)
 
-        if not session or not session.is_valid:
+        # All pending sessions of the phone in one indexed query (on the
+        # primary: they were created seconds ago and are about to be written).
+        # A user who requested twice may receive the older call last.
+        # Inbound sessions are verified by the call itself; the number to
+        # call is no secret, so it can't be reported here
+        pending = list(MissedCallVerification.objects.db_manager(db_for_phone(phone), hints={'primary': True}).filter(
+            user_phone=phone,
+            direction=VerificationDirection.OUTBOUND,
+            is_verified=False,
+            expires_at__gt=now()
+        ).select_related('expected_caller').order_by('-created_at'))
+
+        # attempt_count is written in batches; the cached counters are current
+        failures = get_session_failures(session.pk for session in pending)
+        for session in pending:
+            session.attempt_count = max(session.attempt_count, failures.get(session.pk, 0))
+        sessions = [session for session in pending if session.is_valid]
+
+        if not sessions:
             raise serializers.ValidationError(_("No active verification session found."))
 
         # Strict Caller ID Match
-        if session.expected_caller.phone_number != caller_id:
+        session = next((candidate for candidate in sessions if candidate.expected_caller.phone_number == caller_id), None)
+        if session is None:
             from .signals import verification_failed
+            latest = sessions[0]
             verification_failed.send(
                 sender=self.__class__,
+                session_id=latest.pk,
+                verification_instance=latest,
                 phone_number=phone,
-                expected=session.expected_caller.phone_number,
+                expected=latest.expected_caller.phone_number,
                 received=caller_id
             )
             raise serializers.ValidationError(_("Verification failed. Incorrect caller identified."))
 
         attrs['session'] = session
+        attrs['sibling_ids'] = [candidate.pk for candidate in sessions if candidate.pk != session.pk]
         return attrs
 
+    def create(self, validated_data):
+        """The view saves without an instance; verify the matched session."""
+        return self.update(validated_data['session'], validated_data)
+
     def update(self, instance, validated_data):
-        """Marks the session as verified and emits success signal."""
-        instance.is_verified = True
-        instance.save(update_fields=['is_verified'])
+        """
+        Marks the session as verified and expires the phone's other pending
+        sessions in one transaction, then emits the signals. With
+        USER_PHONE_FIELD, the user is provisioned and `self.credentials`
+        issued in that same transaction.
+        """
+        sibling_ids = validated_data.get('sibling_ids', [])
+        timestamp = now()
+        self.credentials = {}
+        # The phone's sessions share a shard
+        db = db_for_phone(instance.user_phone)
+        with transaction.atomic(using=db):
+            # Conditional update: a concurrent verify or revocation wins the race
+            verified = MissedCallVerification.objects.using(db).filter(
+                pk=instance.pk, is_verified=False, expires_at__gt=timestamp
+            ).update(is_verified=True, verified_at=timestamp)
+            if not verified:
+                raise serializers.ValidationError(_("No active verification session found."))
+            if sibling_ids:
+                MissedCallVerification.objects.using(db).filter(
+                    pk__in=sibling_ids, is_verified=False
+                ).update(expires_at=timestamp)
+            instance.is_verified = True
+            instance.verified_at = timestamp
+            if issuance.is_enabled():
+                # Same transaction: if provisioning fails, the session isn't consumed
+                self.credentials = issuance.issue_credentials(instance)
+
         verification_success.send(sender=self.__class__, verification_instance=instance)
+        if sibling_ids:
+            sessions_revoked.send(sender=MissedCallVerification, session_ids=sibling_ids)
         return instance
\ No newline at end of file
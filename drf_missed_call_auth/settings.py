@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
 from rest_framework.settings import APISettings
 
 USER_SETTINGS = getattr(settings, 'MISSEDCALL_AUTH', {})
@@ -14,16 +15,237 @@ DEFAULTS = {
     # Session validity in seconds (default: 5 minutes)
     'VALIDITY_PERIOD': 300,
 
+    # Failed verifications a single session accepts before it is dead
+    'MAX_VERIFICATION_ATTEMPTS': 3,
+    # Lock a phone out after this many failures within the window (seconds)...
+    'PHONE_MAX_FAILURES': 5,
+    'PHONE_FAILURE_WINDOW': 3600,
+    # ...for LOCKOUT_BASE seconds, doubling per lockout up to LOCKOUT_MAX
+    'LOCKOUT_BASE': 60,
+    'LOCKOUT_MAX': 86400,
+    # Buffered attempt_count writes: flush after this many failures or seconds
+    'ATTEMPT_FLUSH_SIZE': 50,
+    'ATTEMPT_FLUSH_INTERVAL': 10,
+
+    # Map verified phones to users: a unique field of the user model holding
+    # the E.164 number (e.g. 'username'). Unknown phones get a new user with
+    # an unusable password. None leaves this to get_success_response().
+    'USER_PHONE_FIELD': None,
+    # Seconds a phone -> user id mapping stays cached
+    'USER_CACHE_TIMEOUT': 3600,
+
     # Optional: DRF Token model path (e.g., 'rest_framework.authtoken.Token')
     'TOKEN_MODEL': None,
+    # Credentials returned with USER_PHONE_FIELD: 'token' (TOKEN_MODEL, DRF's
+    # authtoken by default), 'jwt' (djangorestframework-simplejwt), or a dotted
+    # path to a callable (user_id, session) -> dict. Defaults to 'token' when
+    # TOKEN_MODEL is set, else only the user id is returned.
+    'TOKEN_ISSUER': None,
+
+    # BaseMissedCallGateway subclass used to place calls: a key of GATEWAYS
+    # or a dotted path. Resolved on first dispatch, so provider SDKs are only
+    # imported by processes that actually place calls.
+    'GATEWAY_CLASS': 'twilio',
+    # Named gateways; add your own provider here
+    'GATEWAYS': {
+        'twilio': 'drf_missed_call_auth.gateways.twilio.TwilioGateway',
+        'fake': 'drf_missed_call_auth.gateways.fake.FakeCarrierGateway',
+    },
+
+    # Tenant profiles keyed by name, each with its own APP_SIGNATURES, caller
+    # pool (CallSourceNumber.tenant) and optional VALIDITY_PERIOD,
+    # MAX_VERIFICATION_ATTEMPTS, GATEWAY_CLASS, VERIFICATION_MODE and
+    # THROTTLE_RATE. See tenants.py.
+    'TENANTS': {},
 
     # Twilio credentials (can also be set via env vars)
     'TWILIO_ACCOUNT_SID': '',
     'TWILIO_AUTH_TOKEN': '',
+
+    # Gateway dispatch retries (exponential backoff with full jitter)
+    'DISPATCH_MAX_ATTEMPTS': 3,
+    'DISPATCH_BACKOFF_BASE': 0.5,  # seconds
+    'DISPATCH_BACKOFF_MAX': 4.0,  # seconds
+    # Don't retry once less than this many seconds of the session remain
+    'DISPATCH_MIN_REMAINING': 30,
+
+    # Absolute URL of the delivery-status webhook registered on each call,
+    # e.g. 'https://api.example.com/auth/callbacks/status/'. Empty disables it.
+    'STATUS_CALLBACK_URL': '',
+
+    # 'outbound': we flash-call the user, who reports the caller ID to verify/.
+    # 'inbound': request/ returns a pool number for the user to call; the
+    # provider's inbound-call webhook verifies the session (see inbound.py).
+    # Use inbound where carriers block flash calls.
+    'VERIFICATION_MODE': 'outbound',
+    # Absolute URL of the inbound-call webhook as configured at the provider,
+    # e.g. 'https://api.example.com/auth/callbacks/inbound/' (signature checks)
+    'INBOUND_CALLBACK_URL': '',
+    # STIR/SHAKEN attestation levels a caller ID must carry to verify an
+    # inbound session, where the provider reports one (Twilio: StirVerstat)
+    'INBOUND_ATTESTATION_LEVELS': ['A'],
+    # Also refuse inbound calls that carry no attestation at all
+    'INBOUND_REQUIRE_ATTESTATION': False,
+
+    # Expose GET status/<session_id>/ for client polling
+    'ENABLE_STATUS_ENDPOINT': True,
+    # Upper bound for long-polling (?wait=<seconds>); 0 disables long-polling
+    'STATUS_LONG_POLL_TIMEOUT': 25,
+    # How often a held long-poll request re-checks the cached state
+    'STATUS_LONG_POLL_INTERVAL': 0.5,
+
+    # Push verification events over SSE (events/<session_id>/, ASGI only)
+    'ENABLE_EVENT_STREAM': False,
+    # Pub/sub backend; use RedisEventBackend when running several processes
+    'EVENT_BACKEND': 'drf_missed_call_auth.events.InProcessEventBackend',
+    'EVENT_REDIS_URL': 'redis://localhost:6379/0',
+    # Seconds between keepalive messages on idle streams
+    'EVENT_STREAM_HEARTBEAT': 15,
+
+    # Bulk requests from trusted servers (bulk.py); POST request/bulk/ is
+    # only routed with ENABLE_BULK_ENDPOINT and requires BULK_PERMISSION_CLASS
+    'ENABLE_BULK_ENDPOINT': False,
+    'BULK_PERMISSION_CLASS': 'rest_framework.permissions.IsAdminUser',
+    'BULK_MAX_PHONES': 10000,
+    # Calls placed at the same time by one batch
+    'BULK_DISPATCH_CONCURRENCY': 8,
+    # Source numbers are paced at CAPACITY_CALLS_PER_NUMBER_PER_MINUTE; phones
+    # that would wait longer than this (seconds) for a caller are rejected
+    'BULK_MAX_DELAY': 60,
+
+    # Daily usage rollups: flush buffered counters after this many events...
+    'STATS_FLUSH_SIZE': 100,
+    # ...or this many seconds, whichever comes first
+    'STATS_FLUSH_INTERVAL': 10,
+
+    # Pool capacity planning: sliding window for call rates (whole minutes)...
+    'CAPACITY_WINDOW': 900,
+    # ...calls a single source number may place per minute before carriers filter it...
+    'CAPACITY_CALLS_PER_NUMBER_PER_MINUTE': 6,
+    # ...and the thresholds at which system checks warn
+    'CAPACITY_WARNING_UTILIZATION': 0.8,
+    'CAPACITY_SATURATION_HORIZON': 3600,  # seconds
+
+    # Toll-fraud screening of destinations before a call is placed
+    'RISK_CHECKS_ENABLED': True,
+    # Destinations are grouped by this many leading characters ('+' included)
+    'RISK_PREFIX_LENGTH': 6,
+    # Prefixes always refused / judged on fewer samples, e.g. ['+88', '+2376']
+    'RISK_BLOCKED_PREFIXES': [],
+    'RISK_HIGH_RISK_PREFIXES': [],
+    # Sliding window (seconds) for per-prefix sent/verified counts
+    'RISK_WINDOW': 3600,
+    # Block a prefix once it has this many calls in the window (or the
+    # high-risk count for RISK_HIGH_RISK_PREFIXES)...
+    'RISK_MIN_SAMPLES': 30,
+    'RISK_HIGH_RISK_MIN_SAMPLES': 5,
+    # ...and less than this share of them verified
+    'RISK_MIN_CONVERSION': 0.1,
+    'RISK_BLOCK_SECONDS': 86400,
+
+    # Audit trail of request/dispatch/verify/expiry events
+    'AUDIT_ENABLED': True,
+    # DatabaseAuditBackend (AuditEvent table) or JSONLinesAuditBackend (AUDIT_LOG_FILE)
+    'AUDIT_BACKEND': 'drf_missed_call_auth.audit.DatabaseAuditBackend',
+    'AUDIT_LOG_FILE': 'missedcall_audit.jsonl',
+    # Ring buffer size; the oldest events are dropped if writes fall behind
+    'AUDIT_BUFFER_SIZE': 10000,
+    # Write a batch once this many events are pending or seconds have passed
+    'AUDIT_FLUSH_SIZE': 100,
+    'AUDIT_FLUSH_INTERVAL': 5,
+
+    # Archival of expired sessions (manage.py archive_missedcall_sessions):
+    # directory of the compressed files, age of the sessions archived and
+    # deleted (days since expiry), and rows per file before rotating
+    'ARCHIVE_DIR': '',
+    'ARCHIVE_AFTER_DAYS': 7,
+    'ARCHIVE_FILE_ROWS': 100000,
+
+    # Store session phone numbers as integers and app signatures as ids into
+    # the AppSignature table. Read once at startup: switching an existing
+    # database needs the migration described in storage.py.
+    'COMPACT_STORAGE': False,
+
+    # Runtime overrides edited in the DynamicSetting table (see config.py).
+    # Workers re-check one cache key at most every POLL_INTERVAL seconds.
+    'DYNAMIC_CONFIG_ENABLED': False,
+    'DYNAMIC_CONFIG_POLL_INTERVAL': 5,
+
+    # Sampling profiler (profiling.py): run this share of request/verify calls
+    # and session authentications under cProfile, aggregated per process
+    'PROFILING_ENABLED': False,
+    'PROFILING_SAMPLE_RATE': 0.01,
+    # Each process writes its aggregates here every DUMP_INTERVAL seconds, at
+    # exit and on DUMP_SIGNAL (read at startup); read them with
+    # manage.py missedcall_profile
+    'PROFILING_DIR': '',
+    'PROFILING_DUMP_INTERVAL': 60,
+    'PROFILING_DUMP_SIGNAL': 'SIGUSR2',
+
+    # Database aliases the sessions are sharded over by phone hash (see
+    # sharding.py). Part of the data layout: only ever append to it.
+    'SESSION_SHARDS': [],
+    # Threads querying the shards at once for cross-shard work
+    'SHARD_FANOUT_WORKERS': 8,
+
+    # Read-replica routing (requires routers.MissedCallReplicaRouter)
+    'PRIMARY_DB_ALIAS': 'default',
+    'READ_REPLICA_ALIAS': None,
+    # Seconds a written session keeps being read from the primary
+    'READ_REPLICA_PIN_SECONDS': 5,
 }
 
+
+class MissedCallSettings(APISettings):
+    """
+    Reads user settings from MISSEDCALL_AUTH lazily, so `reload()` (and thus
+    `override_settings`) picks up changes instead of falling back to
+    REST_FRAMEWORK.
+
+    Values are served from a single snapshot dict (defaults, MISSEDCALL_AUTH,
+    then runtime overrides from config.py) that is replaced as a whole, so a
+    reader never sees a half-applied change and needs no lock.
+    """
+    _snapshot = None
+    _overrides = {}
+
+    @property
+    def user_settings(self):
+        if not hasattr(self, '_user_settings'):
+            self._user_settings = getattr(settings, 'MISSEDCALL_AUTH', {})
+        return self._user_settings
+
+    def __getattr__(self, attr):
+        if attr not in self.defaults:
+            raise AttributeError(f"Invalid API setting: '{attr}'")
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = self._build_snapshot()
+        return snapshot[attr]
+
+    def _build_snapshot(self) -> dict:
+        return {**self.defaults, **self.user_settings, **self._overrides}
+
+    def apply_overrides(self, overrides: dict) -> None:
+        """Swaps in runtime overrides, which win over MISSEDCALL_AUTH."""
+        self._overrides = dict(overrides)
+        self._snapshot = self._build_snapshot()
+
+    def reload(self):
+        super().reload()
+        self._snapshot = None
+
+
 # Apply settings
-api_settings = APISettings(USER_SETTINGS, DEFAULTS)
+api_settings = MissedCallSettings(None, DEFAULTS)
+
+
+def reload_api_settings(*args, **kwargs):
+    if kwargs['setting'] == 'MISSEDCALL_AUTH':
+        api_settings.reload()
+
+
+setting_changed.connect(reload_api_settings)
 
 
 # Optional: Validate critical settings at startup
@@ -0,0 +1,191 @@
+"""
+Horizontal sharding of verification sessions.
+
+With SESSION_SHARDS, `MissedCallVerification` rows are spread over several
+database aliases by a stable hash of the normalized phone, so session inserts
+and verify updates are split between databases:
+
+    MISSEDCALL_AUTH = {'SESSION_SHARDS': ['sessions_0', 'sessions_1', 'sessions_2']}
+
+Every per-session lookup in the package is keyed by phone or by session id,
+and goes to a single shard without a directory:
+
+- `db_for_phone(phone)`: SHA-256 of the phone, modulo the number of shards.
+- `db_for_session(session_id)`: session ids are random UUIDs whose first byte
+  is the shard index (`make_session_id`; 114 random bits remain), so bearer
+  lookups such as `MissedCallSessionAuthentication` route on the id alone.
+
+Work without such a key (admin listing, cleanup, revocation by signature or
+caller, delivery callbacks keyed by provider call id, stats backfill) runs on
+every shard in parallel through `fan_out`.
+
+Each shard holds the app's full schema. `CallSourceNumber` is written on
+PRIMARY_DB_ALIAS and mirrored to the shards when saved or deleted, so sessions
+keep a local foreign key and joins; run `manage.py sync_missedcall_shards`
+after changing numbers through `update()` or adding a shard. Other models stay
+on the primary. Without SESSION_SHARDS the helpers return None, which leaves
+routing to the database routers as before.
+
+The list is part of the data layout: ids point at positions in it and phones
+are hashed over its length. Only append aliases, and only while no session is
+pending (pending sessions of a remapped phone would be looked for elsewhere).
+"""
+import hashlib
+import os
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .settings import api_settings
+
+# The shard index is stored in the first byte of the session id
+MAX_SHARDS = 256
+
+T = TypeVar('T')
+
+
+def is_enabled() -> bool:
+    return bool(api_settings.SESSION_SHARDS)
+
+
+def get_shards() -> List[Optional[str]]:
+    """The shard aliases, or [None] (the routers' choice) without sharding."""
+    return list(api_settings.SESSION_SHARDS) or [None]
+
+
+def shard_index(phone: str) -> int:
+    digest = hashlib.sha256(str(phone).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % len(api_settings.SESSION_SHARDS)
+
+
+def db_for_phone(phone: str) -> Optional[str]:
+    """Alias of the shard holding the sessions of `phone`."""
+    shards = api_settings.SESSION_SHARDS
+    return shards[shard_index(phone)] if shards else None
+
+
+def db_for_session(session_id) -> Optional[str]:
+    """
+    Alias of the shard holding `session_id`.
+
+    Raises:
+        ValueError: if `session_id` isn't a UUID of a configured shard.
+    """
+    shards = api_settings.SESSION_SHARDS
+    if not shards:
+        return None
+    if not isinstance(session_id, uuid.UUID):
+        session_id = uuid.UUID(str(session_id))
+    index = session_id.bytes[0]
+    if index >= len(shards):
+        raise ValueError(f"Session id {session_id} doesn't belong to a configured shard.")
+    return shards[index]
+
+
+def make_session_id(phone: str) -> uuid.UUID:
+    """A random session id for `phone`, carrying its shard index when sharded."""
+    if not api_settings.SESSION_SHARDS:
+        return uuid.uuid4()
+    return uuid.UUID(bytes=bytes([shard_index(phone)]) + os.urandom(15), version=4)
+
+
+def assign_session_id(session) -> None:
+    """Gives an unsaved session an id on its phone's shard, unless it has one."""
+    if api_settings.SESSION_SHARDS and session.pk.bytes[0] != shard_index(session.user_phone):
+        session.pk = make_session_id(session.user_phone)
+
+
+def group_sessions(session_ids: Iterable) -> Dict[Optional[str], list]:
+    """{shard: [session ids]}; ids of no configured shard are dropped."""
+    groups = defaultdict(list)
+    for session_id in session_ids:
+        try:
+            groups[db_for_session(session_id)].append(session_id)
+        except ValueError:
+            continue
+    return dict(groups)
+
+
+def group_phones(phones: Iterable[str]) -> Dict[Optional[str], list]:
+    """{shard: [phones]}"""
+    groups = defaultdict(list)
+    for phone in phones:
+        groups[db_for_phone(phone)].append(phone)
+    return dict(groups)
+
+
+def fan_out(func: Callable[[Optional[str]], T], shards: Optional[List[Optional[str]]] = None) -> Dict[Optional[str], T]:
+    """
+    Calls `func(db)` for every shard (or `shards`), in parallel threads of at
+    most SHARD_FANOUT_WORKERS, and returns {db: result}. Without sharding it
+    is one call with db=None in the current thread. The first error raised by
+    `func` is re-raised.
+    """
+    shards = get_shards() if shards is None else shards
+    workers = min(len(shards), api_settings.SHARD_FANOUT_WORKERS)
+    if workers <= 1:
+        return {db: func(db) for db in shards}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {db: pool.submit(_run_in_thread, func, db) for db in shards}
+        return {db: future.result() for db, future in futures.items()}
+
+
+def _run_in_thread(func, db):
+    try:
+        return func(db)
+    finally:
+        # Connections are per thread; don't leave them to the garbage collector
+        connections.close_all()
+
+
+def sync_call_sources() -> int:
+    """
+    Makes the `CallSourceNumber` table of every shard a copy of the primary's
+    (deleting a number also deletes its sessions on the shard, as on the
+    primary).
+
+    Returns:
+        int: Number of shards synced.
+    """
+    from .models import CallSourceNumber
+
+    primary = api_settings.PRIMARY_DB_ALIAS
+    fields = [field.name for field in CallSourceNumber._meta.concrete_fields if not field.primary_key]
+    shards = [db for db in api_settings.SESSION_SHARDS if db != primary]
+
+    def sync(db):
+        sources = list(CallSourceNumber.objects.using(primary).all())
+        existing = set(CallSourceNumber.objects.using(db).values_list('pk', flat=True))
+        CallSourceNumber.objects.using(db).exclude(pk__in=[source.pk for source in sources]).delete()
+        CallSourceNumber.objects.using(db).bulk_update([s for s in sources if s.pk in existing], fields, batch_size=500)
+        CallSourceNumber.objects.using(db).bulk_create([s for s in sources if s.pk not in existing], batch_size=500)
+
+    if shards:
+        fan_out(sync, shards)
+    return len(shards)
+
+
+@receiver(post_save, sender='drf_missed_call_auth.CallSourceNumber')
+def _mirror_saved_source(sender, instance, using, raw=False, **kwargs):
+    # Mirrored writes are made on the shards, so they don't cascade again
+    if raw or not api_settings.SESSION_SHARDS or using != api_settings.PRIMARY_DB_ALIAS:
+        return
+    values = {field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields
+              if not field.primary_key}
+    for db in api_settings.SESSION_SHARDS:
+        if db != using:
+            sender.objects.using(db).update_or_create(pk=instance.pk, defaults=values)
+
+
+@receiver(post_delete, sender='drf_missed_call_auth.CallSourceNumber')
+def _mirror_deleted_source(sender, instance, using, **kwargs):
+    if not api_settings.SESSION_SHARDS or using != api_settings.PRIMARY_DB_ALIAS:
+        return
+    for db in api_settings.SESSION_SHARDS:
+        if db != using:
+            sender.objects.using(db).filter(pk=instance.pk).delete()
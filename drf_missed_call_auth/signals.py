@@ -1,10 +1,21 @@
 from django.dispatch import Signal
 
-# Sent when a flash call is successfully triggered via the provider
+# Sent when a flash call is successfully triggered via the provider (inbound
+# mode: when the user is given the number to call)
 missed_call_sent = Signal() # args: [verification_instance]
 
 # Sent when a user successfully verifies the Caller ID
 verification_success = Signal() # args: [verification_instance]
 
 # Sent when a verification attempt fails (e.g., wrong number)
-verification_failed = Signal() # args: [phone_number, expected, received]
\ No newline at end of file
+verification_failed = Signal() # args: [session_id, verification_instance, phone_number, expected, received]
+
+# Sent when the provider reports a new delivery status for a placed call
+delivery_status_changed = Signal() # args: [session_id, status]
+
+# Sent after a batch of sessions has been expired early (revocation API, or
+# pending siblings of a session that was just verified)
+sessions_revoked = Signal() # args: [session_ids]
+
+# Sent when the risk stage blocks a destination prefix whose conversion collapsed
+prefix_blocked = Signal() # args: [prefix, sent, verified]
@@ -0,0 +1,115 @@
+"""
+Cached snapshots of a session's externally visible state.
+
+The status endpoint is polled at high frequency, so it reads from the cache
+and only falls back to one narrow `values()` query on a miss. Only fields that
+change on writes are cached; time-dependent fields are derived per response,
+which lets a snapshot live until the session expires. Write paths invalidate
+the snapshot through the package signals connected below.
+
+Invalidation also replaces the session's version token, and a snapshot is
+only served under the token it was loaded with. A reader that loaded the row
+just before a write can't cache its stale copy for the rest of the validity.
+"""
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .models import MissedCallVerification
+from .settings import api_settings
+from .sharding import db_for_session
+from .signals import delivery_status_changed, missed_call_sent, sessions_revoked, verification_success
+from .tenants import get_tenants
+
+CACHE_KEY = 'drf_missed_call_auth:state:{}'
+VERSION_KEY = 'drf_missed_call_auth:state:version:{}'
+
+
+def _cache_key(session_id) -> str:
+    return CACHE_KEY.format(session_id)
+
+
+def _version_key(session_id) -> str:
+    return VERSION_KEY.format(session_id)
+
+
+def get_session_state(session_id) -> Optional[dict]:
+    """
+    Returns the cached snapshot for `session_id`, loading it on a miss.
+    Returns None if the session does not exist.
+    """
+    key, version_key = _cache_key(session_id), _version_key(session_id)
+    cached = cache.get_many([key, version_key])
+    # Read before the row: a write committed meanwhile changes the token
+    version = cached.get(version_key)
+    if key in cached and cached[key][0] == version:
+        return cached[key][1]
+
+    try:
+        db = db_for_session(session_id)
+    except ValueError:
+        return None
+    state = (
+        MissedCallVerification.objects
+        .db_manager(db, hints={'session_id': session_id})
+        .filter(id=session_id)
+        .values('is_verified', 'delivery_status', 'expires_at')
+        .first()
+    )
+    if state is None:
+        return None
+
+    ttl = max(1, int((state['expires_at'] - now()).total_seconds()))
+    cache.set(key, (version, state), timeout=ttl)
+    return state
+
+
+def invalidate_session_state(*session_ids) -> None:
+    # Outlives any snapshot: sessions are valid for at most this long
+    timeout = max(tenant.VALIDITY_PERIOD for tenant in get_tenants()) + api_settings.BULK_MAX_DELAY
+    cache.set_many({_version_key(session_id): uuid.uuid4().hex for session_id in session_ids}, timeout)
+    cache.delete_many([_cache_key(session_id) for session_id in session_ids])
+
+
+def render_state(session_id, state: dict, at: Optional[datetime] = None) -> dict:
+    """Expands a snapshot into the public payload, evaluated at `at`."""
+    at = at or now()
+    remaining = max(0, int((state['expires_at'] - at).total_seconds()))
+    return {
+        'session_id': str(session_id),
+        'is_verified': state['is_verified'],
+        'is_expired': at >= state['expires_at'],
+        'delivery_status': state['delivery_status'],
+        'expires_at': state['expires_at'].isoformat(),
+        'time_remaining_seconds': remaining,
+    }
+
+
+def compute_etag(payload: dict) -> str:
+    """
+    ETag over the fields that mark a state change. The countdown is left out,
+    otherwise every poll would look like a change.
+    """
+    raw = '|'.join(str(payload[k]) for k in ('is_verified', 'is_expired', 'delivery_status', 'expires_at'))
+    return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+@receiver(missed_call_sent)
+@receiver(verification_success)
+def _invalidate_on_session_write(sender, verification_instance, **kwargs):
+    invalidate_session_state(verification_instance.pk)
+
+
+@receiver(delivery_status_changed)
+def _invalidate_on_delivery_status(sender, session_id, **kwargs):
+    invalidate_session_state(session_id)
+
+
+@receiver(sessions_revoked)
+def _invalidate_on_revocation(sender, session_ids, **kwargs):
+    invalidate_session_state(*session_ids)
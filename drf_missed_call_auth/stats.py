@@ -0,0 +1,122 @@
+"""
+Incremental maintenance of `CallSourceDailyStats`.
+
+Request/verify events are accumulated in a per-process buffer of counter
+deltas keyed by (source, day) and flushed in batches, once STATS_FLUSH_SIZE
+events are pending or STATS_FLUSH_INTERVAL seconds have passed. A flush costs
+one `UPDATE ... SET x = x + delta` per touched row, plus an INSERT for rows
+that don't exist yet; increments are additive, so any number of workers can
+flush concurrently. Pending deltas are also flushed at interpreter exit.
+A due flush waits for the current transaction to commit, so a request rolled
+back under ATOMIC_REQUESTS (a failed verify) can't take the buffer down with
+it.
+
+`expired` cannot be observed as an event; it is filled in for closed days by
+`manage.py backfill_missedcall_stats`.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.timezone import localdate, now
+
+from .models import CallSourceDailyStats
+from .settings import api_settings
+from .signals import missed_call_sent, verification_failed, verification_success
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = defaultdict(Counter)
+_pending_events = 0
+_last_flush = time.monotonic()
+
+
+def record(source_id: int, day, **deltas) -> None:
+    """Adds counter deltas for `source_id` on `day`, flushing if due."""
+    global _pending_events
+    with _lock:
+        _pending[(source_id, day)].update(deltas)
+        _pending_events += 1
+        due = (
+            _pending_events >= api_settings.STATS_FLUSH_SIZE
+            or time.monotonic() - _last_flush >= api_settings.STATS_FLUSH_INTERVAL
+        )
+    if due:
+        # Runs right away in autocommit mode
+        transaction.on_commit(flush, using=router.db_for_write(CallSourceDailyStats))
+
+
+def flush() -> int:
+    """
+    Writes all pending deltas to the database.
+
+    Returns:
+        int: Number of rollup rows touched.
+    """
+    global _pending, _pending_events, _last_flush
+    with _lock:
+        batch, _pending = _pending, defaultdict(Counter)
+        _pending_events = 0
+        _last_flush = time.monotonic()
+
+    for (source_id, day), deltas in batch.items():
+        try:
+            # A savepoint, so a failure doesn't break an enclosing transaction
+            with transaction.atomic(using=router.db_for_write(CallSourceDailyStats)):
+                _apply(source_id, day, deltas)
+        except Exception as e:
+            logger.error(f"Failed to flush stats for source {source_id} on {day}: {e}", exc_info=True)
+    return len(batch)
+
+
+def discard() -> None:
+    """Drops pending deltas without writing them (e.g. in a freshly forked worker)."""
+    global _pending, _pending_events
+    with _lock:
+        _pending, _pending_events = defaultdict(Counter), 0
+
+
+def _apply(source_id: int, day, deltas: Counter) -> None:
+    updates = {field: F(field) + value for field, value in deltas.items() if value}
+    if not updates:
+        return
+    queryset = CallSourceDailyStats.objects.filter(source_id=source_id, date=day)
+    if queryset.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            CallSourceDailyStats.objects.create(source_id=source_id, date=day, **deltas)
+    except IntegrityError:
+        # Another worker inserted the row first; increment it instead
+        queryset.update(**updates)
+
+
+atexit.register(flush)
+
+
+@receiver(missed_call_sent)
+def _record_sent(sender, verification_instance, **kwargs):
+    record(verification_instance.expected_caller_id, localdate(verification_instance.created_at), sent=1)
+
+
+@receiver(verification_success)
+def _record_verified(sender, verification_instance, **kwargs):
+    seconds = ((verification_instance.verified_at or now()) - verification_instance.created_at).total_seconds()
+    record(
+        verification_instance.expected_caller_id,
+        localdate(verification_instance.created_at),
+        verified=1,
+        **{CallSourceDailyStats.ttv_bucket(seconds): 1}
+    )
+
+
+@receiver(verification_failed)
+def _record_failed(sender, verification_instance=None, **kwargs):
+    if verification_instance is not None:
+        record(verification_instance.expected_caller_id, localdate(verification_instance.created_at), failed=1)
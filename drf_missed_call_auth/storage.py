@@ -0,0 +1,208 @@
+"""
+Compact storage layout for `MissedCallVerification`.
+
+The default layout stores `user_phone` as VARCHAR(32) and `app_signature` as
+VARCHAR(255), each with its own B-tree index, although the signature column
+holds a few dozen distinct values across millions of rows. With
+COMPACT_STORAGE = True:
+
+- `user_phone` is a BIGINT (`E164Field`, 8 bytes),
+- `app_signature` is an INTEGER id into the `AppSignature` lookup table
+  (`InternedSignatureField`, 4 bytes),
+
+while both still read and filter as strings, so no calling code changes.
+
+Migrating an existing database
+------------------------------
+
+1. With COMPACT_STORAGE still False, run `makemigrations` and `migrate` to
+   create the `AppSignature` table.
+2. Set COMPACT_STORAGE = True and run `makemigrations` again. Before the two
+   generated AlterField operations, add the data step, so the column contents
+   are castable when their type changes:
+
+       from drf_missed_call_auth import storage
+
+       operations = [
+           storage.prepare_compact_operation(),
+           migrations.AlterField(...user_phone...),
+           migrations.AlterField(...app_signature...),
+       ]
+
+   It strips the '+' from phone numbers and replaces signatures by the ids of
+   their interned rows; reversed, it restores both after the columns are
+   strings again. On large tables, run it in a maintenance window: AlterField
+   rewrites the table.
+
+`manage.py missedcall_storage_benchmark` builds both layouts side by side in
+scratch tables and reports their size and insert throughput on the actual
+database backend.
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.apps import apps as global_apps
+from django.db import connections, migrations, models
+from django.db.models.functions import Concat, Substr
+from django.utils.timezone import now
+
+from .fields import E164Field, InternedSignatureField, interner
+
+
+def prepare_compact(apps, schema_editor) -> None:
+    """Forward data step: makes the string columns castable to integers."""
+    Verification = apps.get_model('drf_missed_call_auth', 'MissedCallVerification')
+    AppSignature = apps.get_model('drf_missed_call_auth', 'AppSignature')
+    db = schema_editor.connection.alias
+    sessions = Verification.objects.using(db)
+
+    sessions.filter(user_phone__startswith='+').update(user_phone=Substr('user_phone', 2))
+    for value in sessions.order_by().values_list('app_signature', flat=True).distinct():
+        signature, _created = AppSignature.objects.using(db).get_or_create(value=value)
+        sessions.filter(app_signature=value).update(app_signature=str(signature.pk))
+    interner.clear()
+
+
+def restore_legacy(apps, schema_editor) -> None:
+    """Backward data step: puts the '+' and the signature values back."""
+    Verification = apps.get_model('drf_missed_call_auth', 'MissedCallVerification')
+    AppSignature = apps.get_model('drf_missed_call_auth', 'AppSignature')
+    db = schema_editor.connection.alias
+    sessions = Verification.objects.using(db)
+
+    sessions.exclude(user_phone__startswith='+').update(user_phone=Concat(models.Value('+'), 'user_phone'))
+    for pk, value in AppSignature.objects.using(db).values_list('pk', 'value'):
+        sessions.filter(app_signature=str(pk)).update(app_signature=value)
+    interner.clear()
+
+
+def prepare_compact_operation() -> migrations.RunPython:
+    return migrations.RunPython(prepare_compact, restore_legacy)
+
+
+# Benchmark
+
+def _layout_model(name: str, compact: bool):
+    """A throwaway model with the session columns and indexes of one layout."""
+    if compact:
+        phone = E164Field(db_index=True)
+        signature = InternedSignatureField(db_index=True)
+    else:
+        phone = models.CharField(max_length=32, db_index=True)
+        signature = models.CharField(max_length=255, db_index=True)
+    attrs = {
+        '__module__': __name__,
+        'id': models.UUIDField(primary_key=True, default=uuid.uuid4),
+        'user_phone': phone,
+        'app_signature': signature,
+        'expected_caller_id': models.BigIntegerField(),
+        'is_verified': models.BooleanField(default=False),
+        'attempt_count': models.PositiveSmallIntegerField(default=0),
+        'created_at': models.DateTimeField(db_index=True),
+        'expires_at': models.DateTimeField(db_index=True),
+        'Meta': type('Meta', (), {
+            'app_label': 'drf_missed_call_auth',
+            'db_table': f'drf_missed_call_auth_bench_{name}',
+            'managed': False,
+            'indexes': [models.Index(fields=['user_phone', 'is_verified'], name=f'bench_{name}_phone_verified')],
+        }),
+    }
+    return type(f'StorageBench{name.title()}', (models.Model,), attrs)
+
+
+def _table_size(connection, table: str) -> Optional[Dict[str, int]]:
+    """On-disk bytes of a table and its indexes, where the backend reports them."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table])
+            table_bytes, index_bytes = cursor.fetchone()
+            return {'table': table_bytes, 'indexes': index_bytes}
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name = %s "
+                    "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s) "
+                    "GROUP BY name",
+                    [table, table],
+                )
+            except Exception:
+                # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+                return None
+            sizes = dict(cursor.fetchall())
+            table_bytes = sizes.pop(table, 0)
+            return {'table': table_bytes, 'indexes': sum(sizes.values())}
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            table_bytes, index_bytes = cursor.fetchone()
+            return {'table': table_bytes, 'indexes': index_bytes}
+    return None
+
+
+def benchmark_layouts(rows: int = 100000, signatures: int = 30, batch_size: int = 1000, using: str = 'default') -> dict:
+    """
+    Inserts the same `rows` synthetic sessions into a scratch table per layout
+    and reports insert throughput and on-disk size. The scratch tables are
+    dropped afterwards.
+
+    Returns:
+        {'legacy': {...}, 'compact': {...}} with 'rows_per_second', 'seconds'
+        and, where the backend reports them, 'table_bytes' and 'index_bytes'.
+    """
+    connection = connections[using]
+    rng = random.Random(0)
+    values = [f'{uuid.uuid4().hex}{uuid.uuid4().hex}' for _ in range(signatures)]
+    started_at = now()
+    data = [
+        {
+            'user_phone': f'+{rng.randint(10 ** 10, 10 ** 12)}',
+            'app_signature': rng.choice(values),
+            'expected_caller_id': rng.randint(1, 200),
+            'created_at': started_at,
+            'expires_at': started_at + timedelta(minutes=5),
+        }
+        for _ in range(rows)
+    ]
+
+    results = {}
+    for name, compact in (('legacy', False), ('compact', True)):
+        model = _layout_model(name, compact)
+        try:
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+            try:
+                started = time.perf_counter()
+                for start in range(0, rows, batch_size):
+                    model.objects.using(using).bulk_create(
+                        [model(**row) for row in data[start:start + batch_size]]
+                    )
+                seconds = time.perf_counter() - started
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+                size = _table_size(connection, model._meta.db_table)
+                results[name] = {
+                    'rows': rows,
+                    'seconds': round(seconds, 3),
+                    'rows_per_second': round(rows / seconds) if seconds else None,
+                    'table_bytes': size['table'] if size else None,
+                    'index_bytes': size['indexes'] if size else None,
+                }
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.delete_model(model)
+                if compact:
+                    AppSignature = global_apps.get_model('drf_missed_call_auth', 'AppSignature')
+                    AppSignature.objects.using(using).filter(value__in=values).delete()
+                    interner.clear()
+        finally:
+            # Unregister the throwaway model
+            global_apps.all_models['drf_missed_call_auth'].pop(model._meta.model_name, None)
+            global_apps.clear_cache()
+    return results
@@ -0,0 +1,142 @@
+"""
+Push delivery of verification state over Server-Sent Events and WebSockets.
+
+Both transports need an ASGI server. The SSE view is routed by `urls.py` when
+ENABLE_EVENT_STREAM is on. The WebSocket variant is a bare ASGI application,
+so it needs no extra dependency; mount it in your `asgi.py`:
+
+```python
+from django.core.asgi import get_asgi_application
+from drf_missed_call_auth.streaming import websocket_events
+
+django_app = get_asgi_application()
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket' and scope['path'].startswith('/auth/ws/'):
+        return await websocket_events(scope, receive, send)
+    return await django_app(scope, receive, send)
+```
+
+The client receives the current state first, then `sent`, `delivery`,
+`failed` and `verified` events, and finally `expired` if the session runs out.
+The stream ends once the session is verified or expired.
+"""
+import asyncio
+import json
+import uuid
+from typing import AsyncIterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+from .events import get_event_backend
+from .settings import api_settings
+from .state import get_session_state, render_state
+
+
+async def iter_session_events(session_id: str, state: dict) -> AsyncIterator[Optional[dict]]:
+    """
+    Yields event dicts for one session, or None as a heartbeat tick.
+    `state` is the snapshot the caller already loaded to check existence.
+    """
+    subscription = get_event_backend().subscribe(session_id)
+    next_event = asyncio.ensure_future(subscription.__anext__())
+    try:
+        # Let the subscription register before the snapshot is re-read, so no
+        # event can fall between the two.
+        await asyncio.sleep(0)
+        state = await sync_to_async(get_session_state)(session_id) or state
+        payload = render_state(session_id, state)
+        yield {'event': 'state', **payload}
+        if payload['is_verified'] or payload['is_expired']:
+            return
+
+        heartbeat = api_settings.EVENT_STREAM_HEARTBEAT
+        while True:
+            until_expiry = (state['expires_at'] - now()).total_seconds()
+            if until_expiry <= 0:
+                yield {'event': 'expired'}
+                return
+            done, _pending = await asyncio.wait({next_event}, timeout=min(heartbeat, until_expiry))
+            if not done:
+                if now() < state['expires_at']:
+                    yield None
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            yield event
+            if event.get('event') in ('verified', 'expired'):
+                return
+            next_event = asyncio.ensure_future(subscription.__anext__())
+    finally:
+        next_event.cancel()
+        try:
+            await next_event
+        except (asyncio.CancelledError, StopAsyncIteration):
+            pass
+        await subscription.aclose()
+
+
+def _format_sse(event: Optional[dict]) -> str:
+    if event is None:
+        return ': keepalive\n\n'
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def verification_events(request, session_id):
+    """SSE endpoint streaming the events of one verification session."""
+    state = await sync_to_async(get_session_state)(session_id)
+    if state is None:
+        return JsonResponse({'detail': _("Verification session not found.")}, status=404)
+
+    async def stream():
+        async for event in iter_session_events(str(session_id), state):
+            yield _format_sse(event)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx), otherwise events arrive in bursts
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def websocket_events(scope, receive, send):
+    """
+    ASGI WebSocket application streaming the same events as JSON messages.
+    The session id is the last segment of the path.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    try:
+        session_id = str(uuid.UUID(scope['path'].rstrip('/').rsplit('/', 1)[-1]))
+    except ValueError:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    state = await sync_to_async(get_session_state)(session_id)
+    if state is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    async def forward():
+        async for event in iter_session_events(session_id, state):
+            if event is not None:
+                await send({'type': 'websocket.send', 'text': json.dumps(event)})
+        await send({'type': 'websocket.close', 'code': 1000})
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+
+    tasks = {asyncio.ensure_future(forward()), asyncio.ensure_future(wait_for_disconnect())}
+    _done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
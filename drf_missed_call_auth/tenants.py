@@ -0,0 +1,124 @@
+"""
+Tenant profiles.
+
+Several apps (brands, regions) can share one deployment. Each is a profile in
+MISSEDCALL_AUTH['TENANTS'], keyed by tenant name:
+
+    'TENANTS': {
+        'brand-eu': {
+            'APP_SIGNATURES': ['<sha256 of the EU app>'],
+            'VALIDITY_PERIOD': 120,
+            'MAX_VERIFICATION_ATTEMPTS': 2,
+            'GATEWAY_CLASS': 'twilio',
+            'VERIFICATION_MODE': 'inbound',
+            'THROTTLE_RATE': '20/min',
+        },
+    }
+
+Omitted keys fall back to the global settings. Signatures claimed by no
+profile belong to the default tenant (name ''), which keeps using
+ALLOWED_APP_SIGNATURES and REQUIRE_SIGNATURE.
+
+A tenant draws callers only from `CallSourceNumber`s with its name, and the
+lease pool, capacity counters and daily stats follow that split. The profile
+of a request is one dict lookup in a signature -> tenant map compiled on first
+use and rebuilt when the settings change.
+"""
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .settings import api_settings
+
+DEFAULT_TENANT = ''
+
+# Keys a profile may override; all but THROTTLE_RATE are global settings too
+OVERRIDABLE = ('VALIDITY_PERIOD', 'MAX_VERIFICATION_ATTEMPTS', 'GATEWAY_CLASS', 'VERIFICATION_MODE', 'THROTTLE_RATE')
+
+
+class Tenant:
+    """A resolved profile; unset keys read through to `api_settings`."""
+
+    def __init__(self, name: str, profile: Optional[dict] = None):
+        profile = profile or {}
+        unknown = set(profile) - set(OVERRIDABLE) - {'APP_SIGNATURES'}
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown setting(s) in tenant '{name}': {', '.join(sorted(unknown))}")
+        self.name = name
+        self.signatures = list(profile.get('APP_SIGNATURES', []))
+        self._overrides = {key: profile[key] for key in OVERRIDABLE if key in profile}
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == DEFAULT_TENANT
+
+    def __getattr__(self, attr):
+        if attr not in OVERRIDABLE:
+            raise AttributeError(attr)
+        if attr in self._overrides:
+            return self._overrides[attr]
+        # THROTTLE_RATE defaults to the view's DRF throttle rate
+        return getattr(api_settings, attr, None)
+
+    def __repr__(self):
+        return f"<Tenant {self.name or '(default)'}>"
+
+
+_tenants: Optional[Dict[str, Tenant]] = None
+_by_signature: Optional[Dict[str, Tenant]] = None
+
+
+def _compile() -> None:
+    global _tenants, _by_signature
+    tenants = {DEFAULT_TENANT: Tenant(DEFAULT_TENANT)}
+    by_signature = {}
+    for name, profile in api_settings.TENANTS.items():
+        if not name:
+            raise ImproperlyConfigured("Tenant names must not be empty.")
+        tenant = Tenant(name, profile)
+        if not tenant.signatures:
+            raise ImproperlyConfigured(f"Tenant '{name}' has no APP_SIGNATURES.")
+        for signature in tenant.signatures:
+            if signature in by_signature:
+                raise ImproperlyConfigured(
+                    f"App signature is claimed by tenants '{by_signature[signature].name}' and '{name}'."
+                )
+            by_signature[signature] = tenant
+        tenants[name] = tenant
+    _tenants, _by_signature = tenants, by_signature
+
+
+def get_tenants() -> List[Tenant]:
+    """All tenants, the default one first."""
+    if _tenants is None:
+        _compile()
+    return list(_tenants.values())
+
+
+def get_tenant(name: str) -> Tenant:
+    """
+    Raises:
+        KeyError: if no tenant is called `name`.
+    """
+    if _tenants is None:
+        _compile()
+    return _tenants[name]
+
+
+def resolve_tenant(app_signature: str) -> Tenant:
+    """The tenant claiming `app_signature`, or the default tenant."""
+    if _by_signature is None:
+        _compile()
+    # A hash lookup: unlike comparing against a list, its timing doesn't
+    # depend on how much of a guessed signature is right
+    tenant = _by_signature.get(app_signature)
+    return tenant if tenant is not None else _tenants[DEFAULT_TENANT]
+
+
+@receiver(setting_changed)
+def _reset_tenants(setting, **kwargs):
+    global _tenants, _by_signature
+    if setting == 'MISSEDCALL_AUTH':
+        _tenants = _by_signature = None
@@ -1,11 +1,15 @@
-from django.test import TestCase, override_settings
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from datetime import timedelta
+from unittest import skipIf, skipUnless
 from unittest.mock import patch, MagicMock
 import uuid
+from io import StringIO
 
 from .models import CallSourceNumber, MissedCallVerification
 from .utils import normalize_phone_number, validate_app_signature
@@ -216,6 +220,270 @@ class MissedCallVerificationTests(TestCase):
         'TWILIO_AUTH_TOKEN': 'test',
     }
 )
+class GatewayRetryTests(TestCase):
+    """Test gateway dispatch retries and idempotency"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .gateways.base import RetryPolicy
+        cache.clear()
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+        self.verification = MissedCallVerification.objects.create(
+            user_phone='+0987654321',
+            app_signature='test-signature',
+            expected_caller=self.caller
+        )
+        self.gateway = self.make_gateway()
+        self.gateway.retry_policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+
+    def make_gateway(self, *errors):
+        from .gateways.base import BaseMissedCallGateway
+
+        class FakeGateway(BaseMissedCallGateway):
+            def __init__(self):
+                self.errors = list(errors)
+                self.calls = []
+
+            def trigger_missed_call(self, to_number, from_number):
+                return True
+
+            def place_call(self, to_number, from_number, idempotency_key=''):
+                self.calls.append(idempotency_key)
+                if self.errors:
+                    raise self.errors.pop(0)
+                return 'CA123'
+
+        return FakeGateway()
+
+    def test_retries_transient_errors(self):
+        """Test retryable errors are retried with the same idempotency key"""
+        from .gateways.base import RetryableGatewayError
+        self.gateway.errors = [RetryableGatewayError('busy', code=20429)]
+        self.assertTrue(self.gateway.dispatch(self.verification))
+        self.assertEqual(len(self.gateway.calls), 2)
+        self.assertEqual(len(set(self.gateway.calls)), 1)
+
+    def test_terminal_error_not_retried(self):
+        """Test terminal errors stop the dispatch immediately"""
+        from .gateways.base import TerminalGatewayError
+        self.gateway.errors = [TerminalGatewayError('bad number', code=21211)]
+        self.assertFalse(self.gateway.dispatch(self.verification))
+        self.assertEqual(len(self.gateway.calls), 1)
+
+    def test_attempts_are_bounded(self):
+        """Test dispatch gives up after max_attempts"""
+        from .gateways.base import RetryableGatewayError
+        self.gateway.errors = [RetryableGatewayError('down')] * 5
+        self.assertFalse(self.gateway.dispatch(self.verification))
+        self.assertEqual(len(self.gateway.calls), 3)
+
+    def test_no_retry_past_validity_window(self):
+        """Test retries stop when the session is about to expire"""
+        from .gateways.base import RetryableGatewayError
+        self.verification.expires_at = timezone.now() + timedelta(seconds=5)
+        self.gateway.errors = [RetryableGatewayError('down')]
+        self.assertFalse(self.gateway.dispatch(self.verification))
+        self.assertEqual(len(self.gateway.calls), 1)
+
+    def test_dispatch_persists_call_id(self):
+        """Test the provider call id is stored on the session"""
+        self.assertTrue(self.gateway.dispatch(self.verification))
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.provider_call_id, 'CA123')
+
+    def test_duplicate_dispatch_does_not_redial(self):
+        """Test the same session is never dialed twice"""
+        self.assertTrue(self.gateway.dispatch(self.verification))
+        self.assertTrue(self.gateway.dispatch(self.verification))
+        self.assertEqual(len(self.gateway.calls), 1)
+
+    def test_twilio_error_classification(self):
+        """Test Twilio error codes map to retryable/terminal"""
+        from twilio.base.exceptions import TwilioRestException
+        from .gateways.twilio import is_retryable_twilio_error
+        self.assertTrue(is_retryable_twilio_error(TwilioRestException(429, '/Calls', code=20429)))
+        self.assertTrue(is_retryable_twilio_error(TwilioRestException(503, '/Calls')))
+        self.assertFalse(is_retryable_twilio_error(TwilioRestException(400, '/Calls', code=21211)))
+        self.assertFalse(is_retryable_twilio_error(TwilioRestException(400, '/Calls')))
+
+
+class LazyGatewayTests(TestCase):
+    """Test gateways are resolved on first use"""
+
+    # Run in a fresh interpreter: the test process has imported everything already
+    IMPORT_BENCHMARK = """
+import json, sys, time
+from django.conf import settings
+settings.configure(
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth', 'rest_framework', 'drf_missed_call_auth'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    MISSEDCALL_AUTH={'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32, 'TWILIO_AUTH_TOKEN': 'token'},
+)
+import django
+django.setup()
+started = time.perf_counter()
+import drf_missed_call_auth.views
+views_ms = (time.perf_counter() - started) * 1000
+loaded = 'twilio' in sys.modules
+started = time.perf_counter()
+from drf_missed_call_auth.utils import get_gateway
+get_gateway().client
+gateway_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({
+    'views_ms': views_ms, 'gateway_ms': gateway_ms,
+    'loaded_by_views': loaded, 'loaded_by_gateway': 'twilio.rest' in sys.modules,
+}))
+"""
+
+    def test_views_import_skips_provider_sdk(self):
+        """Test importing the views doesn't import Twilio"""
+        import json
+        import os
+        import subprocess
+        import sys
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        result = subprocess.run(
+            [sys.executable, '-c', self.IMPORT_BENCHMARK],
+            capture_output=True, text=True, env=env, check=True
+        )
+        timings = json.loads(result.stdout)
+        self.assertFalse(timings['loaded_by_views'])
+        # The SDK cost moves to the first dispatch
+        self.assertTrue(timings['loaded_by_gateway'])
+
+    def test_gateway_aliases(self):
+        """Test GATEWAY_CLASS accepts a GATEWAYS key or a dotted path"""
+        from .gateways.fake import FakeCarrierGateway
+        from .gateways.twilio import TwilioGateway
+        from .utils import get_gateway, get_gateway_class
+        self.assertIs(get_gateway_class(), TwilioGateway)
+        with override_settings(MISSEDCALL_AUTH={'GATEWAY_CLASS': 'fake'}):
+            self.assertIsInstance(get_gateway(), FakeCarrierGateway)
+        with override_settings(MISSEDCALL_AUTH={
+            'GATEWAY_CLASS': 'carrier',
+            'GATEWAYS': {'carrier': 'drf_missed_call_auth.gateways.fake.FakeCarrierGateway'},
+        }):
+            self.assertIs(get_gateway_class(), FakeCarrierGateway)
+
+    def test_package_exports_gateways_lazily(self):
+        """Test provider gateways are still importable from the package"""
+        from . import gateways
+        from .gateways.twilio import TwilioGateway
+        self.assertIs(gateways.TwilioGateway, TwilioGateway)
+        with self.assertRaises(AttributeError):
+            gateways.MissingGateway
+
+
+class DeliveryStatusTests(TestCase):
+    """Test provider status callback ingestion"""
+
+    def setUp(self):
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+        self.verification = MissedCallVerification.objects.create(
+            user_phone='+0987654321',
+            app_signature='test-signature',
+            expected_caller=self.caller,
+            provider_call_id='CA123'
+        )
+
+    def test_status_only_moves_forward(self):
+        """Test late or duplicate events never regress the status"""
+        from .delivery import ingest_status_events
+        self.assertEqual(ingest_status_events([('CA123', 'ringing'), ('CA123', 'initiated')]), 1)
+        self.assertEqual(ingest_status_events([('CA123', 'ringing')]), 0)
+        self.assertEqual(ingest_status_events([('CA123', 'busy')]), 1)
+        self.assertEqual(ingest_status_events([('CA123', 'completed')]), 0)
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.delivery_status, 'busy')
+        self.assertIsNotNone(self.verification.delivery_updated_at)
+
+    def test_unknown_events_ignored(self):
+        """Test unknown call ids and statuses are skipped"""
+        from .delivery import ingest_status_events
+        self.assertEqual(ingest_status_events([('CA999', 'ringing'), ('CA123', 'bogus')]), 0)
+
+    def test_webhook_validates_signature(self):
+        """Test the webhook rejects unsigned and accepts signed callbacks"""
+        from rest_framework.test import APIRequestFactory
+        from twilio.request_validator import RequestValidator
+        from .views import MissedCallDeliveryStatusView
+
+        url = 'https://api.example.com/auth/callbacks/status/'
+        params = {'CallSid': 'CA123', 'CallStatus': 'no-answer'}
+        factory = APIRequestFactory()
+        view = MissedCallDeliveryStatusView.as_view()
+
+        with patch.object(api_settings, 'STATUS_CALLBACK_URL', url), \
+                patch.object(api_settings, 'TWILIO_AUTH_TOKEN', 'secret'):
+            response = view(factory.post('/callbacks/status/', params))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+            signature = RequestValidator('secret').compute_signature(url, params)
+            request = factory.post('/callbacks/status/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+            response = view(request)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.delivery_status, 'no-answer')
+
+    def test_signals_only_sessions_that_moved(self):
+        """Test a session advanced by a concurrent callback isn't reported"""
+        from . import delivery
+        from .signals import delivery_status_changed
+        other = MissedCallVerification.objects.create(
+            user_phone='+0987654322',
+            app_signature='test-signature',
+            expected_caller=self.caller,
+            provider_call_id='CA456'
+        )
+        received = []
+        handler = lambda sender, session_id, status, **kwargs: received.append((session_id, status))
+        delivery_status_changed.connect(handler)
+        self.addCleanup(delivery_status_changed.disconnect, handler)
+
+        fan_out = delivery.fan_out
+
+        def racing_fan_out(func):
+            # Another callback moves CA456 past 'ringing' after the first read
+            rows = fan_out(func)
+            MissedCallVerification.objects.filter(pk=other.pk).update(delivery_status='busy')
+            return rows
+
+        with patch.object(delivery, 'fan_out', side_effect=racing_fan_out):
+            self.assertEqual(delivery.ingest_status_events([('CA123', 'ringing'), ('CA456', 'ringing')]), 1)
+        self.assertEqual(received, [(self.verification.pk, 'ringing')])
+        other.refresh_from_db()
+        self.assertEqual(other.delivery_status, 'busy')
+
+    @override_settings(MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'GATEWAY_CLASS': 'fake',
+        'TWILIO_AUTH_TOKEN': 'secret',
+        'STATUS_CALLBACK_URL': 'https://api.example.com/auth/callbacks/status/',
+        'TENANTS': {'brand-us': {'APP_SIGNATURES': ['us-signature-000'], 'GATEWAY_CLASS': 'twilio'}},
+    })
+    def test_webhook_uses_tenant_gateway(self):
+        """Test a tenant on a non-default gateway gets its status callbacks through"""
+        from rest_framework.test import APIRequestFactory
+        from twilio.request_validator import RequestValidator
+        from .views import MissedCallDeliveryStatusView
+
+        params = {'CallSid': 'CA123', 'CallStatus': 'ringing'}
+        signature = RequestValidator('secret').compute_signature(api_settings.STATUS_CALLBACK_URL, params)
+        request = APIRequestFactory().post('/callbacks/status/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+        response = MissedCallDeliveryStatusView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.delivery_status, 'ringing')
+
+
 class MissedCallAPITests(APITestCase):
     """Test API endpoints"""
     
@@ -226,10 +494,10 @@ class MissedCallAPITests(APITestCase):
             is_active=True
         )
     
-    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.trigger_missed_call')
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call')
     def test_request_endpoint(self, mock_trigger):
         """Test request endpoint"""
-        mock_trigger.return_value = True
+        mock_trigger.return_value = 'CA123'
         
         data = {
             'phone_number': '+0987654321',
@@ -241,7 +509,26 @@ class MissedCallAPITests(APITestCase):
         self.assertIn('session_id', response.data)
         self.assertIn('expires_at', response.data)
     
-    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.trigger_missed_call')
+    def test_dispatch_runs_outside_transaction(self):
+        """Test the session is committed before dialing and deleted if the call fails"""
+        from django.db import connection
+        from .gateways.base import TerminalGatewayError
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def place_call(*args, **kwargs):
+            seen.append(len(connection.atomic_blocks))
+            seen.append(MissedCallVerification.objects.count())
+            raise TerminalGatewayError('bad number')
+
+        data = {'phone_number': '+0987654321', 'app_signature': 'test-signature'}
+        with patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', side_effect=place_call):
+            response = self.client.post('/auth/request/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(seen, [depth, 1])
+        self.assertFalse(MissedCallVerification.objects.exists())
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call')
     def test_request_with_invalid_phone(self, mock_trigger):
         """Test request with invalid phone"""
         data = {
@@ -252,10 +539,10 @@ class MissedCallAPITests(APITestCase):
         response = self.client.post('/auth/request/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
     
-    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.trigger_missed_call')
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call')
     def test_verify_endpoint_success(self, mock_trigger):
         """Test successful verification"""
-        mock_trigger.return_value = True
+        mock_trigger.return_value = 'CA123'
         
         # First create a session
         verification = MissedCallVerification.objects.create(
@@ -319,6 +606,1941 @@ class MissedCallAPITests(APITestCase):
         self.assertIn('time_remaining_seconds', response.data)
 
 
+@override_settings(
+    MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'STATUS_LONG_POLL_TIMEOUT': 2,
+        'STATUS_LONG_POLL_INTERVAL': 0.05,
+    }
+)
+class StatusEndpointTests(APITestCase):
+    """Test status polling with ETags and long-polling"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+        self.verification = MissedCallVerification.objects.create(
+            user_phone='+0987654321',
+            app_signature='test-signature',
+            expected_caller=self.caller
+        )
+        self.url = f'/auth/status/{self.verification.id}/'
+
+    def test_unknown_session(self):
+        """Test unknown session ids return 404"""
+        response = self.client.get(f'/auth/status/{uuid.uuid4()}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_served_from_cache(self):
+        """Test repeated polls do not hit the database"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_not_modified(self):
+        """Test If-None-Match returns 304 until the state changes"""
+        from .signals import verification_success
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        MissedCallVerification.objects.filter(id=self.verification.id).update(is_verified=True)
+        verification_success.send(sender=self.__class__, verification_instance=self.verification)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_verified'])
+
+    def test_stale_load_is_not_cached(self):
+        """Test a snapshot loaded just before a verify doesn't outlive it"""
+        from .signals import verification_success
+        from .state import get_session_state
+
+        def verify_meanwhile():
+            # The verify commits between the reader's query and its cache write
+            MissedCallVerification.objects.filter(id=self.verification.id).update(is_verified=True)
+            verification_success.send(sender=self.__class__, verification_instance=self.verification)
+            return timezone.now()
+
+        with patch('drf_missed_call_auth.state.now', side_effect=verify_meanwhile):
+            self.assertFalse(get_session_state(self.verification.id)['is_verified'])
+        self.assertTrue(get_session_state(self.verification.id)['is_verified'])
+        with self.assertNumQueries(0):
+            self.assertTrue(get_session_state(self.verification.id)['is_verified'])
+
+    def test_long_poll_times_out(self):
+        """Test long-polling returns 304 when nothing changes"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url + '?wait=0.2', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_long_poll_returns_on_expiry(self):
+        """Test long-polling wakes up when the session expires"""
+        from .state import invalidate_session_state
+        MissedCallVerification.objects.filter(id=self.verification.id).update(
+            expires_at=timezone.now() + timedelta(milliseconds=500)
+        )
+        invalidate_session_state(self.verification.id)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url + '?wait=2', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_expired'])
+
+
+@override_settings(MISSEDCALL_AUTH={'ENABLE_EVENT_STREAM': True, 'EVENT_STREAM_HEARTBEAT': 0.05})
+class EventStreamTests(TestCase):
+    """Test push delivery of verification events"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+        self.verification = MissedCallVerification.objects.create(
+            user_phone='+0987654321',
+            app_signature='test-signature',
+            expected_caller=self.caller
+        )
+        self.session_id = str(self.verification.id)
+
+    async def collect(self, stream, publish_after_first=()):
+        from .events import publish_event
+        events = []
+        async for event in stream:
+            events.append(event)
+            if len(events) == 1:
+                for event_type, data in publish_after_first:
+                    publish_event(self.session_id, event_type, **data)
+            if len(events) > 10:
+                break
+        return events
+
+    async def test_stream_ends_on_verified(self):
+        """Test the stream sends the snapshot, then events until verified"""
+        from asgiref.sync import sync_to_async
+        from .state import get_session_state
+        from .streaming import iter_session_events
+        state = await sync_to_async(get_session_state)(self.session_id)
+        events = await self.collect(
+            iter_session_events(self.session_id, state),
+            publish_after_first=[('delivery', {'status': 'ringing'}), ('verified', {})],
+        )
+        events = [e for e in events if e is not None]
+        self.assertEqual([e['event'] for e in events], ['state', 'delivery', 'verified'])
+        self.assertEqual(events[1]['status'], 'ringing')
+
+    async def test_stream_ends_on_expiry(self):
+        """Test the stream reports expiry and closes"""
+        from .streaming import iter_session_events
+        state = {
+            'is_verified': False,
+            'delivery_status': '',
+            'expires_at': timezone.now() + timedelta(milliseconds=200),
+        }
+        with patch('drf_missed_call_auth.streaming.get_session_state', return_value=state):
+            events = await self.collect(iter_session_events(self.session_id, state))
+        self.assertEqual(events[-1], {'event': 'expired'})
+
+    async def test_websocket_forwards_events(self):
+        """Test the WebSocket application streams JSON events"""
+        import asyncio
+        import json
+        from .events import publish_event
+        from .streaming import websocket_events
+
+        incoming = asyncio.Queue()
+        sent = []
+        await incoming.put({'type': 'websocket.connect'})
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'websocket.send' and len(sent) == 2:
+                publish_event(self.session_id, 'verified')
+
+        scope = {'type': 'websocket', 'path': f'/auth/ws/{self.session_id}/'}
+        await asyncio.wait_for(websocket_events(scope, incoming.get, send), timeout=2)
+        self.assertEqual(sent[0]['type'], 'websocket.accept')
+        self.assertEqual(json.loads(sent[1]['text'])['event'], 'state')
+        self.assertEqual(json.loads(sent[2]['text'])['event'], 'verified')
+        self.assertEqual(sent[-1]['type'], 'websocket.close')
+
+
+class AdminChangelistTests(TestCase):
+    """Test admin changelists stay at a constant number of queries"""
+
+    def setUp(self):
+        from django.urls import reverse
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        self.source_url = reverse('admin:drf_missed_call_auth_callsourcenumber_changelist')
+        self.session_url = reverse('admin:drf_missed_call_auth_missedcallverification_changelist')
+
+    def create_rows(self, count):
+        start = CallSourceNumber.objects.count()
+        for i in range(start, start + count):
+            caller = CallSourceNumber.objects.create(phone_number=f'+1555000{i:04d}')
+            MissedCallVerification.objects.create(
+                user_phone=f'+1666000{i:04d}',
+                app_signature='test-signature',
+                expected_caller=caller
+            )
+
+    def count_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_independent_of_rows(self):
+        """Test adding rows does not add queries to either changelist"""
+        self.create_rows(2)
+        baseline = [self.count_queries(self.source_url), self.count_queries(self.session_url)]
+        self.create_rows(10)
+        self.assertEqual(
+            [self.count_queries(self.source_url), self.count_queries(self.session_url)],
+            baseline
+        )
+
+    def test_expected_caller_filter(self):
+        """Test filtering by expected caller through the autocomplete filter"""
+        self.create_rows(3)
+        caller = CallSourceNumber.objects.first()
+        response = self.client.get(f'{self.session_url}?expected_caller__id__exact={caller.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'admin-autocomplete')
+
+
+class DailyStatsTests(TestCase):
+    """Test per-number daily rollups"""
+
+    def setUp(self):
+        from . import stats
+        # Deltas buffered by other tests belong to rolled-back rows
+        stats.discard()
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+
+    def create_session(self, **kwargs):
+        return MissedCallVerification.objects.create(
+            user_phone='+0987654321',
+            app_signature='test-signature',
+            expected_caller=self.caller,
+            **kwargs
+        )
+
+    def test_signals_update_rollups_in_batches(self):
+        """Test sent/verified/failed counters are buffered then flushed"""
+        from . import stats
+        from .models import CallSourceDailyStats
+        from .signals import missed_call_sent, verification_failed, verification_success
+
+        session = self.create_session()
+        missed_call_sent.send(sender=self.__class__, verification_instance=session)
+        missed_call_sent.send(sender=self.__class__, verification_instance=session)
+        verification_failed.send(sender=self.__class__, session_id=session.pk, verification_instance=session)
+        session.verified_at = session.created_at + timedelta(seconds=7)
+        verification_success.send(sender=self.__class__, verification_instance=session)
+        self.assertFalse(CallSourceDailyStats.objects.exists())
+
+        stats.flush()
+        row = CallSourceDailyStats.objects.get(source=self.caller)
+        self.assertEqual((row.sent, row.verified, row.failed), (2, 1, 1))
+        self.assertEqual(row.ttv_under_10s, 1)
+        self.assertEqual(row.median_time_to_verify, 10)
+
+        missed_call_sent.send(sender=self.__class__, verification_instance=session)
+        stats.flush()
+        row.refresh_from_db()
+        self.assertEqual(row.sent, 3)
+
+    def test_rolled_back_request_keeps_pending_deltas(self):
+        """Test a failed verify under ATOMIC_REQUESTS doesn't lose the buffered deltas"""
+        from django.db import connection
+        from . import stats
+        from .models import CallSourceDailyStats
+        from .signals import missed_call_sent
+        session = self.create_session()
+        # Buffered by another request
+        missed_call_sent.send(sender=self.__class__, verification_instance=session)
+        with patch.dict(connection.settings_dict, {'ATOMIC_REQUESTS': True}), \
+                patch.object(api_settings, 'STATS_FLUSH_SIZE', 1):
+            response = self.client.post('/auth/verify/', {
+                'phone_number': session.user_phone, 'received_caller_id': '+19999999999',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        stats.flush()
+        row = CallSourceDailyStats.objects.get(source=self.caller)
+        self.assertEqual((row.sent, row.failed), (1, 1))
+
+    def test_backfill_command(self):
+        """Test the backfill rebuilds closed days from the raw table"""
+        from django.core.management import call_command
+        from .models import CallSourceDailyStats
+
+        yesterday = timezone.now() - timedelta(days=1)
+        verified = self.create_session(is_verified=True)
+        expired = self.create_session(expires_at=yesterday)
+        MissedCallVerification.objects.filter(pk__in=[verified.pk, expired.pk]).update(created_at=yesterday)
+        MissedCallVerification.objects.filter(pk=verified.pk).update(
+            verified_at=yesterday + timedelta(seconds=3)
+        )
+
+        call_command('backfill_missedcall_stats', stdout=StringIO())
+        row = CallSourceDailyStats.objects.get(source=self.caller)
+        self.assertEqual((row.sent, row.verified, row.expired), (2, 1, 1))
+        self.assertEqual(row.ttv_under_5s, 1)
+
+
+class RevocationTests(TestCase):
+    """Test bulk session expiry"""
+
+    def setUp(self):
+        self.caller = CallSourceNumber.objects.create(
+            phone_number='+1234567890',
+            is_active=True
+        )
+        self.other_caller = CallSourceNumber.objects.create(
+            phone_number='+1234567891',
+            is_active=True
+        )
+
+    def create_session(self, phone='+10987654321', signature='sig-a', caller=None, **kwargs):
+        return MissedCallVerification.objects.create(
+            user_phone=phone,
+            app_signature=signature,
+            expected_caller=caller or self.caller,
+            **kwargs
+        )
+
+    def test_revoke_by_phone_in_batches(self):
+        """Test every session of a phone is expired, in batches"""
+        from .revocation import revoke_sessions
+        sessions = [self.create_session(is_verified=True) for _ in range(5)]
+        other = self.create_session(phone='+10987654322')
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(revoke_sessions(phone='+1 098 765 4321', batch_size=2), 5)
+        updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        for session in sessions:
+            session.refresh_from_db()
+            self.assertTrue(session.is_expired)
+        other.refresh_from_db()
+        self.assertFalse(other.is_expired)
+
+    def test_criteria_are_combined(self):
+        """Test signature and caller criteria narrow the revocation"""
+        from .revocation import revoke_sessions
+        self.create_session(signature='sig-a', caller=self.other_caller)
+        self.create_session(signature='sig-b', caller=self.other_caller)
+        self.create_session(signature='sig-a')
+        self.assertEqual(revoke_sessions(app_signature='sig-a', caller_number='+1234567891'), 1)
+
+    def test_requires_criterion(self):
+        """Test revoking without criteria is refused"""
+        from django.core.management import CommandError, call_command
+        from .revocation import revoke_sessions
+        with self.assertRaises(ValueError):
+            revoke_sessions()
+        with self.assertRaises(CommandError):
+            call_command('revoke_missedcall_sessions', stdout=StringIO())
+
+    def test_revoked_session_rejected_and_cache_purged(self):
+        """Test revoked sessions fail authentication and drop their cached state"""
+        from django.core.cache import cache
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework.test import APIRequestFactory
+        from .authentication import MissedCallSessionAuthentication
+        from .revocation import revoke_sessions
+        from .state import get_session_state
+
+        session = self.create_session(is_verified=True)
+        self.assertFalse(get_session_state(session.pk)['expires_at'] <= timezone.now())
+        revoke_sessions(phone=session.user_phone)
+        self.assertLessEqual(get_session_state(session.pk)['expires_at'], timezone.now())
+
+        request = APIRequestFactory().get('/', HTTP_X_MISSEDCALL_SESSION=str(session.pk))
+        with self.assertRaises(AuthenticationFailed):
+            MissedCallSessionAuthentication().authenticate(request)
+
+
+@override_settings(
+    DATABASE_ROUTERS=['drf_missed_call_auth.routers.MissedCallReplicaRouter'],
+    MISSEDCALL_AUTH={'READ_REPLICA_ALIAS': 'replica', 'READ_REPLICA_PIN_SECONDS': 5},
+)
+class ReplicaRouterTests(TestCase):
+    """Test read-replica routing and read-your-writes pinning"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .routers import MissedCallReplicaRouter
+        cache.clear()
+        self.router = MissedCallReplicaRouter()
+
+    def test_routing_decisions(self):
+        """Test reads go to the replica, writes and primary hints to the primary"""
+        self.assertEqual(self.router.db_for_read(MissedCallVerification), 'replica')
+        self.assertEqual(self.router.db_for_read(CallSourceNumber), 'replica')
+        self.assertEqual(self.router.db_for_read(MissedCallVerification, primary=True), 'default')
+        self.assertEqual(self.router.db_for_write(MissedCallVerification), 'default')
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_written_session_is_pinned(self):
+        """Test a session saved moments ago is read from the primary"""
+        from .routers import is_pinned
+        session_id = uuid.uuid4()
+        self.assertEqual(self.router.db_for_read(MissedCallVerification, session_id=session_id), 'replica')
+
+        caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        session = MissedCallVerification.objects.create(
+            user_phone='+10987654321',
+            app_signature='test-signature',
+            expected_caller=caller
+        )
+        self.assertTrue(is_pinned(session.pk))
+        self.assertEqual(self.router.db_for_read(MissedCallVerification, session_id=session.pk), 'default')
+
+
+@skipUnless('replica' in settings.DATABASES, "requires a 'replica' database alias")
+@override_settings(
+    DATABASE_ROUTERS=['drf_missed_call_auth.routers.MissedCallReplicaRouter'],
+    MISSEDCALL_AUTH={'READ_REPLICA_ALIAS': 'replica', 'READ_REPLICA_PIN_SECONDS': 5},
+)
+class ReplicaLagTests(TestCase):
+    """
+    Test against two separate databases, where the replica never catches up.
+    Configure a second SQLite alias named 'replica' to run these.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        self.session = MissedCallVerification.objects.create(
+            user_phone='+10987654321',
+            app_signature='test-signature',
+            expected_caller=caller,
+            is_verified=True
+        )
+
+    def test_authentication_reads_pinned_session_from_primary(self):
+        """Test a freshly verified session authenticates despite lag"""
+        from rest_framework.test import APIRequestFactory
+        from .authentication import MissedCallSessionAuthentication
+        request = APIRequestFactory().get('/', HTTP_X_MISSEDCALL_SESSION=str(self.session.pk))
+        _user, session = MissedCallSessionAuthentication().authenticate(request)
+        self.assertEqual(session.pk, self.session.pk)
+
+    def test_unpinned_reads_use_replica(self):
+        """Test reads outside the pin window hit the replica"""
+        from django.core.cache import cache
+        from .permissions import IsMissedCallVerified
+        cache.clear()
+        self.assertFalse(MissedCallVerification.objects.filter(pk=self.session.pk).exists())
+        self.assertTrue(MissedCallVerification.objects.using('default').filter(pk=self.session.pk).exists())
+
+        # Lag fallback: the permission still finds the session on the primary
+        request = MagicMock(headers={'X-MissedCall-Session': str(self.session.pk)})
+        self.assertTrue(IsMissedCallVerified().has_permission(request, None))
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'CAPACITY_WINDOW': 300,
+    'CAPACITY_CALLS_PER_NUMBER_PER_MINUTE': 2,
+})
+class PoolCapacityTests(TestCase):
+    """Test sliding-window pool usage and saturation warnings"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.first = CallSourceNumber.objects.create(phone_number='+1234567890')
+        self.second = CallSourceNumber.objects.create(phone_number='+1234567891')
+        self.clock = 600 * 60.0
+        patcher = patch('drf_missed_call_auth.capacity.time.time', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record_minutes(self, calls_per_minute):
+        from .capacity import record_call
+        for calls in calls_per_minute:
+            for _ in range(calls):
+                record_call(self.first.pk)
+            self.clock += 60
+
+    def test_rate_headroom_and_projection(self):
+        """Test rate, headroom and a growing trend over the window"""
+        from .capacity import get_pool_capacity
+        self.record_minutes([0, 1, 1, 2, 2])
+        report = get_pool_capacity(include_numbers=True)
+
+        self.assertEqual(report.capacity, 4)
+        self.assertAlmostEqual(report.rate, 1.2)
+        self.assertAlmostEqual(report.headroom, 2.8)
+        self.assertGreater(report.trend, 0)
+        self.assertAlmostEqual(report.minutes_to_saturation, 2.8 / report.trend)
+        self.assertEqual(report.numbers[0][0], self.first)
+        self.assertEqual(report.saturated_numbers, [])
+
+    def test_old_minutes_leave_the_window(self):
+        """Test calls older than the window are not counted"""
+        from .capacity import get_pool_capacity
+        self.record_minutes([4, 4, 0, 0, 0, 0, 0])
+        report = get_pool_capacity()
+        self.assertEqual(report.rate, 0)
+        self.assertIsNone(report.minutes_to_saturation)
+
+    def test_system_check_reports_exhaustion(self):
+        """Test exhausted requests and high utilization surface as checks"""
+        from .apps import check_pool_capacity
+        from .capacity import record_exhaustion
+        self.assertEqual(check_pool_capacity(None), [])
+        self.assertEqual(check_pool_capacity(None, databases=['default']), [])
+
+        self.record_minutes([4, 4, 4, 4, 4])
+        ids = [error.id for error in check_pool_capacity(None, databases=['default'])]
+        self.assertEqual(ids, ['rfm.W003'])
+
+        record_exhaustion()
+        self.clock += 60
+        ids = [error.id for error in check_pool_capacity(None, databases=['default'])]
+        self.assertEqual(ids, ['rfm.E003'])
+
+    def test_request_counts_calls_and_exhaustion(self):
+        """Test the request path feeds the counters"""
+        from .capacity import get_pool_capacity
+        self.second.delete()
+        with patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123'):
+            data = {'phone_number': '+10987654321', 'app_signature': 'test-signature-123'}
+            self.assertEqual(self.client.post('/auth/request/', data).status_code, 202)
+            # The only number was used last time and is excluded
+            self.assertEqual(self.client.post('/auth/request/', data).status_code, 400)
+        self.clock += 60
+
+        report = get_pool_capacity()
+        self.assertAlmostEqual(report.rate, 1 / 5)
+        self.assertEqual(report.exhausted, 1)
+
+    def test_command_fails_when_saturated(self):
+        """Test the command prints the report and fails on saturation"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        self.record_minutes([1, 1, 1, 1, 1])
+        out = StringIO()
+        call_command('missedcall_capacity', stdout=out)
+        self.assertIn('Capacity:            4 calls/min', out.getvalue())
+
+        self.record_minutes([9, 9, 9, 9, 9])
+        with self.assertRaises(CommandError):
+            call_command('missedcall_capacity', '--json', stdout=StringIO())
+
+    def test_top_only_truncates_the_listing(self):
+        """Test numbers at cap are counted over the whole pool, not the listed ones"""
+        import json
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .capacity import record_call
+        for _ in range(5):
+            for source in (self.first, self.second) * 2:
+                record_call(source.pk)
+            self.clock += 60
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('missedcall_capacity', top=1, stdout=out)
+        self.assertIn('Numbers at cap:      2', out.getvalue())
+        self.assertEqual(out.getvalue().count('+123456789'), 1)
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('missedcall_capacity', '--json', top=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['saturated_numbers'], 2)
+        self.assertEqual(len(report['numbers']), 1)
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'RISK_BLOCKED_PREFIXES': ['+882'],
+    'RISK_HIGH_RISK_PREFIXES': ['+2376'],
+    'RISK_MIN_SAMPLES': 10,
+    'RISK_HIGH_RISK_MIN_SAMPLES': 3,
+    'RISK_MIN_CONVERSION': 0.2,
+})
+class FraudScreeningTests(APITestCase):
+    """Test per-prefix toll-fraud screening on the request path"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+
+    def send(self, phone, verify=False):
+        from .signals import missed_call_sent, verification_success
+        session = MissedCallVerification(
+            user_phone=phone, app_signature='test-signature', expected_caller=self.caller, created_at=timezone.now()
+        )
+        missed_call_sent.send(sender=None, verification_instance=session)
+        if verify:
+            verification_success.send(sender=None, verification_instance=session)
+
+    def at(self, seconds):
+        # Sessions sent at 0 are settled (past VALIDITY_PERIOD) at 900, in the same risk window
+        return patch('drf_missed_call_auth.risk.time.time', return_value=3600 * 10 + seconds)
+
+    def test_static_prefix_table(self):
+        """Test longest-prefix lookup of blocked and high-risk prefixes"""
+        from .risk import BLOCKED, HIGH_RISK, PrefixTable
+        table = PrefixTable(blocked=['+882', '+23761'], high_risk=['+237'])
+        self.assertEqual(table.match('+88231234567'), BLOCKED)
+        self.assertEqual(table.match('+23761234567'), BLOCKED)
+        self.assertEqual(table.match('+23771234567'), HIGH_RISK)
+        self.assertIsNone(table.match('+14155550100'))
+
+    def test_blocked_prefix_is_refused_before_dispatch(self):
+        """Test a statically blocked destination gets 403 and no call"""
+        with patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call') as place_call:
+            data = {'phone_number': '+88231234567', 'app_signature': 'test-signature-123'}
+            response = self.client.post('/auth/request/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        place_call.assert_not_called()
+        self.assertFalse(MissedCallVerification.objects.exists())
+
+    def test_collapsed_conversion_blocks_prefix(self):
+        """Test a prefix is blocked once its conversion falls below the floor"""
+        from .exceptions import DestinationBlocked
+        from .risk import assess_destination, unblock_prefix
+        from .signals import prefix_blocked
+        with self.at(0):
+            for index in range(10):
+                self.send(f"+4479000000{index:02d}", verify=index < 2)
+        with self.at(900):
+            assess_destination('+447900000099')  # 2/10 verified: at the floor
+
+        blocked = []
+
+        def on_blocked(sender, prefix, **kwargs):
+            blocked.append(prefix)
+
+        prefix_blocked.connect(on_blocked)
+        self.addCleanup(prefix_blocked.disconnect, on_blocked)
+        with self.at(0):
+            self.send('+44790000050')
+        with self.at(900), self.assertRaises(DestinationBlocked):
+            assess_destination('+447900000099')
+        self.assertEqual(blocked, ['+44790'])
+
+        # The block holds for the whole prefix even if conversion recovers
+        with self.at(0):
+            for index in range(10):
+                self.send(f"+4479000001{index:02d}", verify=True)
+        with self.at(900):
+            with self.assertRaises(DestinationBlocked):
+                assess_destination('+447900000011')
+            assess_destination('+447910000011')
+
+            unblock_prefix('+44790')
+            assess_destination('+447900000011')
+
+    def test_pending_sessions_are_not_samples(self):
+        """Test a burst of sessions still inside their validity doesn't block its prefix"""
+        from .exceptions import DestinationBlocked
+        from .risk import assess_destination
+        with self.at(0):
+            for index in range(30):
+                self.send(f"+1555000{index:04d}")
+            assess_destination('+15550009999')
+        with self.at(120):
+            assess_destination('+15550009999')
+        # Judged once the sessions could have been verified
+        with self.at(900), self.assertRaises(DestinationBlocked):
+            assess_destination('+15550009999')
+
+    def test_high_risk_prefix_needs_fewer_samples(self):
+        """Test high-risk prefixes are judged on fewer calls"""
+        from .exceptions import DestinationBlocked
+        from .risk import assess_destination
+        with self.at(0):
+            for index in range(3):
+                self.send(f"+23761234{index:04d}")
+        with self.at(900), self.assertRaises(DestinationBlocked):
+            assess_destination('+237612349999')
+
+    def test_previous_window_decays(self):
+        """Test the previous window is weighted by its remaining overlap"""
+        from .risk import get_prefix_stats
+        with patch('drf_missed_call_auth.risk.time.time', return_value=3600 * 10):
+            for index in range(8):
+                self.send(f"+4479000000{index:02d}")
+        with patch('drf_missed_call_auth.risk.time.time', return_value=3600 * 11 + 2700):
+            _blocked, sent, verified = get_prefix_stats('+44790')
+        self.assertAlmostEqual(sent, 2.0)
+        self.assertEqual(verified, 0)
+
+    def test_screening_cost(self):
+        """Test screening stays well under a millisecond per request"""
+        import time
+        from .risk import assess_destination
+        started = time.perf_counter()
+        for index in range(1000):
+            assess_destination(f"+1415555{index:04d}")
+        self.assertLess((time.perf_counter() - started) / 1000, 0.001)
+
+
+@override_settings(MISSEDCALL_AUTH={'REQUIRE_SIGNATURE': False})
+class CallerLeaseTests(APITestCase):
+    """Test caller-ID leases per destination phone"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.callers = [
+            CallSourceNumber.objects.create(phone_number=f"+123456789{index}")
+            for index in range(3)
+        ]
+
+    def test_concurrent_leases_are_distinct(self):
+        """Test a phone never holds two leases on the same number"""
+        from .leases import lease_caller
+        leased = [lease_caller('+10987654321') for _ in range(3)]
+        self.assertCountEqual(leased, self.callers)
+        self.assertIsNone(lease_caller('+10987654321'))
+        # Other phones are unaffected
+        self.assertIsNotNone(lease_caller('+10987654322'))
+
+    def test_lease_uses_cached_pool(self):
+        """Test leasing costs one primary-key query once the pool is cached"""
+        from .leases import lease_caller
+        lease_caller('+10987654321')
+        with self.assertNumQueries(1):
+            lease_caller('+10987654321')
+
+    def test_pool_cache_follows_changes(self):
+        """Test deactivated numbers stop being leased"""
+        from .leases import lease_caller
+        lease_caller('+10987654322')
+        CallSourceNumber.objects.exclude(pk=self.callers[0].pk).update(is_active=False)
+        # update() sends no signals: stale entries are detected and the pool reloaded
+        self.assertEqual(lease_caller('+10987654321'), self.callers[0])
+        self.assertIsNone(lease_caller('+10987654321'))
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_lease_released_on_verify(self, mock_place_call):
+        """Test retries get distinct callers and verification frees the lease"""
+        from .leases import LEASE_KEY
+        from django.core.cache import cache
+        data = {'phone_number': '+10987654321', 'app_signature': 'test-signature-123'}
+        for _ in range(3):
+            self.assertEqual(self.client.post('/auth/request/', data, format='json').status_code, 202)
+        callers = set(MissedCallVerification.objects.values_list('expected_caller_id', flat=True))
+        self.assertEqual(len(callers), 3)
+
+        session = MissedCallVerification.objects.order_by('-created_at').first()
+        response = self.client.post('/auth/verify/', {
+            'phone_number': '+10987654321',
+            'received_caller_id': session.expected_caller.phone_number,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(LEASE_KEY.format('+10987654321', session.expected_caller_id)))
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', side_effect=Exception('down'))
+    def test_lease_released_on_failed_dispatch(self, mock_place_call):
+        """Test a failed call does not keep the number leased"""
+        from .leases import LEASE_KEY
+        from django.core.cache import cache
+        CallSourceNumber.objects.exclude(pk=self.callers[0].pk).delete()
+        data = {'phone_number': '+10987654321', 'app_signature': 'test-signature-123'}
+        self.assertEqual(self.client.post('/auth/request/', data, format='json').status_code, 400)
+        self.assertIsNone(cache.get(LEASE_KEY.format('+10987654321', self.callers[0].pk)))
+
+
+@override_settings(MISSEDCALL_AUTH={'REQUIRE_SIGNATURE': False})
+class MultiSessionVerifyTests(APITestCase):
+    """Test verify against every pending session of a phone"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.phone = '+10987654321'
+        self.sessions = []
+        for index in range(3):
+            caller = CallSourceNumber.objects.create(phone_number=f"+123456789{index}")
+            self.sessions.append(MissedCallVerification.objects.create(
+                user_phone=self.phone,
+                app_signature='test-signature',
+                expected_caller=caller,
+            ))
+
+    def verify(self, caller_id):
+        return self.client.post('/auth/verify/', {
+            'phone_number': self.phone,
+            'received_caller_id': caller_id,
+        }, format='json')
+
+    def test_older_call_arriving_last_verifies(self):
+        """Test the caller of an older session is accepted and siblings expire"""
+        from .signals import sessions_revoked
+        revoked = []
+
+        def on_revoked(sender, session_ids, **kwargs):
+            revoked.extend(session_ids)
+
+        sessions_revoked.connect(on_revoked)
+        self.addCleanup(sessions_revoked.disconnect, on_revoked)
+
+        oldest = self.sessions[0]
+        response = self.verify(oldest.expected_caller.phone_number)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        oldest.refresh_from_db()
+        self.assertTrue(oldest.is_verified)
+        for sibling in self.sessions[1:]:
+            sibling.refresh_from_db()
+            self.assertFalse(sibling.is_verified)
+            self.assertTrue(sibling.is_expired)
+        self.assertCountEqual(revoked, [sibling.pk for sibling in self.sessions[1:]])
+
+        # Nothing left to verify for this phone
+        response = self.verify(self.sessions[1].expected_caller.phone_number)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lookup_is_one_query(self):
+        """Test all pending sessions are matched in a single query"""
+        from .serializers import MissedCallVerifySerializer
+        serializer = MissedCallVerifySerializer(data={
+            'phone_number': self.phone,
+            'received_caller_id': self.sessions[1].expected_caller.phone_number,
+        })
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['session'], self.sessions[1])
+
+    def test_unknown_caller_fails_against_latest(self):
+        """Test a caller matching no session reports a failure on the newest"""
+        from .signals import verification_failed
+        failed = []
+
+        def on_failed(sender, session_id, **kwargs):
+            failed.append(session_id)
+
+        verification_failed.connect(on_failed)
+        self.addCleanup(verification_failed.disconnect, on_failed)
+        response = self.verify('+19999999999')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(failed, [self.sessions[-1].pk])
+
+    def test_concurrently_verified_session_is_rejected(self):
+        """Test the conditional update loses cleanly to a concurrent verify"""
+        from .serializers import MissedCallVerifySerializer
+        from rest_framework.exceptions import ValidationError
+        serializer = MissedCallVerifySerializer(data={
+            'phone_number': self.phone,
+            'received_caller_id': self.sessions[0].expected_caller.phone_number,
+        })
+        self.assertTrue(serializer.is_valid())
+        MissedCallVerification.objects.filter(pk=self.sessions[0].pk).update(is_verified=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'MAX_VERIFICATION_ATTEMPTS': 2,
+    'PHONE_MAX_FAILURES': 3,
+    'LOCKOUT_BASE': 60,
+    'LOCKOUT_MAX': 600,
+    'ATTEMPT_FLUSH_SIZE': 100,
+})
+class AttemptLimitTests(APITestCase):
+    """Test cached attempt limits and exponential lockout"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import attempts
+        cache.clear()
+        attempts.discard()
+        self.phone = '+10987654321'
+        self.caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        self.session = MissedCallVerification.objects.create(
+            user_phone=self.phone,
+            app_signature='test-signature',
+            expected_caller=self.caller,
+        )
+
+    def verify(self, caller_id):
+        return self.client.post('/auth/verify/', {
+            'phone_number': self.phone,
+            'received_caller_id': caller_id,
+        }, format='json')
+
+    def test_session_dies_after_max_attempts(self):
+        """Test the correct caller is refused once the session used its attempts"""
+        with self.assertNumQueries(1):
+            # The session lookup only; the failure is not written
+            self.verify('+19999999999')
+        self.verify('+19999999998')
+        response = self.verify(self.caller.phone_number)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.is_verified)
+        self.assertEqual(self.session.attempt_count, 0)
+
+    def test_flush_writes_attempt_counts(self):
+        """Test buffered failures reach attempt_count in one update"""
+        from . import attempts
+        self.verify('+19999999999')
+        with self.assertNumQueries(3):
+            # The update, in a savepoint
+            self.assertEqual(attempts.flush(), 1)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.attempt_count, 1)
+
+    def test_rolled_back_request_keeps_pending_counts(self):
+        """Test a failed verify under ATOMIC_REQUESTS doesn't take the buffered deltas down with it"""
+        from django.db import connection
+        from . import attempts
+        other = MissedCallVerification.objects.create(
+            user_phone='+10987654322',
+            app_signature='test-signature',
+            expected_caller=self.caller,
+        )
+        # Buffered by another request
+        attempts.record_failure(other.pk, other.user_phone)
+        with patch.dict(connection.settings_dict, {'ATOMIC_REQUESTS': True}), \
+                patch.object(api_settings, 'ATTEMPT_FLUSH_SIZE', 1):
+            self.assertEqual(self.verify('+19999999999').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(attempts.flush(), 2)
+        self.session.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.session.attempt_count, other.attempt_count), (1, 1))
+
+    def test_phone_lockout_doubles(self):
+        """Test repeated failures lock the phone out for growing windows"""
+        from . import attempts
+        for _ in range(3):
+            attempts.record_failure(None, self.phone)
+        self.assertAlmostEqual(attempts.get_lockout_remaining(self.phone), 60, delta=1)
+
+        response = self.verify(self.caller.phone_number)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        response = self.client.post('/auth/request/', {
+            'phone_number': self.phone, 'app_signature': 'test-signature-123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        for _ in range(3):
+            attempts.record_failure(None, self.phone)
+        self.assertAlmostEqual(attempts.get_lockout_remaining(self.phone), 120, delta=1)
+
+    def test_success_clears_failures(self):
+        """Test a successful verify resets the phone's failure count"""
+        from . import attempts
+        self.verify('+19999999999')
+        self.assertEqual(self.verify(self.caller.phone_number).status_code, status.HTTP_200_OK)
+        attempts.record_failure(None, self.phone)
+        attempts.record_failure(None, self.phone)
+        self.assertIsNone(attempts.get_lockout_remaining(self.phone))
+
+    @override_settings(MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'TENANTS': {'brand-us': {'APP_SIGNATURES': ['us-signature-000'], 'VALIDITY_PERIOD': 600}},
+    })
+    def test_session_counter_lives_until_session_expires(self):
+        """Test the session counter follows the session's expiry, not the global validity"""
+        from . import attempts
+        MissedCallVerification.objects.filter(pk=self.session.pk).update(expires_at=timezone.now() + timedelta(seconds=30))
+        with patch.object(attempts, '_incr', wraps=attempts._incr) as incr:
+            self.verify('+19999999999')
+            attempts.record_failure('other-session', self.phone)
+        timeouts = {key: timeout for key, timeout in (call.args for call in incr.call_args_list)}
+        self.assertAlmostEqual(timeouts[attempts.SESSION_KEY.format(self.session.pk)], 30, delta=1)
+        # Unknown expiry: the longest validity of any tenant
+        self.assertEqual(timeouts[attempts.SESSION_KEY.format('other-session')], 600)
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'AUDIT_FLUSH_SIZE': 1000,
+    'AUDIT_FLUSH_INTERVAL': 3600,
+})
+class AuditTrailTests(APITestCase):
+    """Test buffered audit events"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import audit
+        cache.clear()
+        audit.discard()
+        self.caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_request_and_verify_are_audited(self, mock_place_call):
+        """Test the flow records masked, attributed events in one batch"""
+        from . import audit
+        from .models import AuditEvent, AuditEventType
+        headers = {'REMOTE_ADDR': '203.0.113.7', 'HTTP_USER_AGENT': 'FlashCall/1.0'}
+        self.client.post('/auth/request/', {
+            'phone_number': '+10987654321', 'app_signature': 'test-signature-123',
+        }, format='json', **headers)
+        self.client.post('/auth/verify/', {
+            'phone_number': '+10987654321', 'received_caller_id': '+19999999999',
+        }, format='json', **headers)
+        self.client.post('/auth/verify/', {
+            'phone_number': '+10987654321', 'received_caller_id': self.caller.phone_number,
+        }, format='json', **headers)
+        self.assertFalse(AuditEvent.objects.exists())
+
+        with self.assertNumQueries(3):
+            # One insert, in a savepoint
+            self.assertEqual(audit.flush(), 4)
+
+        session = MissedCallVerification.objects.get()
+        self.assertEqual(session.ip_address, '203.0.113.7')
+        events = list(AuditEvent.objects.order_by('created_at', 'id'))
+        self.assertEqual([event.event for event in events], [
+            AuditEventType.DISPATCH,
+            AuditEventType.REQUEST,
+            AuditEventType.VERIFY_FAILURE,
+            AuditEventType.VERIFY_SUCCESS,
+        ])
+        self.assertEqual(events[0].data['provider_call_id'], 'CA123')
+        self.assertEqual(events[1].session_id, session.pk)
+        self.assertEqual(events[1].status_code, 202)
+        self.assertEqual(events[2].status_code, 400)
+        for event in events:
+            self.assertEqual(event.phone, '+1********21')
+        self.assertEqual(events[3].ip_address, '203.0.113.7')
+        self.assertEqual(events[3].user_agent, 'FlashCall/1.0')
+        self.assertIn('time_to_verify', events[3].data)
+
+    def test_ring_buffer_drops_oldest(self):
+        """Test a full buffer keeps the newest events"""
+        from . import audit
+        from .models import AuditEvent
+        with override_settings(MISSEDCALL_AUTH={'AUDIT_BUFFER_SIZE': 3, 'AUDIT_FLUSH_SIZE': 10}):
+            for index in range(5):
+                audit.record('expired', index=index)
+            self.assertEqual(audit.flush(), 3)
+        self.assertEqual(
+            sorted(AuditEvent.objects.values_list('data__index', flat=True)),
+            [2, 3, 4]
+        )
+
+    def test_jsonl_backend(self):
+        """Test events can be appended to a JSON-lines file"""
+        import json
+        import os
+        import tempfile
+        from . import audit
+        path = os.path.join(tempfile.mkdtemp(), 'audit.jsonl')
+        with override_settings(MISSEDCALL_AUTH={
+            'AUDIT_BACKEND': 'drf_missed_call_auth.audit.JSONLinesAuditBackend',
+            'AUDIT_LOG_FILE': path,
+            'AUDIT_FLUSH_SIZE': 2,
+        }), self.captureOnCommitCallbacks(execute=True):
+            audit.record('expired', session_id=uuid.uuid4())
+            audit.record('request', phone='+10987654321', status_code=403)
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['event'] for line in lines], ['expired', 'request'])
+        self.assertEqual(lines[1]['phone'], '+1********21')
+
+    def test_rolled_back_request_keeps_events(self):
+        """Test a failed verify under ATOMIC_REQUESTS doesn't lose the buffered events"""
+        from django.db import connection
+        from . import audit
+        from .models import AuditEvent, AuditEventType
+        # Buffered by another request
+        audit.record(AuditEventType.EXPIRED, session_id=uuid.uuid4())
+        with patch.dict(connection.settings_dict, {'ATOMIC_REQUESTS': True}), \
+                patch.object(api_settings, 'AUDIT_FLUSH_SIZE', 1):
+            response = self.client.post('/auth/verify/', {
+                'phone_number': '+10987654321', 'received_caller_id': self.caller.phone_number,
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(audit.flush(), 2)
+        self.assertEqual(
+            sorted(AuditEvent.objects.values_list('event', flat=True)),
+            [AuditEventType.EXPIRED, AuditEventType.VERIFY_FAILURE],
+        )
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'ALLOWED_APP_SIGNATURES': ['default-signature'],
+    'TENANTS': {
+        'brand-eu': {
+            'APP_SIGNATURES': ['eu-signature-000'],
+            'VALIDITY_PERIOD': 120,
+            'MAX_VERIFICATION_ATTEMPTS': 1,
+            'GATEWAY_CLASS': 'fake',
+            'THROTTLE_RATE': '2/min',
+        },
+    },
+})
+class TenantProfileTests(APITestCase):
+    """Test tenant profiles keyed by app signature"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import stats
+        from .gateways.fake import FakeCarrierGateway
+        cache.clear()
+        # Deltas buffered by other tests belong to rolled-back rows
+        stats.discard()
+        FakeCarrierGateway.reset()
+        self.default_caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        self.eu_caller = CallSourceNumber.objects.create(phone_number='+3312345678', tenant='brand-eu')
+
+    def request(self, signature, phone='+10987654321'):
+        return self.client.post('/auth/request/', {
+            'phone_number': phone, 'app_signature': signature,
+        }, format='json')
+
+    def test_signature_resolves_tenant(self):
+        """Test profiles override settings and unknown signatures fall back"""
+        from .tenants import resolve_tenant
+        tenant = resolve_tenant('eu-signature-000')
+        self.assertEqual(tenant.name, 'brand-eu')
+        self.assertEqual(tenant.VALIDITY_PERIOD, 120)
+        self.assertTrue(resolve_tenant('default-signature').is_default)
+        self.assertEqual(resolve_tenant('default-signature').VALIDITY_PERIOD, api_settings.VALIDITY_PERIOD)
+
+    def test_request_uses_tenant_pool_and_profile(self):
+        """Test a tenant's request is served by its own pool, gateway and validity"""
+        from .gateways.fake import FakeCarrierGateway
+        self.assertEqual(self.request('eu-signature-000').status_code, 202)
+        session = MissedCallVerification.objects.get()
+        self.assertEqual(session.expected_caller, self.eu_caller)
+        self.assertAlmostEqual((session.expires_at - session.created_at).total_seconds(), 120, delta=1)
+        self.assertEqual(FakeCarrierGateway.last_call_to('+10987654321')['from'], self.eu_caller.phone_number)
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_pools_are_isolated(self, mock_place_call):
+        """Test tenants never draw from each other's pools"""
+        from .capacity import get_pool_capacity
+        self.assertEqual(self.request('default-signature').status_code, 202)
+        self.assertEqual(MissedCallVerification.objects.get().expected_caller, self.default_caller)
+        self.assertEqual(self.request('unknown-signature').status_code, 400)
+
+        self.assertEqual(self.request('eu-signature-000').status_code, 202)
+        # The EU pool has a single number, already used for this phone
+        self.assertEqual(self.request('eu-signature-000').status_code, 400)
+        # Capacity reads complete minutes only
+        import time
+        with patch('drf_missed_call_auth.capacity.time.time', return_value=time.time() + 60):
+            self.assertEqual(get_pool_capacity(tenant='brand-eu').exhausted, 1)
+            self.assertEqual(get_pool_capacity().exhausted, 0)
+
+    def test_attempt_limit_per_tenant(self):
+        """Test sessions use their tenant's attempt limit"""
+        eu = MissedCallVerification.objects.create(
+            user_phone='+10987654321', app_signature='eu-signature-000',
+            expected_caller=self.eu_caller, attempt_count=1
+        )
+        default = MissedCallVerification.objects.create(
+            user_phone='+10987654321', app_signature='default-signature',
+            expected_caller=self.default_caller, attempt_count=1
+        )
+        self.assertFalse(eu.is_valid)
+        self.assertTrue(default.is_valid)
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_throttle_per_tenant(self, mock_place_call):
+        """Test a tenant's rate limit doesn't touch other tenants"""
+        for index in range(2):
+            self.assertNotEqual(self.request('eu-signature-000', f'+1098765432{index}').status_code, 429)
+        self.assertEqual(self.request('eu-signature-000', '+10987654329').status_code, 429)
+        self.assertEqual(self.request('default-signature').status_code, 202)
+
+    def test_ambiguous_profiles_fail_checks(self):
+        """Test a signature claimed twice is reported by the system check"""
+        from .apps import validate_settings
+        self.assertNotIn('rfm.E004', [error.id for error in validate_settings(None)])
+        with override_settings(MISSEDCALL_AUTH={'TENANTS': {
+            'a': {'APP_SIGNATURES': ['shared-signature']},
+            'b': {'APP_SIGNATURES': ['shared-signature']},
+        }}):
+            self.assertIn('rfm.E004', [error.id for error in validate_settings(None)])
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'ALLOWED_APP_SIGNATURES': ['static-signature'],
+    'DYNAMIC_CONFIG_ENABLED': True,
+    'DYNAMIC_CONFIG_POLL_INTERVAL': 60,
+})
+class DynamicConfigTests(APITestCase):
+    """Test runtime overrides from the DynamicSetting table"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import config
+        cache.clear()
+        config.reset()
+        self.addCleanup(config.reset)
+
+    def set(self, key, value):
+        from .models import DynamicSetting
+        with self.captureOnCommitCallbacks(execute=True):
+            DynamicSetting.objects.update_or_create(key=key, defaults={'value': value})
+
+    def test_published_change_is_applied(self):
+        """Test workers apply a new version once and keep MISSEDCALL_AUTH underneath"""
+        from . import config
+        self.set('VALIDITY_PERIOD', 60)
+        self.assertEqual(api_settings.VALIDITY_PERIOD, 300)
+        self.assertTrue(config.poll(force=True))
+        self.assertEqual(api_settings.VALIDITY_PERIOD, 60)
+        self.assertEqual(api_settings.ALLOWED_APP_SIGNATURES, ['static-signature'])
+        self.assertFalse(config.poll(force=True))
+
+    def test_poll_is_throttled(self):
+        """Test a poll costs no query and at most one cache read per interval"""
+        from . import config
+        config.poll(force=True)
+        self.set('VALIDITY_PERIOD', 60)
+        with self.assertNumQueries(0):
+            self.assertFalse(config.poll())
+            self.assertTrue(config.poll(force=True))
+
+    def test_signature_matcher_is_rebuilt(self):
+        """Test requests see new signatures and tenants after the swap"""
+        from . import config
+        from .tenants import resolve_tenant
+        self.set('ALLOWED_APP_SIGNATURES', ['rotated-signature'])
+        self.set('TENANTS', {'brand-eu': {'APP_SIGNATURES': ['eu-signature-000']}})
+        self.assertTrue(resolve_tenant('eu-signature-000').is_default)
+
+        with override_settings(MISSEDCALL_AUTH={
+            'ALLOWED_APP_SIGNATURES': ['static-signature'],
+            'DYNAMIC_CONFIG_ENABLED': True,
+            'DYNAMIC_CONFIG_POLL_INTERVAL': 0,
+        }):
+            # The request itself triggers the poll
+            response = self.client.post('/auth/request/', {
+                'phone_number': '+10987654321', 'app_signature': 'rotated-signature',
+            }, format='json')
+        self.assertNotIn('authorized', str(response.data))
+        self.assertEqual(resolve_tenant('eu-signature-000').name, 'brand-eu')
+        self.assertIsNotNone(config.get_version())
+
+    def test_invalid_values_are_rolled_back(self):
+        """Test a snapshot that doesn't compile leaves the running values alone"""
+        from . import config
+        self.set('TENANTS', {
+            'a': {'APP_SIGNATURES': ['shared-signature']},
+            'b': {'APP_SIGNATURES': ['shared-signature']},
+        })
+        with self.assertLogs('drf_missed_call_auth.config', 'ERROR'):
+            self.assertFalse(config.poll(force=True))
+        self.assertEqual(api_settings.TENANTS, {})
+
+    def test_mistyped_values_are_refused(self):
+        """Test values must have the type of the setting's default"""
+        from django.core.exceptions import ValidationError
+        from . import config
+        from .models import DynamicSetting
+        for key, value in (('VALIDITY_PERIOD', 'sixty'), ('VALIDITY_PERIOD', True), ('REQUIRE_SIGNATURE', 1),
+                           ('RISK_BLOCKED_PREFIXES', '+882')):
+            with self.assertRaises(ValidationError):
+                DynamicSetting(key=key, value=value).full_clean()
+        DynamicSetting(key='RISK_MIN_CONVERSION', value=1).full_clean()
+
+        # Rows written around full_clean() are skipped when applied
+        self.set('VALIDITY_PERIOD', 'sixty')
+        self.set('MAX_VERIFICATION_ATTEMPTS', 5)
+        with self.assertLogs('drf_missed_call_auth.config', 'ERROR'):
+            self.assertTrue(config.poll(force=True))
+        self.assertEqual(api_settings.VALIDITY_PERIOD, 300)
+        self.assertEqual(api_settings.MAX_VERIFICATION_ATTEMPTS, 5)
+
+    def test_static_settings_cannot_be_overridden(self):
+        """Test credentials, settings read at startup and unknown keys are refused"""
+        from django.core.exceptions import ValidationError
+        from .models import DynamicSetting
+        for key, value in (('TWILIO_AUTH_TOKEN', 'x'), ('ENABLE_BULK_ENDPOINT', True),
+                           ('PROFILING_ENABLED', True), ('NOT_A_SETTING', 'x')):
+            with self.assertRaises(ValidationError):
+                DynamicSetting(key=key, value=value).full_clean()
+        DynamicSetting(key='VALIDITY_PERIOD', value=60).full_clean()
+
+
+class StorageLayoutTests(TransactionTestCase):
+    """Test the compact storage fields, migration step and benchmark"""
+
+    def setUp(self):
+        from .fields import interner
+        interner.clear()
+        self.addCleanup(interner.clear)
+
+    def test_e164_field_round_trip(self):
+        """Test phone numbers are stored as integers and read back as E.164"""
+        from .fields import E164Field
+        field = E164Field()
+        self.assertEqual(field.get_prep_value('+14155550123'), 14155550123)
+        self.assertEqual(field.from_db_value(14155550123, None, None), '+14155550123')
+        self.assertEqual(field.to_python('+14155550123'), '+14155550123')
+        self.assertIsNone(field.get_prep_value('+1415-555'))
+
+    def test_signature_interning(self):
+        """Test signatures are interned once and unknown ones match nothing"""
+        from .fields import interner
+        from .models import AppSignature
+        pk = interner.get_id('interned-signature', create=True)
+        self.assertEqual(interner.get_id('interned-signature', create=True), pk)
+        self.assertEqual(AppSignature.objects.get(pk=pk).value, 'interned-signature')
+        with self.assertNumQueries(0):
+            self.assertEqual(interner.get_value(pk), 'interned-signature')
+        self.assertIsNone(interner.get_id('unknown-signature'))
+        self.assertFalse(AppSignature.objects.filter(value='unknown-signature').exists())
+
+    def test_sessions_read_as_strings(self):
+        """Test the model API doesn't depend on the layout"""
+        caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        MissedCallVerification.objects.create(
+            user_phone='+14155550123', app_signature='layout-signature', expected_caller=caller,
+        )
+        session = MissedCallVerification.objects.get(
+            user_phone='+14155550123', app_signature='layout-signature',
+        )
+        self.assertEqual((session.user_phone, session.app_signature), ('+14155550123', 'layout-signature'))
+        self.assertFalse(MissedCallVerification.objects.filter(app_signature='other-signature').exists())
+
+    @skipIf(api_settings.COMPACT_STORAGE, "Needs the string columns")
+    def test_migration_data_step(self):
+        """Test the data step converts string columns and reverses cleanly"""
+        from types import SimpleNamespace
+        from django.apps import apps
+        from django.db import connection
+        from .models import AppSignature
+        from .storage import prepare_compact, restore_legacy
+        caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        session = MissedCallVerification.objects.create(
+            user_phone='+14155550123', app_signature='legacy-signature', expected_caller=caller,
+        )
+        editor = SimpleNamespace(connection=connection)
+
+        prepare_compact(apps, editor)
+        signature = AppSignature.objects.get(value='legacy-signature')
+        row = MissedCallVerification.objects.values('user_phone', 'app_signature').get(pk=session.pk)
+        self.assertEqual(row, {'user_phone': '14155550123', 'app_signature': str(signature.pk)})
+
+        restore_legacy(apps, editor)
+        row = MissedCallVerification.objects.values('user_phone', 'app_signature').get(pk=session.pk)
+        self.assertEqual(row, {'user_phone': '+14155550123', 'app_signature': 'legacy-signature'})
+
+    def test_benchmark_command(self):
+        """Test the benchmark fills and drops a scratch table per layout"""
+        import json
+        from django.core.management import call_command
+        from django.db import connection
+        from .models import AppSignature
+        out = StringIO()
+        call_command('missedcall_storage_benchmark', rows=50, signatures=3, batch_size=20, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {'legacy', 'compact'})
+        self.assertEqual(results['compact']['rows'], 50)
+        self.assertFalse(any('bench' in table for table in connection.introspection.table_names()))
+        self.assertFalse(AppSignature.objects.exists())
+        call_command('missedcall_storage_benchmark', rows=10, stdout=StringIO())
+
+
+def issue_test_claims(user_id, session):
+    """TOKEN_ISSUER used by ProvisioningTests"""
+    return {'claims': {'sub': user_id, 'phone': session.user_phone}}
+
+
+def issue_failing_claims(user_id, session):
+    """TOKEN_ISSUER that fails after the user was created"""
+    raise RuntimeError("issuer unavailable")
+
+
+@skipUnless(django_apps.is_installed('rest_framework.authtoken'), "requires rest_framework.authtoken")
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'USER_PHONE_FIELD': 'username',
+    'TOKEN_ISSUER': 'token',
+})
+class ProvisioningTests(APITestCase):
+    """Test user provisioning and token issuance on verify"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.phone = '+10987654321'
+        self.caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+        self.session = MissedCallVerification.objects.create(
+            user_phone=self.phone, app_signature='test-signature', expected_caller=self.caller,
+        )
+
+    def verify(self):
+        return self.client.post('/auth/verify/', {
+            'phone_number': self.phone,
+            'received_caller_id': self.caller.phone_number,
+        }, format='json')
+
+    def test_new_user_gets_token(self):
+        """Test a first verification creates the user and its token"""
+        from rest_framework.authtoken.models import Token
+        response = self.verify()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(username=self.phone)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(response.data['user_id'], user.pk)
+        self.assertEqual(response.data['token'], Token.objects.get(user=user).key)
+
+    def test_returning_user_query_budget(self):
+        """Test a known user costs one query cold, and none for the user id when cached"""
+        from rest_framework.authtoken.models import Token
+        from .issuance import issue_credentials
+        user = User.objects.create(username=self.phone)
+        token = Token.objects.create(user=user)
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(issue_credentials(self.session), {'user_id': user.pk, 'token': token.key})
+        with self.assertNumQueries(1):
+            issue_credentials(self.session)
+        with override_settings(MISSEDCALL_AUTH={'USER_PHONE_FIELD': 'username'}):
+            with self.assertNumQueries(0):
+                self.assertEqual(issue_credentials(self.session), {'user_id': user.pk})
+
+    def test_upsert_keeps_concurrently_created_user(self):
+        """Test a user created between lookup and insert is reused, not duplicated"""
+        from . import issuance
+        user = User.objects.create(username=self.phone)
+        with patch.object(issuance, '_lookup', return_value=(None, True, None)):
+            user_id, _key = issuance.get_user_id(self.phone)
+        self.assertEqual(user_id, user.pk)
+        self.assertEqual(User.objects.filter(username=self.phone).count(), 1)
+
+    def test_inactive_user_is_refused(self):
+        """Test a disabled account gets 403 and the session is not consumed"""
+        User.objects.create(username=self.phone, is_active=False)
+        response = self.verify()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.is_verified)
+
+    def test_cached_mapping_follows_user_changes(self):
+        """Test changing a user's phone drops the cached mapping"""
+        from .issuance import get_user_id
+        user = User.objects.create(username=self.phone)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(get_user_id(self.phone)[0], user.pk)
+        user.username = '+15550001111'
+        user.save()
+        self.assertNotEqual(get_user_id(self.phone)[0], user.pk)
+
+    def test_rolled_back_user_is_not_cached(self):
+        """Test a verify that fails after creating the user leaves no cached mapping"""
+        from .issuance import get_user_id
+        failing = {
+            'REQUIRE_SIGNATURE': False,
+            'USER_PHONE_FIELD': 'username',
+            'TOKEN_ISSUER': 'drf_missed_call_auth.tests.issue_failing_claims',
+        }
+        with override_settings(MISSEDCALL_AUTH=failing), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                self.verify()
+        self.assertFalse(User.objects.filter(username=self.phone).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.verify()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_id'], User.objects.get(username=self.phone).pk)
+        self.assertEqual(get_user_id(self.phone)[0], response.data['user_id'])
+
+    @override_settings(MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'USER_PHONE_FIELD': 'username',
+        'TOKEN_ISSUER': 'drf_missed_call_auth.tests.issue_test_claims',
+    })
+    def test_custom_issuer(self):
+        """Test TOKEN_ISSUER accepts a dotted path"""
+        response = self.verify()
+        user = User.objects.get(username=self.phone)
+        self.assertEqual(response.data['claims'], {'sub': user.pk, 'phone': self.phone})
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'GATEWAY_CLASS': 'fake',
+    'CAPACITY_CALLS_PER_NUMBER_PER_MINUTE': 6000,
+})
+class BulkRequestTests(TestCase):
+    """Test bulk verification requests"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .gateways.fake import FakeCarrierGateway
+        cache.clear()
+        FakeCarrierGateway.reset()
+        self.addCleanup(FakeCarrierGateway.configure)
+        self.callers = [CallSourceNumber.objects.create(phone_number=f'+123456789{i}') for i in range(2)]
+
+    def run_batch(self, phones, **kwargs):
+        from .bulk import request_verifications
+        return sorted(request_verifications(phones, 'test-signature', **kwargs), key=lambda result: result['index'])
+
+    def test_batch_is_screened_and_dispatched(self):
+        """Test each phone gets a result and sent sessions carry the call id"""
+        from .gateways.fake import FakeCarrierGateway
+        phones = ['+15550000001', '+1 555 000 0002', 'not-a-phone', '+15550000001', '+15550000003']
+        results = self.run_batch(phones, concurrency=3)
+
+        self.assertEqual([result['status'] for result in results], ['sent', 'sent', 'rejected', 'rejected', 'sent'])
+        self.assertEqual(results[2]['error'], 'invalid_phone_number')
+        self.assertEqual(results[3]['error'], 'duplicate')
+        self.assertEqual(results[1]['phone_number'], '+15550000002')
+        self.assertEqual(len(FakeCarrierGateway.calls()), 3)
+        sessions = MissedCallVerification.objects.filter(pk__in=[r['session_id'] for r in results if 'session_id' in r])
+        self.assertEqual(len(sessions), 3)
+        self.assertTrue(all(session.provider_call_id.startswith('FAKE') for session in sessions))
+
+    @override_settings(MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'GATEWAY_CLASS': 'fake',
+        'CAPACITY_CALLS_PER_NUMBER_PER_MINUTE': 60,
+        'BULK_MAX_DELAY': 0.5,
+    })
+    def test_numbers_are_paced(self):
+        """Test a number isn't scheduled again within its rate cap"""
+        results = self.run_batch([f'+1555000000{i}' for i in range(3)])
+        self.assertEqual([result['status'] for result in results], ['sent', 'sent', 'rejected'])
+        self.assertEqual(results[2]['error'], 'capacity_exceeded')
+        callers = MissedCallVerification.objects.values_list('expected_caller_id', flat=True)
+        self.assertEqual(sorted(callers), sorted(caller.pk for caller in self.callers))
+
+    def test_failed_calls_leave_no_session(self):
+        """Test sessions whose call failed are removed and their leases freed"""
+        from django.core.cache import cache
+        from .gateways.fake import FakeCarrierGateway
+        from .leases import LEASE_KEY
+        FakeCarrierGateway.configure(failure_rate=1.0, retryable_share=0)
+        results = self.run_batch(['+15550000001'])
+        self.assertEqual(results[0]['status'], 'failed')
+        self.assertFalse(MissedCallVerification.objects.exists())
+        self.assertFalse(any(cache.get(LEASE_KEY.format('+15550000001', caller.pk)) for caller in self.callers))
+
+    def test_closed_stream_cancels_pending_calls(self):
+        """Test a consumer going away stops the queued calls and accounts for the placed ones"""
+        from django.core.cache import cache
+        from .bulk import request_verifications
+        from .gateways.fake import FakeCarrierGateway
+        from .leases import LEASE_KEY
+        from .signals import missed_call_sent
+        FakeCarrierGateway.configure(latency=0.05)
+        sent = []
+        handler = lambda sender, verification_instance, **kwargs: sent.append(verification_instance.pk)
+        missed_call_sent.connect(handler)
+        self.addCleanup(missed_call_sent.disconnect, handler)
+
+        phones = [f'+1555000000{i}' for i in range(6)]
+        results = request_verifications(phones, 'test-signature', concurrency=1)
+        self.assertEqual(next(results)['status'], 'sent')
+        results.close()
+
+        placed = FakeCarrierGateway.calls()
+        self.assertLess(len(placed), len(phones))
+        sessions = MissedCallVerification.objects.all()
+        self.assertEqual(sorted(session.pk for session in sessions), sorted(sent))
+        self.assertEqual(len(sessions), len(placed))
+        self.assertTrue(all(session.provider_call_id for session in sessions))
+        leased = {
+            phone for phone in phones
+            if any(cache.get(LEASE_KEY.format(phone, caller.pk)) for caller in self.callers)
+        }
+        self.assertEqual(leased, {session.user_phone for session in sessions})
+
+    def test_endpoint_streams_results(self):
+        """Test the endpoint requires staff and answers with JSON lines"""
+        import json
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .views import MissedCallBulkRequestView
+        view = MissedCallBulkRequestView.as_view()
+        data = {'phone_numbers': ['+15550000001', '+15550000002'], 'app_signature': 'test-signature'}
+
+        request = APIRequestFactory().post('/auth/request/bulk/', data, format='json')
+        self.assertEqual(view(request).status_code, status.HTTP_403_FORBIDDEN)
+
+        request = APIRequestFactory().post('/auth/request/bulk/', data, format='json')
+        force_authenticate(request, user=User.objects.create(username='ops', is_staff=True))
+        response = view(request)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual({line['status'] for line in lines}, {'sent'})
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'VERIFICATION_MODE': 'inbound',
+    'TWILIO_AUTH_TOKEN': 'secret',
+    'INBOUND_CALLBACK_URL': 'https://api.example.com/auth/callbacks/inbound/',
+})
+class InboundVerificationTests(APITestCase):
+    """Test inbound missed-call verification"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.callers = [CallSourceNumber.objects.create(phone_number=f'+123456789{i}') for i in range(2)]
+
+    def request(self, phone='+10987654321'):
+        response = self.client.post('/auth/request/', {
+            'phone_number': phone, 'app_signature': 'test-signature',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.data
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call')
+    def test_call_from_user_verifies_session(self, mock_place_call):
+        """Test the user is given a number and calling it verifies the session"""
+        from .inbound import ingest_inbound_calls
+        first, second = self.request(), self.request()
+        mock_place_call.assert_not_called()
+        self.assertNotEqual(first['call_number'], second['call_number'])
+
+        # The number to call is public, so reporting it proves nothing
+        response = self.client.post('/auth/verify/', {
+            'phone_number': '+10987654321', 'received_caller_id': first['call_number'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(ingest_inbound_calls([('+15550000000', first['call_number'])]), 0)
+        self.assertEqual(ingest_inbound_calls([('+1 098 765 4321', first['call_number'])]), 1)
+        self.assertEqual(ingest_inbound_calls([('+10987654321', first['call_number'])]), 0)
+
+        session = MissedCallVerification.objects.get(pk=first['session_id'])
+        self.assertTrue(session.is_verified)
+        sibling = MissedCallVerification.objects.get(pk=second['session_id'])
+        self.assertFalse(sibling.is_valid)
+        status_response = self.client.get(f"/auth/status/{first['session_id']}/")
+        self.assertTrue(status_response.data['is_verified'])
+
+    def test_evicted_index_falls_back_to_database(self):
+        """Test sessions missing from the cache index are still matched"""
+        from django.core.cache import cache
+        from .inbound import ingest_inbound_calls
+        data = self.request()
+        cache.clear()
+        self.assertEqual(ingest_inbound_calls([
+            ('+10987654321', self.callers[0].phone_number),
+            ('+10987654321', self.callers[1].phone_number),
+        ]), 1)
+        self.assertTrue(MissedCallVerification.objects.get(pk=data['session_id']).is_verified)
+
+    def test_webhook_validates_and_rejects_call(self):
+        """Test the webhook checks the signature and answers with a reject"""
+        from rest_framework.test import APIRequestFactory
+        from twilio.request_validator import RequestValidator
+        from .views import MissedCallInboundCallView
+        data = self.request()
+        params = {'CallSid': 'CA123', 'From': '+10987654321', 'To': data['call_number']}
+        view = MissedCallInboundCallView.as_view()
+
+        response = view(APIRequestFactory().post('/auth/callbacks/inbound/', params))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        signature = RequestValidator('secret').compute_signature(api_settings.INBOUND_CALLBACK_URL, params)
+        request = APIRequestFactory().post('/auth/callbacks/inbound/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'<Reject reason="busy"/>', response.content)
+        self.assertTrue(MissedCallVerification.objects.get(pk=data['session_id']).is_verified)
+
+    def signed_call(self, params):
+        from rest_framework.test import APIRequestFactory
+        from twilio.request_validator import RequestValidator
+        from .views import MissedCallInboundCallView
+        signature = RequestValidator('secret').compute_signature(api_settings.INBOUND_CALLBACK_URL, params)
+        request = APIRequestFactory().post('/auth/callbacks/inbound/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+        return MissedCallInboundCallView.as_view()(request)
+
+    def test_untrusted_caller_id_is_ignored(self):
+        """Test calls whose caller ID failed attestation verify nothing"""
+        data = self.request()
+        params = {'CallSid': 'CA123', 'From': '+10987654321', 'To': data['call_number']}
+        for verstat in ('TN-Validation-Failed', 'TN-Validation-Passed-C'):
+            self.assertEqual(self.signed_call({**params, 'StirVerstat': verstat}).status_code, status.HTTP_200_OK)
+            self.assertFalse(MissedCallVerification.objects.get(pk=data['session_id']).is_verified)
+        self.signed_call({**params, 'StirVerstat': 'TN-Validation-Passed-A'})
+        self.assertTrue(MissedCallVerification.objects.get(pk=data['session_id']).is_verified)
+
+    @override_settings(MISSEDCALL_AUTH={
+        'REQUIRE_SIGNATURE': False,
+        'GATEWAY_CLASS': 'fake',
+        'TWILIO_AUTH_TOKEN': 'secret',
+        'INBOUND_CALLBACK_URL': 'https://api.example.com/auth/callbacks/inbound/',
+        'TENANTS': {'brand-us': {
+            'APP_SIGNATURES': ['us-signature-000'], 'GATEWAY_CLASS': 'twilio', 'VERIFICATION_MODE': 'inbound',
+        }},
+    })
+    def test_webhook_uses_tenant_gateway(self):
+        """Test an inbound tenant on a non-default gateway gets its webhooks through"""
+        caller = CallSourceNumber.objects.create(phone_number='+15550001234', tenant='brand-us')
+        response = self.client.post('/auth/request/', {
+            'phone_number': '+10987654321', 'app_signature': 'us-signature-000',
+        }, format='json')
+        self.assertEqual(response.data['call_number'], caller.phone_number)
+        params = {'CallSid': 'CA123', 'From': '+10987654321', 'To': caller.phone_number}
+        self.assertEqual(self.signed_call(params).status_code, status.HTTP_200_OK)
+        self.assertTrue(MissedCallVerification.objects.get(pk=response.data['session_id']).is_verified)
+
+
+class ProfilingTests(APITestCase):
+    """Test the sampling profiler hooks"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import profiling
+        cache.clear()
+        profiling.discard()
+        self.addCleanup(profiling.discard)
+        CallSourceNumber.objects.create(phone_number='+1234567890')
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_disabled_by_default(self, mock_place_call):
+        """Test nothing is profiled unless enabled"""
+        from .profiling import get_profiles
+        self.client.post('/auth/request/', {'phone_number': '+10987654321', 'app_signature': 'test-signature'})
+        self.assertEqual(get_profiles(), {})
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_samples_are_aggregated_and_dumped(self, mock_place_call):
+        """Test sampled calls are merged per hook and readable by the command"""
+        import tempfile
+        from django.core.management import call_command
+        from rest_framework.test import APIRequestFactory
+        from .authentication import MissedCallSessionAuthentication
+        from .profiling import dump, get_profiles
+
+        directory = tempfile.mkdtemp()
+        with override_settings(MISSEDCALL_AUTH={
+            'REQUIRE_SIGNATURE': False,
+            'PROFILING_ENABLED': True,
+            'PROFILING_SAMPLE_RATE': 1.0,
+            'PROFILING_DIR': directory,
+        }):
+            for _ in range(2):
+                self.client.post('/auth/request/', {'phone_number': '+10987654321', 'app_signature': 'test-signature'})
+            self.client.post('/auth/verify/', {'phone_number': '+10987654321', 'received_caller_id': '+1234567890'})
+            MissedCallSessionAuthentication().authenticate(APIRequestFactory().get('/'))
+
+            profiles = get_profiles()
+            self.assertEqual({name: samples for name, (samples, _stats) in profiles.items()},
+                             {'request': 2, 'verify': 1, 'authenticate': 1})
+            self.assertEqual(len(dump()), 3)
+
+            out = StringIO()
+            call_command('missedcall_profile', endpoint=['request'], limit=5, stdout=out)
+        self.assertIn('request (1 process file(s)', out.getvalue())
+        self.assertIn('views.py', out.getvalue())
+        self.assertNotIn('verify (', out.getvalue())
+
+    def test_command_only_signals_processes_with_handler(self):
+        """Test --pid refuses processes that never installed the dump handler"""
+        import os
+        import signal
+        import tempfile
+        from django.core.management import CommandError, call_command
+        from .profiling import has_signal_handler, install_signal_handler
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(signal.signal, signal.SIGUSR2, signal.getsignal(signal.SIGUSR2))
+        with override_settings(MISSEDCALL_AUTH={'REQUIRE_SIGNATURE': False, 'PROFILING_DIR': directory}):
+            # e.g. a worker forked after a preload: the handler was reset
+            with patch('os.kill') as kill, self.assertRaises(CommandError):
+                call_command('missedcall_profile', pid=[os.getpid()], wait=0, stdout=StringIO())
+            kill.assert_not_called()
+
+            self.assertTrue(install_signal_handler())
+            self.assertTrue(has_signal_handler(os.getpid()))
+            with patch('os.kill') as kill:
+                call_command('missedcall_profile', pid=[os.getpid()], wait=0, stdout=StringIO())
+            kill.assert_called_once_with(os.getpid(), signal.SIGUSR2)
+
+
+@skipUnless('replica' in settings.DATABASES, "requires a second database alias named 'replica'")
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'SESSION_SHARDS': ['default', 'replica'],
+})
+class ShardingTests(TransactionTestCase):
+    """Test sessions sharded by phone over two databases"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .sharding import shard_index
+        cache.clear()
+        self.callers = [CallSourceNumber.objects.create(phone_number=f'+123456789{i}') for i in range(2)]
+        # A phone on each shard
+        candidates = [f'+1415555{i:04d}' for i in range(100)]
+        self.phones = [next(phone for phone in candidates if shard_index(phone) == index) for index in range(2)]
+
+    def create_session(self, phone, **kwargs):
+        return MissedCallVerification.objects.create(
+            user_phone=phone, app_signature='test-signature', expected_caller=self.callers[0], **kwargs
+        )
+
+    @patch('drf_missed_call_auth.gateways.twilio.TwilioGateway.place_call', return_value='CA123')
+    def test_sessions_live_on_their_phone_shard(self, mock_place_call):
+        """Test request, verify and session lookups each go to the phone's shard"""
+        from .authentication import MissedCallSessionAuthentication
+        from .sharding import db_for_session
+        for index, phone in enumerate(self.phones):
+            response = self.client.post('/auth/request/', {
+                'phone_number': phone, 'app_signature': 'test-signature',
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            session_id = response.data['session_id']
+            self.assertEqual(uuid.UUID(str(session_id)).bytes[0], index)
+            self.assertEqual(db_for_session(session_id), ['default', 'replica'][index])
+            other = ['replica', 'default'][index]
+            self.assertFalse(MissedCallVerification.objects.using(other).filter(pk=session_id).exists())
+
+            caller = MissedCallVerification.objects.using(db_for_session(session_id)).get(pk=session_id).expected_caller
+            response = self.client.post('/auth/verify/', {
+                'phone_number': phone, 'received_caller_id': caller.phone_number,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            request = MagicMock(META={'HTTP_X_MISSEDCALL_SESSION': str(session_id)})
+            self.assertEqual(MissedCallSessionAuthentication().authenticate(request)[1].pk, uuid.UUID(str(session_id)))
+
+        # The pool is mirrored to the shards, also on delete
+        self.assertEqual(CallSourceNumber.objects.using('replica').count(), 2)
+        CallSourceNumber.objects.create(phone_number='+15550000000').delete()
+        self.assertFalse(CallSourceNumber.objects.using('replica').filter(phone_number='+15550000000').exists())
+
+    def test_cross_shard_maintenance(self):
+        """Test revocation, delivery callbacks and the admin read every shard"""
+        from .admin import ShardedPaginator
+        from .delivery import ingest_status_events
+        from .revocation import revoke_sessions
+        sessions = [
+            self.create_session(phone, provider_call_id=f'CA{index}') for index, phone in enumerate(self.phones)
+        ]
+        self.assertEqual(ingest_status_events([('CA0', 'ringing'), ('CA1', 'ringing')]), 2)
+
+        paginator = ShardedPaginator(MissedCallVerification.objects.order_by('-created_at', '-pk'), 1)
+        self.assertEqual(paginator.count, 2)
+        self.assertEqual(
+            [paginator.page(number).object_list[0].pk for number in (1, 2)],
+            [session.pk for session in reversed(sessions)],
+        )
+
+        self.assertEqual(revoke_sessions(caller_number=self.callers[0].phone_number), 2)
+        self.assertEqual(revoke_sessions(phone=self.phones[0]), 0)
+        for session in sessions:
+            session.refresh_from_db()
+            self.assertEqual(session.delivery_status, 'ringing')
+            self.assertFalse(session.is_valid)
+
+    @override_settings(MISSEDCALL_AUTH={'SESSION_SHARDS': ['default', 'missing']})
+    def test_unknown_shard_alias_is_reported(self):
+        """Test the system check rejects shards missing from DATABASES"""
+        from .apps import validate_settings
+        self.assertIn('rfm.E005', [error.id for error in validate_settings(None)])
+
+
+class LoadTestTests(TestCase):
+    """Test the fake carrier and the load-test report"""
+
+    def setUp(self):
+        from .gateways.fake import FakeCarrierGateway
+        FakeCarrierGateway.reset()
+        self.addCleanup(FakeCarrierGateway.configure)
+
+    def test_fake_carrier_records_calls(self):
+        """Test successful calls are looked up by destination"""
+        from .gateways.fake import FakeCarrierGateway
+        sid = FakeCarrierGateway().place_call('+15550000001', '+19995550000')
+        call = FakeCarrierGateway.last_call_to('+15550000001')
+        self.assertEqual(call['sid'], sid)
+        self.assertEqual(call['from'], '+19995550000')
+        self.assertIsNone(FakeCarrierGateway.last_call_to('+15550000002'))
+
+    def test_fake_carrier_injects_failures(self):
+        """Test failure injection raises classified gateway errors"""
+        from .gateways import GatewayError
+        from .gateways.fake import FakeCarrierGateway
+        FakeCarrierGateway.configure(failure_rate=1.0)
+        with self.assertRaises(GatewayError):
+            FakeCarrierGateway().place_call('+15550000001', '+19995550000')
+        self.assertEqual(FakeCarrierGateway.calls(), [])
+
+    def test_report_percentiles_and_histogram(self):
+        """Test latencies are bucketed and errors counted"""
+        from .loadtest import LoadTestRecorder
+        recorder = LoadTestRecorder()
+        for ms in range(1, 101):
+            recorder.record('request', 202, ms / 1000)
+        recorder.record('request', 503, 6.0)
+        recorder.finish()
+
+        stats = recorder.summary()['endpoints']['request']
+        self.assertEqual(stats['count'], 101)
+        self.assertAlmostEqual(stats['p50'], 51.0)
+        self.assertEqual(stats['histogram']['<=5ms'], 5)
+        self.assertEqual(stats['histogram']['>5000ms'], 1)
+        self.assertAlmostEqual(stats['error_rate'], 1 / 101)
+        self.assertIn('request: 101 requests', recorder.format())
+
+
+@override_settings(MISSEDCALL_AUTH={
+    'REQUIRE_SIGNATURE': False,
+    'GATEWAY_CLASS': 'drf_missed_call_auth.gateways.fake.FakeCarrierGateway',
+})
+class LoadTestLiveServerTests(LiveServerTestCase):
+    """Test simulated clients against a live server"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .gateways.fake import FakeCarrierGateway
+        cache.clear()
+        FakeCarrierGateway.reset()
+        CallSourceNumber.objects.create(phone_number='+19995550000')
+        CallSourceNumber.objects.create(phone_number='+19995550001')
+
+    def test_clients_verify_with_dialed_caller(self):
+        """Test a burst of clients completes request and verify"""
+        from django.urls import reverse
+        from .loadtest import VERIFIED, LoadTestRecorder, MobileClientSimulator, run_load
+        prefix = reverse('drf_missed_call_auth:request').rsplit('request/', 1)[0]
+        simulator = MobileClientSimulator(
+            self.live_server_url + prefix,
+            'test-signature-123',
+            LoadTestRecorder(),
+            think_time=(0, 0),
+            wrong_caller_rate=1.0,
+            retry_rate=0,
+            fraud_rate=0,
+        )
+        recorder = run_load(simulator, sessions=4, concurrency=2, burst_size=2, burst_interval=0)
+
+        self.assertEqual(recorder.outcomes[VERIFIED], 4)
+        self.assertEqual(recorder.statuses['verify'][400], 4)
+        self.assertEqual(MissedCallVerification.objects.filter(is_verified=True).count(), 4)
+
+
 class CleanupCommandTests(TestCase):
     """Test cleanup management command"""
     
@@ -357,4 +2579,101 @@ class CleanupCommandTests(TestCase):
         # Recent session should remain
         self.assertTrue(
             MissedCallVerification.objects.filter(id=recent_verification.id).exists()
-        )
\ No newline at end of file
+        )
+
+
+class ArchiveTests(TestCase):
+    """Test streaming archival of expired sessions and re-import"""
+
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.caller = CallSourceNumber.objects.create(phone_number='+1234567890')
+
+    def create_expired(self, count, days=10, phone='+0987654321'):
+        sessions = []
+        for i in range(count):
+            sessions.append(MissedCallVerification.objects.create(
+                user_phone=phone,
+                app_signature='test-signature',
+                expected_caller=self.caller,
+                expires_at=timezone.now() - timedelta(days=days, minutes=i),
+            ))
+        return sessions
+
+    def archive(self, **options):
+        from django.core.management import call_command
+        call_command('archive_missedcall_sessions', dir=self.directory, stdout=StringIO(), **options)
+
+    def test_rotates_and_deletes_archived_rows(self):
+        """Test files rotate, the watermark is recorded and only archived rows go"""
+        from .archive import iter_archive, read_manifest
+        self.create_expired(5)
+        recent = MissedCallVerification.objects.create(
+            user_phone='+1111111111', app_signature='test-signature', expected_caller=self.caller,
+        )
+        self.archive(rows_per_file=2)
+
+        manifest = read_manifest(self.directory)
+        self.assertEqual([entry['rows'] for entry in manifest['files']], [2, 2, 1])
+        self.assertEqual(list(MissedCallVerification.objects.all()), [recent])
+        self.assertEqual(len(list(iter_archive([self.directory]))), 5)
+
+    def test_runs_are_incremental(self):
+        """Test a second run only archives sessions past the watermark"""
+        from .archive import read_manifest
+        self.create_expired(3)
+        self.archive(keep=True)
+        self.archive(keep=True)
+        self.assertEqual(len(read_manifest(self.directory)['files']), 1)
+
+        self.create_expired(1, days=8)
+        self.archive()
+        manifest = read_manifest(self.directory)
+        self.assertEqual([entry['rows'] for entry in manifest['files']], [3, 1])
+        self.assertFalse(MissedCallVerification.objects.exists())
+
+    def test_restore_round_trip(self):
+        """Test archived sessions are restored field for field, in both formats"""
+        import os
+        from django.core.management import call_command
+        root = self.directory
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(fmt=fmt):
+                self.directory = os.path.join(root, fmt)
+                session = self.create_expired(1, phone='+15550001111')[0]
+                self.create_expired(1, phone='+15550002222')
+                MissedCallVerification.objects.filter(pk=session.pk).update(
+                    is_verified=True, verified_at=session.created_at, ip_address='10.0.0.1', attempt_count=2,
+                )
+                before = MissedCallVerification.objects.get(pk=session.pk)
+                self.archive(format=fmt)
+                self.assertFalse(MissedCallVerification.objects.exists())
+
+                call_command('restore_missedcall_sessions', self.directory, phone='+15550001111', stdout=StringIO())
+                after = MissedCallVerification.objects.get()
+                for field in MissedCallVerification._meta.concrete_fields:
+                    self.assertEqual(getattr(after, field.attname), getattr(before, field.attname), field.name)
+                MissedCallVerification.objects.all().delete()
+
+    def test_restored_sessions_survive_later_runs(self):
+        """Test the next archive run doesn't delete restored sessions again"""
+        from django.core.management import call_command
+        from .archive import read_manifest
+        session = self.create_expired(1, phone='+15550001111')[0]
+        self.create_expired(1, phone='+15550002222')
+        self.archive()
+        call_command('restore_missedcall_sessions', self.directory, phone='+15550001111', stdout=StringIO())
+        self.assertEqual(read_manifest(self.directory)['restored'], [str(session.pk)])
+
+        self.create_expired(1, days=8)
+        self.archive()
+        self.assertEqual(list(MissedCallVerification.objects.values_list('pk', flat=True)), [session.pk])
+
+    def test_missing_directory_setting(self):
+        """Test the command refuses to run without a directory"""
+        from django.core.management import CommandError, call_command
+        with self.assertRaises(CommandError):
+            call_command('archive_missedcall_sessions', stdout=StringIO())
@@ -0,0 +1,34 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.throttling import AnonRateThrottle
+
+from .tenants import DEFAULT_TENANT, get_tenant, resolve_tenant
+
+
+class TenantRateThrottle(AnonRateThrottle):
+    """
+    Anonymous throttle with per-tenant rates. A tenant's THROTTLE_RATE
+    replaces the 'anon' rate, and each tenant's requests are counted
+    separately, so one app's traffic can't use up another's allowance.
+    """
+
+    def allow_request(self, request, view):
+        self.tenant = self.get_tenant(request)
+        if self.tenant.THROTTLE_RATE:
+            self.rate = self.tenant.THROTTLE_RATE
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_tenant(self, request):
+        try:
+            data = request.data
+        except ParseError:
+            # Reported by the view; not our concern here
+            return get_tenant(DEFAULT_TENANT)
+        signature = data.get('app_signature') if hasattr(data, 'get') else None
+        return resolve_tenant(signature) if isinstance(signature, str) else get_tenant(DEFAULT_TENANT)
+
+    def get_cache_key(self, request, view):
+        key = super().get_cache_key(request, view)
+        if key is not None and not self.tenant.is_default:
+            key = f'{key}_{self.tenant.name}'
+        return key
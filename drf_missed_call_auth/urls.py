@@ -1,8 +1,11 @@
 from django.urls import path
 from .views import (
     MissedCallRequestView, 
+    MissedCallBulkRequestView,
     MissedCallVerifyView,
-    MissedCallStatusView
+    MissedCallStatusView,
+    MissedCallDeliveryStatusView,
+    MissedCallInboundCallView,
 )
 from .settings import api_settings
 
@@ -20,8 +23,28 @@ urlpatterns = [
         MissedCallVerifyView.as_view(), 
         name='verify'
     ),
+    path(
+        'callbacks/status/',
+        MissedCallDeliveryStatusView.as_view(),
+        name='delivery-status'
+    ),
+    path(
+        'callbacks/inbound/',
+        MissedCallInboundCallView.as_view(),
+        name='inbound-call'
+    ),
 ]
 
+# Server-to-server bulk requests
+if api_settings.ENABLE_BULK_ENDPOINT:
+    urlpatterns.append(
+        path(
+            'request/bulk/',
+            MissedCallBulkRequestView.as_view(),
+            name='bulk-request'
+        )
+    )
+
 # Conditionally add status endpoint
 if api_settings.ENABLE_STATUS_ENDPOINT:
     urlpatterns.append(
@@ -30,4 +53,16 @@ if api_settings.ENABLE_STATUS_ENDPOINT:
             MissedCallStatusView.as_view(),
             name='status'
         )
+    )
+
+# Conditionally add the push endpoint (requires an ASGI server)
+if api_settings.ENABLE_EVENT_STREAM:
+    from .streaming import verification_events
+
+    urlpatterns.append(
+        path(
+            'events/<uuid:session_id>/',
+            verification_events,
+            name='events'
+        )
     )
\ No newline at end of file
@@ -1,8 +1,10 @@
 import hmac
+from functools import lru_cache
 from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings as drf_settings
 from django.utils.translation import gettext_lazy as _
-from .settings import api_settings
-from .gateways.twilio import TwilioGateway
+from .settings import DEFAULTS, api_settings
 
 
 def normalize_phone_number(phone: str) -> str:
@@ -20,6 +22,33 @@ def normalize_phone_number(phone: str) -> str:
     return cleaned
 
 
+def sanitize_phone_for_logging(phone: str) -> str:
+    """
+    Masks a phone number for logs and admin display, keeping the leading
+    country prefix and the last two digits (e.g., +1*******90).
+    """
+    if not phone:
+        return ''
+    if len(phone) <= 5:
+        return '*' * len(phone)
+    return phone[:2] + '*' * (len(phone) - 4) + phone[-2:]
+
+
+def get_client_ip(request):
+    """
+    Returns the client address. X-Forwarded-For is only trusted when
+    REST_FRAMEWORK['NUM_PROXIES'] says how many proxies sit in front,
+    matching DRF's throttles.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    xff = request.META.get('HTTP_X_FORWARDED_FOR')
+    num_proxies = drf_settings.NUM_PROXIES
+    if xff and num_proxies:
+        addrs = [addr.strip() for addr in xff.split(',')]
+        return addrs[-min(num_proxies, len(addrs))]
+    return remote_addr
+
+
 def validate_app_signature(value: str) -> bool:
     """
     Validates the application signature using constant-time comparison.
@@ -45,9 +74,37 @@ def validate_app_signature(value: str) -> bool:
         return len(value) >= 10
 
 
-def get_gateway():
+@lru_cache(maxsize=None)
+def _import_gateway(path: str):
+    return import_string(path)
+
+
+def get_gateway_class(tenant=None):
+    """
+    Resolves GATEWAY_CLASS (a GATEWAYS key or a dotted path) to a class,
+    importing the provider module on first use.
+    """
+    name = tenant.GATEWAY_CLASS if tenant is not None else api_settings.GATEWAY_CLASS
+    gateways = {**DEFAULTS['GATEWAYS'], **api_settings.GATEWAYS}
+    return _import_gateway(gateways.get(name, name))
+
+
+def get_gateway(tenant=None):
+    """
+    Returns an instance of the telephony gateway configured by GATEWAY_CLASS
+    (Twilio by default), or by the tenant's profile.
+    """
+    return get_gateway_class(tenant)()
+
+
+def get_tenant_gateways(tenants) -> list:
     """
-    Returns the configured telephony gateway class.
-    Currently only Twilio is supported.
+    One gateway per distinct GATEWAY_CLASS of `tenants`, for provider
+    webhooks that only tell their tenant once they are authenticated.
     """
-    return TwilioGateway
\ No newline at end of file
+    classes = []
+    for tenant in tenants:
+        gateway_class = get_gateway_class(tenant)
+        if gateway_class not in classes:
+            classes.append(gateway_class)
+    return [gateway_class() for gateway_class in classes]
\ No newline at end of file
@@ -1,11 +1,26 @@
+import json
 import logging
+import time
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
-from rest_framework import status, generics
+from rest_framework import status, generics, views
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from rest_framework.throttling import AnonRateThrottle
-from .serializers import MissedCallRequestSerializer, MissedCallVerifySerializer
+from .serializers import MissedCallBulkRequestSerializer, MissedCallRequestSerializer, MissedCallVerifySerializer
 from .settings import api_settings
+from . import audit
+from .models import AuditEventType, VerificationDirection
+from .utils import get_client_ip, get_tenant_gateways
+from .delivery import ingest_status_events
+from .inbound import ingest_inbound_calls, is_inbound
+from .profiling import profiled
+from .state import compute_etag, get_session_state, render_state
+from .tenants import get_tenants
+from .throttling import TenantRateThrottle
+from .bulk import request_verifications
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +32,60 @@ class MissedCallRequestView(generics.GenericAPIView):
     """
     serializer_class = MissedCallRequestSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [TenantRateThrottle]
+
+    @profiled('request')
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            # Let DRF's exception handler manage telephony or DB errors
+            verification = serializer.save(ip_address=get_client_ip(request))
+        except APIException as e:
+            audit.record_request(AuditEventType.REQUEST, request, started, e.status_code)
+            raise
+        audit.record_request(AuditEventType.REQUEST, request, started, status.HTTP_202_ACCEPTED, session=verification)
+        data = {
+            "detail": _("Flash call initiated. Please observe incoming calls."),
+            # Lets the client poll the status endpoint for this session
+            "session_id": str(verification.id),
+            "expires_at": verification.expires_at.isoformat(),
+        }
+        if verification.direction == VerificationDirection.INBOUND:
+            data["detail"] = _("Please call the number below. The call will be rejected and not charged.")
+            data["call_number"] = verification.expected_caller.phone_number
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class MissedCallBulkRequestView(generics.GenericAPIView):
+    """
+    Initiates verification for a list of phones, for trusted servers
+    (call centers, B2B onboarding). Requires BULK_PERMISSION_CLASS and uses
+    the project's default throttles rather than the per-IP anonymous rate.
+
+    Responds with one JSON line per phone (application/x-ndjson), streamed as
+    calls are placed; see `bulk.request_verifications` for their fields.
+    """
+    serializer_class = MissedCallBulkRequestSerializer
+
+    def get_permissions(self):
+        return [import_string(api_settings.BULK_PERMISSION_CLASS)()]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        # Let DRF's exception handler manage telephony or DB errors
-        verification = serializer.save()
-        return Response(
-            {"detail": _("Flash call initiated. Please observe incoming calls.")},
-            status=status.HTTP_202_ACCEPTED
+        results = request_verifications(
+            serializer.validated_data['phone_numbers'],
+            serializer.validated_data['app_signature'],
+            ip_address=get_client_ip(request),
+        )
+        return StreamingHttpResponse(
+            (json.dumps(result) + '\n' for result in results),
+            content_type='application/x-ndjson',
         )
 
 
@@ -38,36 +97,149 @@ class MissedCallVerifyView(generics.GenericAPIView):
     serializer_class = MissedCallVerifySerializer
     permission_classes = [AllowAny]
 
+    @profiled('verify')
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        session = serializer.save()  # Marks as verified and emits signal
+        started = time.monotonic()
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            session = serializer.save()  # Marks as verified and emits signal
+            self.credentials = serializer.credentials
+        except APIException as e:
+            audit.record_request(AuditEventType.VERIFY_FAILURE, request, started, e.status_code)
+            raise
+        audit.record_request(
+            AuditEventType.VERIFY_SUCCESS, request, started, status.HTTP_200_OK, session=session,
+            time_to_verify=(session.verified_at - session.created_at).total_seconds(),
+        )
         return self.get_success_response(session)
 
     def get_success_response(self, session):
         """
         Hook for developers to customize the response.
-        Override this method to:
-        - Link phone to a User model
-        - Generate JWT / DRF Token
-        - Return custom claims
+
+        With USER_PHONE_FIELD set, the phone is already linked to a user and
+        `self.credentials` holds the user id and the TOKEN_ISSUER credentials
+        (see issuance.py); they are added to the payload. Override this
+        method to return custom claims.
 
         Example:
-            from rest_framework.authtoken.models import Token
-            user = get_or_create_user_from_phone(session.user_phone)
-            token, _ = Token.objects.get_or_create(user=user)
-            return Response({"token": token.key})
+            def get_success_response(self, session):
+                response = super().get_success_response(session)
+                response.data['plan'] = get_plan(self.credentials['user_id'])
+                return response
         """
         data = {
             "detail": _("Verification successful."),
             "phone_number": session.user_phone,
-            "verified": True
+            "verified": True,
+            **getattr(self, 'credentials', {}),
         }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class MissedCallStatusView(views.APIView):
+    """
+    Reports the state of a verification session for client polling.
+
+    Answers from a cached snapshot and supports conditional requests: send the
+    last ETag in If-None-Match to get an empty 304 while nothing changed.
+    Add `?wait=<seconds>` to long-poll; the request is then held until the
+    state differs from If-None-Match, the session expires, or the wait
+    (capped by STATUS_LONG_POLL_TIMEOUT) elapses. Long-polling holds a worker,
+    so enable it only behind threaded or async workers.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, session_id, *args, **kwargs):
+        state = get_session_state(session_id)
+        if state is None:
+            return self.not_found()
+
+        client_etag = request.META.get('HTTP_IF_NONE_MATCH')
+        payload = render_state(session_id, state)
+        etag = compute_etag(payload)
+
+        wait = self.get_wait_timeout(request)
+        if wait and client_etag == etag:
+            deadline = time.monotonic() + wait
+            interval = api_settings.STATUS_LONG_POLL_INTERVAL
+            while etag == client_etag and time.monotonic() < deadline:
+                # Sleep past the expiry instant at most, so expiry is reported promptly
+                until_expiry = (state['expires_at'] - now()).total_seconds()
+                time.sleep(max(0, min(interval, deadline - time.monotonic(), until_expiry + 0.01)))
+                state = get_session_state(session_id)
+                if state is None:
+                    return self.not_found()
+                payload = render_state(session_id, state)
+                etag = compute_etag(payload)
+
+        if client_etag == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(payload, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def not_found(self):
+        return Response(
+            {"detail": _("Verification session not found.")},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    def get_wait_timeout(self, request) -> float:
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except (TypeError, ValueError):
+            return 0
+        return max(0, min(wait, api_settings.STATUS_LONG_POLL_TIMEOUT))
 
-        # Optional: Indicate that token integration is possible if configured
-        if api_settings.TOKEN_MODEL:
-            # Do NOT generate a token here — no User exists yet.
-            # This is just a hint for developers.
-            pass
 
-        return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+class MissedCallDeliveryStatusView(views.APIView):
+    """
+    Webhook receiving call-status events from the telephony provider.
+    Point STATUS_CALLBACK_URL at this view. Requests are authenticated by the
+    signature check of any tenant's gateway, not by DRF authentication or
+    throttling.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def post(self, request, *args, **kwargs):
+        gateway = next((gateway for gateway in get_tenant_gateways(get_tenants()) if gateway.validate_callback(request)), None)
+        if gateway is None:
+            logger.warning("Rejected delivery status callback with an invalid signature.")
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        ingest_status_events(gateway.parse_status_events(request))
+        # Providers only care about the status code; an empty 204 is cheapest
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MissedCallInboundCallView(views.APIView):
+    """
+    Webhook receiving the calls users place to pool numbers in inbound mode.
+    Point the provider's incoming-call URL of every pool number (and
+    INBOUND_CALLBACK_URL) at this view. Each call verifies the session that
+    expects it, and is answered with the gateway's instructions to reject it.
+    The request is authenticated by the gateway of any inbound tenant.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def post(self, request, *args, **kwargs):
+        gateways = get_tenant_gateways(tenant for tenant in get_tenants() if is_inbound(tenant))
+        gateway = next((gateway for gateway in gateways if gateway.validate_inbound_callback(request)), None)
+        if gateway is None:
+            logger.warning("Rejected inbound call webhook with an invalid signature.")
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        ingest_inbound_calls(gateway.parse_inbound_calls(request))
+        return gateway.get_inbound_response(request)
@@ -54,10 +54,14 @@ setup(
         'postgres': [
             'psycopg2-binary>=2.9',
         ],
+        'jwt': [
+            'djangorestframework-simplejwt>=5.0',
+        ],
         'full': [
             'redis>=4.5',
             'django-redis>=5.2',
             'psycopg2-binary>=2.9',
+            'djangorestframework-simplejwt>=5.0',
         ],
     },
     classifiers=[